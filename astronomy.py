@@ -0,0 +1,11 @@
+# Constants of astronomy and gravity, in SI, that finkchlib.constants does not have.
+# Every other physical constant comes from there, as it does everywhere else; these are kept here, in one place,
+# so that they can move there whole, and so that no module defines its own
+
+# Gravitational constant
+G: float = 6.674e-11
+
+# Length and mass units of star catalogs, and the radius of the Sun
+parsec: float = 3.0857e16
+solar_mass: float = 1.989e30
+solar_radius: float = 6.957e8
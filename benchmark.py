@@ -0,0 +1,297 @@
+# Repeatable benchmarks of the simulation, the store and the plotter.
+# Each scenario is fixed, down to the seed of any synthetic data, so results can be compared across commits.
+# Results are written as JSON, and compared against a saved baseline to flag regressions
+
+import os
+import math
+import json
+import time
+import shutil
+import platform
+import tempfile
+import numpy as np
+from math import hypot
+from simulation import Simulation
+from record import EveryN, Recorder
+from store import Store
+from compress import Compression
+from integrator import Integrator, Fused, Rapidity
+from checkpoint import Checkpoint
+
+# Seed of all synthetic data
+seed: int = 1
+
+# A Metric is one measurement of a scenario
+class Metric:
+    def __init__(self, value: float, unit: str, higher: bool) -> None:
+        self.value: float = value
+        self.unit: str = unit
+
+        # Whether a higher value is better, as with throughput, or worse, as with latency
+        self.higher: bool = higher
+
+    def __str__(self) -> str:
+        return f'{self.value:.4g} {self.unit}'
+
+    def get_preview(self) -> dict:
+        return {
+            'value':    self.value,
+            'unit':     self.unit,
+            'higher':   self.higher
+        }
+
+# A Benchmark runs scenarios, keeping the best of a few repeats of each
+class Benchmark:
+    def __init__(self, scenarios: list[str] = None, repeat: int = 3, directory: str = None) -> None:
+
+        # Names of the scenarios to run; defaults to all of them
+        self.scenarios: list[str] = scenarios if scenarios else list(registry)
+        for name in self.scenarios:
+            assert name in registry, f'No such scenario \'{name}\''
+
+        self.repeat: int = repeat
+
+        # Scratch directory for stores and files; a temporary one by default
+        self.directory: str = directory
+
+        # Scenario -> metric name -> Metric
+        self.results: dict = {}
+
+    # Calling a Benchmark runs every scenario and returns the results
+    def __call__(self) -> dict:
+        scratch = self.directory if self.directory else tempfile.mkdtemp(prefix = 'benchmark-')
+        os.makedirs(scratch, exist_ok = True)
+
+        try:
+            for name in self.scenarios:
+                runs = [registry[name](os.path.join(scratch, name)) for repeat in range(self.repeat)]
+
+                # The best of each metric over the repeats
+                self.results[name] = {key: max((run[key] for run in runs), key = lambda metric: metric.value if metric.higher else -metric.value) for key in runs[0]}
+
+                print(f'{name}:\t' + ', '.join(f'{key} {metric}' for key, metric in self.results[name].items()))
+        finally:
+            if not self.directory:
+                shutil.rmtree(scratch)
+
+        return self.results
+
+    # Writes the results as JSON
+    def write(self, file: str) -> None:
+        with open(file, 'w') as out:
+            json.dump(self.get_preview(), out, indent = 4)
+
+    # Compares the results against a baseline written by write.
+    # Returns the metrics that got worse by more than the threshold, as a fraction of the baseline
+    def compare(self, file: str, threshold: float = 0.1) -> list[str]:
+        with open(file, 'r') as baseline:
+            baseline = json.load(baseline)['scenarios']
+
+        regressions = []
+        for name, metrics in self.results.items():
+            for key, metric in metrics.items():
+                if not key in baseline.get(name, {}):
+                    continue
+
+                before = baseline[name][key]['value']
+                change = (metric.value - before) / before if before else 0
+                if not metric.higher:
+                    change = -change
+
+                if change < -threshold:
+                    regressions.append(f'{name} {key}: {before:.4g} -> {metric} ({change:+.1%})')
+
+        return regressions
+
+    def get_preview(self) -> dict:
+        return {
+            'time':         time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':       platform.python_version(),
+            'machine':      platform.platform(),
+            'repeat':       self.repeat,
+            'scenarios':    {name: {key: metric.get_preview() for key, metric in metrics.items()} for name, metrics in self.results.items()}
+        }
+
+
+
+# Steps 'ioRam-Beta', recording rarely, so stepping dominates.
+# With the fused integrator, the steps between recordings are taken in batches
+def steps(file: str, max_steps: int, integrator: Integrator = None) -> dict:
+    simulation = Simulation(1, 1000, 'ioRam-Beta', file, EveryN(10000), max_steps = max_steps, integrator = integrator)
+    simulation.verbose = False
+
+    start = time.perf_counter()
+    simulation()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'steps_per_second': Metric(simulation.steps / elapsed, 'steps/s', True)
+    }
+
+# Steps 'ioRam-Beta', recording every step, so storing dominates
+def store_write(file: str, compression: Compression = None) -> dict:
+    simulation = Simulation(1, 1000, 'ioRam-Beta', file, Recorder(), max_steps = 10 ** 5, compression = compression)
+    simulation.verbose = False
+
+    start = time.perf_counter()
+    simulation()
+    elapsed = time.perf_counter() - start
+
+    written = sum(os.path.getsize(simulation.store.path(key)) for key in simulation.store.columns)
+    raw = simulation.store.rows * len(simulation.store.columns) * 8
+
+    # Throughput is of the columns as recorded, before compression, so that better compression is not slower
+    return {
+        'rows_per_second':  Metric(simulation.store.rows / elapsed, 'rows/s', True),
+        'raw_rate':         Metric(raw / 1e6 / elapsed, 'MB/s', True),
+        'ratio':            Metric(raw / written, 'x', True)
+    }
+
+# Steps 'ioRam-Beta' under Rapidity an hour at a time from a rapidity of 21, where the speed rounds to c, then resumes
+# it from its checkpoint. Neither may go through velocity, which cannot hold such a state, so this fails if one does.
+# Then flies it from rest a second at a time until its tank has run dry, and on, which fails if it keeps speeding up
+# with no fuel to burn beyond what it scoops up
+def rapidity(file: str) -> dict:
+    steps, elapsed = 0, 0
+    for resume, max_steps in ((False, 10 ** 4), (True, 2 * 10 ** 4)):
+        simulation = Simulation(3600, 1000, 'ioRam-Beta', file, EveryN(10000), max_steps = max_steps, integrator = Rapidity(), checkpoint = Checkpoint(f'{file}.checkpoint', math.inf), resume = resume)
+        simulation.verbose = False
+        simulation.exist = simulation.steps <= simulation.max_steps
+
+        spacetime = simulation.ramjet.spacetime
+        if not resume:
+            spacetime.set_rapidity(21, 0)
+        assert hypot(spacetime.rap_x, spacetime.rap_y) >= 21, 'Rapidity was lost on resuming'
+
+        start, resumed = time.perf_counter(), simulation.steps
+        simulation()
+        steps += simulation.steps - resumed
+        elapsed += time.perf_counter() - start
+
+        assert hypot(spacetime.rap_x, spacetime.rap_y) >= 21, 'Rapidity was lost while stepping'
+
+    # The tank runs dry after about 18850 s
+    speeds = []
+    for resume, max_steps in ((False, 2 * 10 ** 4), (True, 3 * 10 ** 4)):
+        simulation = Simulation(1, 1000, 'ioRam-Beta', f'{file}-coast', EveryN(10000), max_steps = max_steps, integrator = Rapidity(), checkpoint = Checkpoint(f'{file}-coast.checkpoint', math.inf), resume = resume)
+        simulation.verbose = False
+        simulation.exist = simulation.steps <= simulation.max_steps
+        simulation()
+
+        assert simulation.ramjet.tank.fuel < 1e-12, 'The tank did not run dry'
+        speeds.append(hypot(simulation.ramjet.spacetime.vel_x, simulation.ramjet.spacetime.vel_y))
+
+    assert speeds[1] - speeds[0] < 1e-3 * speeds[0], f'Sped up from {speeds[0]:.1f} to {speeds[1]:.1f} m/s with an empty tank'
+
+    return {
+        'steps_per_second': Metric(steps / elapsed, 'steps/s', True)
+    }
+
+# Converts a synthetic legacy file of snapshots, then reads the store back
+def store_read(file: str) -> dict:
+    legacy = f'{file}.txt'
+    if not os.path.exists(legacy):
+        synthetic(legacy, 10 ** 5)
+
+    start = time.perf_counter()
+    Store(file).flatten_file(legacy)
+    converted = time.perf_counter() - start
+
+    # Reads every column, touching every value
+    start = time.perf_counter()
+    data, metadata = Store(file).read()
+    total = sum(float(np.nansum(column)) for column in data.values())
+    read = time.perf_counter() - start
+
+    # Reads a few columns over a range
+    start = time.perf_counter()
+    data, metadata = Store(file).read(['sim_time', 'ramjet-spacetime-pos_x', 'ramjet-spacetime-vel_x'], time = (2e4, 3e4))
+    total += sum(float(np.nansum(column)) for column in data.values())
+    selected = time.perf_counter() - start
+
+    return {
+        'flatten_rate':     Metric(os.path.getsize(legacy) / 1e6 / converted, 'MB/s', True),
+        'read_all':         Metric(read, 's', False),
+        'read_selected':    Metric(selected, 's', False)
+    }
+
+# Draws three plots of a synthetic store of a million rows
+def plot(file: str) -> dict:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as mpl
+    from plot import Plotter
+
+    if not os.path.exists(file):
+        store = Store(file, {'step_size': 1, 'name': 'synthetic'})
+        rng = np.random.default_rng(seed)
+
+        rows = 10 ** 6
+        for start in range(0, rows, store.chunk_size):
+            sim_time = np.arange(start, min(start + store.chunk_size, rows), dtype = float)
+            store.add_chunk({
+                'sim_time':                 sim_time,
+                'ramjet-spacetime-pos_x':   sim_time ** 2 / 2 + rng.normal(0, 1, len(sim_time)),
+                'ramjet-spacetime-vel_x':   sim_time + rng.normal(0, 1, len(sim_time)),
+                'ramjet-spacetime-acc_x':   rng.normal(1, 1e-2, len(sim_time))
+            }, len(sim_time))
+        store.close()
+
+    start = time.perf_counter()
+    plotter = Plotter(Store(file))
+    for key in ('pos_x', 'vel_x', 'acc_x'):
+        plotter('sim_time', f'ramjet-spacetime-{key}', key, ['Time (s)', key])
+        mpl.gcf().canvas.draw()
+    elapsed = time.perf_counter() - start
+
+    mpl.close('all')
+
+    return {
+        'render': Metric(elapsed, 's', False)
+    }
+
+# Writes a legacy file of snapshots, as the old Store wrote them, with values drawn from a fixed seed
+def synthetic(legacy: str, rows: int) -> None:
+    rng = np.random.default_rng(seed)
+    values = rng.random((rows, 8)).tolist()
+
+    with open(legacy, 'w') as file:
+        file.write(f'{dict(step_size = 1, name = "synthetic")}\n')
+
+        for row in range(rows):
+            snapshot = {
+                'steps':        row,
+                'sim_time':     float(row),
+                'real_time':    values[row][0],
+                'ramjet': {
+                    'parts': {
+                        'tank':     {'fuel': values[row][1], 'capacity': 10.0},
+                        'battery':  {'fuel': values[row][2], 'capacity': 1e7}
+                    },
+                    'spacetime': {
+                        'time':     float(row),
+                        'pos_x':    values[row][3] * row,
+                        'pos_y':    values[row][4],
+                        'vel_x':    values[row][5],
+                        'vel_y':    values[row][6]
+                    },
+                    'mass':     100 + values[row][7]
+                }
+            }
+            file.write(f'{snapshot}\n')
+
+
+
+# Scenario name -> function of a scratch path, returning its metrics
+registry: dict = {
+    'steps_1e5':    lambda file: steps(file, 10 ** 5),
+    'steps_1e6':    lambda file: steps(file, 10 ** 6),
+    'steps_1e6_fused': lambda file: steps(file, 10 ** 6, Fused()),
+    'store_write':  store_write,
+    'store_zlib':   lambda file: store_write(file, Compression('zlib', encode = False)),
+    'store_lzma':   lambda file: store_write(file, Compression('lzma', encode = False)),
+    'store_encoded': lambda file: store_write(file, Compression('zlib')),
+    'rapidity':     rapidity,
+    'store_read':   store_read,
+    'plot':         plot
+}
@@ -0,0 +1,223 @@
+# A catalog of finished runs in SQLite, for comparing many runs without reading their stores.
+# While a run steps, Statistics keeps running summaries of a few quantities: their lowest, highest, and mean and
+# standard deviation weighted by sim time. Samples are gathered a batch at a time and folded into the summaries with
+# the weighted form of Welford's update for merging sets, so nothing is kept per step beyond a batch.
+# When the run ends, the summaries go into the catalog with the ramjet's design and the path of its store
+#
+# Tables:
+#   runs:           one row per run, with its final state and totals
+#   parameters:     run, name, value; every parameter of the design, overridden or not
+#   statistics:     run, quantity, min, max, mean, std
+
+import os
+import json
+import time
+import sqlite3
+import numpy as np
+from math import hypot
+import hangar
+
+# Quantities summarised while stepping, in the order Statistics samples them
+quantities: list[str] = ['speed', 'acceleration', 'mass', 'fuel', 'battery']
+
+# Statistics summarises a run as it steps
+class Statistics:
+    def __init__(self, batch: int = 4096) -> None:
+
+        # Samples waiting to be folded in, each the sim time it stands for followed by the quantities
+        self.samples: list[tuple] = []
+        self.batch: int = batch
+        self.last: tuple = None
+
+        # Sim time summarised, and, for each quantity, its mean and sum of squared deviations, weighted by sim time
+        self.weight: float = 0
+        self.mean: np.ndarray = np.zeros(len(quantities))
+        self.m2: np.ndarray = np.zeros(len(quantities))
+
+        # Lowest and highest values seen
+        self.low: np.ndarray = np.full(len(quantities), np.inf)
+        self.high: np.ndarray = np.full(len(quantities), -np.inf)
+
+        # Sim time at which the tank first ran dry, if it has
+        self.exhausted: float = None
+
+        # Hydrogen scooped up over the run, in kg
+        self.scooped: float = 0
+
+    # Calling Statistics adds the state after some sim time, over some steps.
+    # A jump of many steps, as when fast-forwarding, is split between the state before and after it
+    def __call__(self, simulation, weight: float, steps: int = 1) -> None:
+        ramjet = simulation.ramjet
+        spacetime = ramjet.spacetime
+
+        values = (hypot(spacetime.vel_x, spacetime.vel_y), hypot(spacetime.preview_x, spacetime.preview_y), ramjet.mass, ramjet.tank.fuel, ramjet.battery.fuel)
+
+        if steps > 1 and self.last:
+            self.samples.append((weight / 2, *self.last))
+            weight /= 2
+
+        self.samples.append((weight, *values))
+        self.last = values
+
+        if len(self.samples) >= self.batch:
+            self.merge()
+
+        # The scoop's telemetry is what it took in over the last step, or nan before it first acts
+        m_H = ramjet.scooper.slots[0]
+        if m_H == m_H:
+            self.scooped += m_H * steps
+
+        if self.exhausted is None and ramjet.tank.fuel == 0:
+            self.exhausted = simulation.sim_time
+
+    # Folds the waiting samples into the summaries
+    def merge(self) -> None:
+        if not self.samples:
+            return
+
+        samples = np.array(self.samples)
+        self.samples = []
+
+        weights, values = samples[:, 0], samples[:, 1:]
+        self.low = np.minimum(self.low, values.min(axis = 0))
+        self.high = np.maximum(self.high, values.max(axis = 0))
+
+        weight = weights.sum()
+        if weight <= 0:
+            return
+
+        # Mean and squared deviations of the batch, merged with those so far
+        mean = weights @ values / weight
+        m2 = weights @ (values - mean) ** 2
+        total = self.weight + weight
+        delta = mean - self.mean
+
+        self.mean += delta * weight / total
+        self.m2 += m2 + delta ** 2 * self.weight * weight / total
+        self.weight = total
+
+    # Standard deviations over sim time
+    def std(self) -> np.ndarray:
+        self.merge()
+        return np.sqrt(self.m2 / self.weight) if self.weight else np.zeros(len(quantities))
+
+    def get_preview(self) -> dict:
+        std = self.std()
+
+        return {
+            quantity: {
+                'min':  float(self.low[index]),
+                'max':  float(self.high[index]),
+                'mean': float(self.mean[index]),
+                'std':  float(std[index])
+            } for index, quantity in enumerate(quantities)
+        }
+
+
+
+# A Catalog is a SQLite database of runs
+class Catalog:
+    def __init__(self, file: str = 'catalog.sqlite') -> None:
+        self.file: str = file
+
+        with self.connect() as connection:
+            connection.executescript(schema)
+        connection.close()
+
+    # Opens the database. Runs of a sweep add themselves from many processes, so writers wait their turn,
+    # and the log is written ahead so that readers never block them
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.file, timeout = 60)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode = WAL')
+
+        return connection
+
+    # Adds a finished simulation, returning its run id
+    def add(self, simulation) -> int:
+        ramjet = simulation.ramjet
+        statistics = simulation.statistics
+
+        with self.connect() as connection:
+            run = connection.execute(
+                'INSERT INTO runs (finished, store, ramjet, parameters, integrator, recorder, steps, sim_time, real_time, dilated_time, '
+                'final_position, final_velocity, final_mass, final_fuel, final_battery, fuel_exhausted, scooped) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    time.strftime('%Y-%m-%dT%H:%M:%S'), os.path.abspath(simulation.store.file), ramjet.name, json.dumps(simulation.parameters),
+                    str(simulation.integrator), str(simulation.recorder), simulation.steps, simulation.sim_time, simulation.clock.sim_time,
+                    ramjet.spacetime.time, hypot(ramjet.spacetime.pos_x, ramjet.spacetime.pos_y), hypot(ramjet.spacetime.vel_x, ramjet.spacetime.vel_y),
+                    ramjet.mass, ramjet.tank.fuel, ramjet.battery.fuel, statistics.exhausted, statistics.scooped
+                )
+            ).lastrowid
+
+            # Every parameter of the design, so runs can be found by any of them
+            connection.executemany('INSERT INTO parameters (run, name, value) VALUES (?, ?, ?)',
+                [(run, name, value) for name, value in hangar.get_design(ramjet.name, **simulation.parameters).items()])
+
+            connection.executemany('INSERT INTO statistics (run, quantity, min, max, mean, std) VALUES (?, ?, ?, ?, ?, ?)',
+                [(run, quantity, summary['min'], summary['max'], summary['mean'], summary['std']) for quantity, summary in statistics.get_preview().items()])
+        connection.close()
+
+        return run
+
+    # Runs a query, returning its rows
+    def query(self, sql: str, arguments: tuple = ()) -> list[sqlite3.Row]:
+        with self.connect() as connection:
+            rows = connection.execute(sql, arguments).fetchall()
+        connection.close()
+
+        return rows
+
+    # Runs with their parameters and statistics side by side, one row per run.
+    # Parameters are columns of their own name, and statistics are columns such as speed_max
+    def table(self, where: str = '', arguments: tuple = ()) -> list[dict]:
+        names = [row['name'] for row in self.query('SELECT DISTINCT name FROM parameters ORDER BY name')]
+
+        columns = [f'(SELECT value FROM parameters WHERE run = runs.id AND name = \'{name}\') AS "{name}"' for name in names]
+        for quantity in quantities:
+            for field in ('min', 'max', 'mean', 'std'):
+                columns.append(f'(SELECT {field} FROM statistics WHERE run = runs.id AND quantity = \'{quantity}\') AS "{quantity}_{field}"')
+
+        return [dict(row) for row in self.query(f'SELECT runs.*, {", ".join(columns)} FROM runs {where}', arguments)]
+
+
+
+schema: str = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id              INTEGER PRIMARY KEY,
+    finished        TEXT,
+    store           TEXT,
+    ramjet          TEXT,
+    parameters      TEXT,
+    integrator      TEXT,
+    recorder        TEXT,
+    steps           INTEGER,
+    sim_time        REAL,
+    real_time       REAL,
+    dilated_time    REAL,
+    final_position  REAL,
+    final_velocity  REAL,
+    final_mass      REAL,
+    final_fuel      REAL,
+    final_battery   REAL,
+    fuel_exhausted  REAL,
+    scooped         REAL
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    run             INTEGER REFERENCES runs (id),
+    name            TEXT,
+    value           REAL
+);
+CREATE TABLE IF NOT EXISTS statistics (
+    run             INTEGER REFERENCES runs (id),
+    quantity        TEXT,
+    min             REAL,
+    max             REAL,
+    mean            REAL,
+    std             REAL
+);
+CREATE INDEX IF NOT EXISTS parameters_by_value ON parameters (name, value);
+CREATE INDEX IF NOT EXISTS parameters_by_run ON parameters (run);
+CREATE INDEX IF NOT EXISTS statistics_by_run ON statistics (run, quantity);
+'''
@@ -0,0 +1,140 @@
+# Saves the full state of a simulation now and then, so a long run can resume where it stopped.
+# Checkpoints are pickled, which is binary and compact, and replace the previous one atomically
+
+import os
+import time
+import pickle
+
+# Changes whenever the layout of a checkpoint changes
+version: int = 5
+
+class Checkpoint:
+    def __init__(self, file: str, interval: float = 600) -> None:
+
+        # The file to which to save
+        self.file: str = file
+
+        # Real seconds between checkpoints
+        self.interval: float = interval
+
+        # Reading the clock every step is wasteful, so it is only read every few calls
+        self.calls: int = 0
+        self.last: float = time.perf_counter()
+
+        # Number of checkpoints saved
+        self.saved: int = 0
+
+    # Calling a Checkpoint saves the simulation if enough time has passed
+    def __call__(self, simulation) -> None:
+        self.calls += 1
+        if self.calls % 1024:
+            return
+
+        if time.perf_counter() - self.last >= self.interval:
+            self.save(simulation)
+
+    # Whether there is a checkpoint to resume from
+    def exists(self) -> bool:
+        return os.path.exists(self.file)
+
+    # Saves the simulation
+    def save(self, simulation) -> None:
+
+        # Everything recorded so far must be on disk, so the store can be cut back to this point on resume
+        simulation.ring.flush()
+        simulation.store.write()
+
+        state = get_state(simulation)
+
+        # Writes to a temporary file first, so a crash never leaves a broken checkpoint
+        with open(f'{self.file}.tmp', 'wb') as file:
+            pickle.dump(state, file, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{self.file}.tmp', self.file)
+
+        self.last = time.perf_counter()
+        self.saved += 1
+
+    # Loads the checkpoint into a simulation, and reopens its store where the checkpoint left it
+    def load(self, simulation) -> None:
+        with open(self.file, 'rb') as file:
+            state = pickle.load(file)
+
+        # Safety check
+        assert state['version'] == version, f'Checkpoint version {state["version"]} is not {version}'
+        assert state['name'] == simulation.ramjet.name and state['parameters'] == simulation.parameters, \
+            f'Checkpoint is of \'{state["name"]}\' {state["parameters"]}, not \'{simulation.ramjet.name}\' {simulation.parameters}'
+
+        set_state(simulation, state)
+
+
+
+# The state of a simulation, as plain data
+def get_state(simulation) -> dict:
+    ramjet = simulation.ramjet
+
+    return {
+        'version':      version,
+        'name':         ramjet.name,
+        'parameters':   simulation.parameters,
+        'simulation': {
+            'exist':        simulation.exist,
+            'steps':        simulation.steps,
+            'sim_time':     simulation.sim_time,
+            'step':         simulation.step,
+            'recorded':     simulation.recorded,
+            'filed':        simulation.filed
+        },
+        'ramjet': {
+            'state':                ramjet.get_state(),
+            'spacetime':            ramjet.spacetime.save(),
+            'previews':             {part.name: dict(part.preview) for part in parts(ramjet)}
+        },
+        'integrator': {
+            'taken':        simulation.integrator.taken,
+            'error':        simulation.integrator.error,
+            'rejected':     simulation.integrator.rejected
+        },
+        'fast_forward': {
+            'jumps':        simulation.fast_forward.jumps,
+            'skipped':      simulation.fast_forward.skipped
+        } if simulation.fast_forward else None,
+
+        'statistics':   vars(simulation.statistics) if simulation.statistics else None,
+
+        # Recorders may hold functions, which cannot be pickled
+        'recorder':     {key: value for key, value in vars(simulation.recorder).items() if key != 'watch'},
+
+        'store': {
+            'rows':     simulation.store.writer.rows,
+            'columns':  simulation.store.writer.columns,
+            'events':   len(simulation.store.events)
+        }
+    }
+
+# Sets the state of a simulation
+def set_state(simulation, state: dict) -> None:
+    ramjet = simulation.ramjet
+
+    for key, value in state['simulation'].items():
+        setattr(simulation, key, value)
+
+    # The spacetime exactly as it was, since it may keep more than the state shows, such as rapidity, which is lost
+    # through velocity near c. Then the stores; previews are restored afterwards, since setting the stores recomputes them
+    ramjet.spacetime.restore(state['ramjet']['spacetime'])
+    ramjet.set_stores(state['ramjet']['state'][5], state['ramjet']['state'][6], simulation.step)
+
+    for part in parts(ramjet):
+        part.preview = state['ramjet']['previews'][part.name]
+
+    vars(simulation.integrator).update(state['integrator'])
+    if simulation.fast_forward and state['fast_forward']:
+        vars(simulation.fast_forward).update(state['fast_forward'])
+    vars(simulation.recorder).update(state['recorder'])
+    if simulation.statistics and state['statistics']:
+        vars(simulation.statistics).update(state['statistics'])
+
+    simulation.store.resume(state['store']['rows'], state['store']['columns'], state['store']['events'])
+
+# The parts of a ramjet that keep previews
+def parts(ramjet) -> list:
+    return [ramjet.tank, ramjet.battery, ramjet.thruster, ramjet.scooper, ramjet.generator]
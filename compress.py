@@ -0,0 +1,286 @@
+# Compressed columns for a Store.
+# A compressed column is split into blocks of a fixed number of rows, each compressed on its own with a stdlib codec
+# and appended to the column's file. An index beside it holds the offset and size of each block, along with its first
+# and last value, so any range of rows, or of a rising column such as sim_time, is read by decompressing only the
+# blocks it covers. Blocks are compressed in a pool of threads, since zlib and lzma let go of the GIL while they work.
+# Floats compress poorly as they are; their bytes are shuffled first, so that the sign and exponent bytes of
+# every value, which change slowly, lie together. The last block may be short; it is rewritten as rows are added.
+#
+# Most columns of a run hardly change: capacities and powers are the same for the whole run, and throttles sit at 1
+# for millions of steps. With encoding on, each block is encoded before it is compressed, in whichever way suits it,
+# and a byte at its start says which:
+#   plain:  the values, shuffled
+#   delta:  the differences between the bits of successive values as integers, shuffled. Smooth columns, such as
+#           position and time, change by similar amounts each row, so their differences share most of their bytes.
+#           Integer differences wrap around and add back exactly, so nothing is lost
+#   runs:   the rows at which the value changes and the values from there on, for blocks that rarely change.
+#           A column that never changes is one run per block
+# Columns may also be stored as float32, which loses precision, so it is only done for the columns named
+
+import os
+import zlib
+import lzma
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# An entry of a column's index, one per block
+index: np.dtype = np.dtype([('offset', '<i8'), ('size', '<i8'), ('first', '<f8'), ('last', '<f8')])
+
+# Codec name -> compress function of bytes and level, decompress function, and default level
+codecs: dict = {
+    'zlib': (lambda data, level: zlib.compress(data, level), zlib.decompress, 6),
+    'lzma': (lambda data, level: lzma.compress(data, preset = level), lzma.decompress, 6)
+}
+
+# Encodings of a block, in the order of the byte that marks them
+encodings: list[str] = ['plain', 'delta', 'runs']
+
+# A block is stored as runs when it has fewer than one per this many rows
+sparsity: int = 16
+
+# Compression describes how the columns of a store are compressed
+class Compression:
+    def __init__(self, codec: str = 'zlib', level: int = None, block: int = 2 ** 16, shuffle: bool = True, encode: bool = True, downcast: list[str] = None, workers: int = None) -> None:
+        assert codec in codecs, f'No such codec \'{codec}\'; there are {", ".join(codecs)}'
+
+        self.codec: str = codec
+        self.level: int = codecs[codec][2] if level is None else level
+
+        # Rows per block
+        self.block: int = block
+
+        # Whether the bytes of values are shuffled before compressing
+        self.shuffle: bool = shuffle
+
+        # Whether blocks are encoded as runs or differences where that is smaller, and the columns kept as float32
+        self.encode: bool = encode
+        self.downcast: list[str] = list(downcast) if downcast else []
+
+        # Number of threads that compress; defaults to all cores
+        self.workers: int = workers if workers else os.cpu_count()
+
+    def __str__(self) -> str:
+        return f'{self.codec} (level {self.level}, {self.block} rows per block{", encoded" if self.encode else ""})'
+
+    # The type a column is stored as
+    def dtype(self, key: str, dtype: np.dtype) -> np.dtype:
+        return np.dtype('<f4') if key in self.downcast and np.dtype(dtype).kind == 'f' else np.dtype(dtype)
+
+    # Compresses a block of values, encoding it first if encoding is on
+    def compress(self, values: np.ndarray) -> bytes:
+        values = np.ascontiguousarray(values)
+        if not self.encode:
+            return self.pack(values)
+
+        # Values compared by their bits, so that nan equals nan
+        bits = values.view(f'<i{values.itemsize}')
+        changes = np.flatnonzero(bits[1:] != bits[:-1]) + 1
+
+        if len(changes) < len(values) // sparsity:
+            starts = np.concatenate(([0], changes)).astype('<i8')
+            return bytes([encodings.index('runs')]) + np.array([len(values), len(starts)], dtype = '<i8').tobytes() + self.pack(np.concatenate((starts.view(np.uint8), values[starts].view(np.uint8))))
+
+        # Plain or delta, whichever is smaller; the first difference is from zero, so it is the first value
+        plain = self.pack(values)
+        delta = self.pack(np.diff(bits, prepend = bits.dtype.type(0)))
+
+        return bytes([encodings.index('plain')]) + plain if len(plain) <= len(delta) else bytes([encodings.index('delta')]) + delta
+
+    # Decompresses a block of values of some type
+    def decompress(self, data: bytes, dtype: np.dtype) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if not self.encode:
+            return self.unpack(data, dtype)
+
+        encoding = encodings[data[0]]
+
+        if encoding == 'plain':
+            return self.unpack(data[1:], dtype)
+
+        if encoding == 'delta':
+            differences = self.unpack(data[1:], np.dtype(f'<i{dtype.itemsize}'))
+            return np.cumsum(differences, dtype = differences.dtype).view(dtype)
+
+        # Runs: each value repeats until the next run starts
+        rows, runs = np.frombuffer(data[1:17], dtype = '<i8')
+        unpacked = self.unpack(data[17:], np.dtype(np.uint8))
+        starts = unpacked[:8 * runs].view('<i8')
+        values = unpacked[8 * runs:].view(dtype)
+
+        return np.repeat(values, np.diff(starts, append = rows))
+
+    # Compresses an array as it is, shuffling its bytes if asked
+    def pack(self, values: np.ndarray) -> bytes:
+        data = np.ascontiguousarray(values)
+        if self.shuffle:
+            data = data.view(np.uint8).reshape(-1, data.itemsize).T
+
+        return codecs[self.codec][0](data.tobytes(), self.level)
+
+    # Decompresses an array packed as it was
+    def unpack(self, data: bytes, dtype: np.dtype) -> np.ndarray:
+        data = np.frombuffer(codecs[self.codec][1](data), dtype = np.uint8)
+        if self.shuffle:
+            data = data.reshape(dtype.itemsize, -1).T.copy()
+
+        return data.view(dtype).reshape(-1)
+
+    def get_preview(self) -> dict:
+        return {
+            'codec':    self.codec,
+            'level':    self.level,
+            'block':    self.block,
+            'shuffle':  self.shuffle,
+            'encode':   self.encode,
+            'downcast': self.downcast
+        }
+
+# Makes a Compression from its preview, as kept in a store's header; None if the store is not compressed.
+# Stores compressed before blocks were encoded have no 'encode' in their header
+def from_preview(preview: dict) -> Compression:
+    return Compression(**{'encode': False, **preview}) if preview else None
+
+
+
+# A compressed Column, as written by a store's writer
+class Column:
+    def __init__(self, file: str, key: str, compression: Compression, dtype: np.dtype) -> None:
+        self.file: str = file
+        self.key: str = key
+        self.compression: Compression = compression
+        self.dtype: np.dtype = np.dtype(dtype)
+
+        # Whole blocks on disk, and the byte at which the next block starts
+        self.blocks: int = 0
+        self.end: int = 0
+
+        # Rows of the short block at the end, which is on disk but gets rewritten
+        self.pending: np.ndarray = np.empty(0, dtype = self.dtype)
+
+        # Creates the files
+        for path in (data_path(file, key), index_path(file, key)):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+
+    # Hands the blocks that some rows complete to a pool to be compressed.
+    # Returns the blocks and their futures, for write
+    def compress(self, values: np.ndarray, pool: ThreadPoolExecutor) -> tuple[list[np.ndarray], list[Future]]:
+        values = np.concatenate((self.pending, values.astype(self.dtype, copy = False)))
+
+        size = self.compression.block
+        blocks = [values[start:start + size] for start in range(0, len(values), size)]
+
+        return blocks, [pool.submit(self.compression.compress, block) for block in blocks]
+
+    # Writes compressed blocks in place of the short block at the end
+    def write(self, blocks: list[np.ndarray], futures: list[Future]) -> None:
+        entries = np.empty(len(blocks), dtype = index)
+        offset = self.end
+
+        with open(data_path(self.file, self.key), 'r+b') as file:
+            file.seek(offset)
+
+            for entry, block, future in zip(entries, blocks, futures):
+                data = future.result()
+                file.write(data)
+
+                entry['offset'] = offset
+                entry['size'] = len(data)
+                entry['first'] = block[0] if len(block) else np.nan
+                entry['last'] = block[-1] if len(block) else np.nan
+                offset += len(data)
+
+            file.truncate(offset)
+
+        with open(index_path(self.file, self.key), 'r+b') as file:
+            file.seek(self.blocks * index.itemsize)
+            entries.tofile(file)
+            file.truncate(file.tell())
+
+        # The last block stays pending if it is short
+        whole = len(blocks) if not blocks or len(blocks[-1]) == self.compression.block else len(blocks) - 1
+
+        self.blocks += whole
+        self.end = int(entries[whole]['offset']) if whole < len(blocks) else offset
+        self.pending = blocks[-1].copy() if whole < len(blocks) else np.empty(0, dtype = self.dtype)
+
+    # Cuts the column back to a number of rows, keeping the rows of a short last block pending
+    def resume(self, rows: int) -> None:
+        size = self.compression.block
+        entries = read_index(self.file, self.key)[:-(-rows // size)]
+
+        # The byte at which the short block, or the next block, starts
+        self.blocks = rows // size
+        if self.blocks < len(entries):
+            self.end = int(entries[self.blocks]['offset'])
+        else:
+            self.end = int(entries[-1]['offset'] + entries[-1]['size']) if len(entries) else 0
+
+        # The short block may hold rows written after the point resumed to; it is written again without them
+        if rows % size:
+            with open(data_path(self.file, self.key), 'rb') as file:
+                file.seek(self.end)
+                block = self.compression.decompress(file.read(int(entries[self.blocks]['size'])), self.dtype)
+
+            self.pending = np.empty(0, dtype = self.dtype)
+            self.write([block[:rows % size]], [completed(self.compression.compress(block[:rows % size]))])
+        else:
+            for path, length in ((data_path(self.file, self.key), self.end), (index_path(self.file, self.key), self.blocks * index.itemsize)):
+                with open(path, 'r+b') as file:
+                    file.truncate(length)
+
+            self.pending = np.empty(0, dtype = self.dtype)
+
+
+
+# Reads rows of a compressed column between two rows, decompressing only the blocks they lie in
+def read(file: str, key: str, dtype: np.dtype, compression: Compression, start: int, stop: int) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    if start >= stop:
+        return np.empty(0, dtype = dtype)
+
+    size = compression.block
+    entries = read_index(file, key)
+    first, last = start // size, (stop - 1) // size
+
+    with open(data_path(file, key), 'rb') as data:
+        data.seek(int(entries[first]['offset']))
+        blob = data.read(int(entries[last]['offset'] + entries[last]['size'] - entries[first]['offset']))
+
+    # Decompresses each block from the bytes read
+    blocks = []
+    for entry in entries[first:last + 1]:
+        offset = int(entry['offset'] - entries[first]['offset'])
+        blocks.append(compression.decompress(blob[offset:offset + int(entry['size'])], dtype))
+
+    return np.concatenate(blocks)[start - first * size:stop - first * size]
+
+# Finds where a value would go in a compressed column that rises with its rows, as np.searchsorted does.
+# The index narrows it down to one block, which is the only one decompressed
+def search(file: str, key: str, dtype: np.dtype, compression: Compression, rows: int, value: float, side: str) -> int:
+    entries = read_index(file, key)
+
+    # The first block whose last value is past the value
+    block = int(np.searchsorted(entries['last'], value, side))
+    if block >= len(entries):
+        return rows
+
+    values = read(file, key, dtype, compression, block * compression.block, min((block + 1) * compression.block, rows))
+    return block * compression.block + int(np.searchsorted(values, value, side))
+
+# Reads a column's index
+def read_index(file: str, key: str) -> np.ndarray:
+    return np.fromfile(index_path(file, key), dtype = index)
+
+# A future that is already done, for blocks compressed on the spot
+def completed(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+# Returns the paths to a compressed column's blocks and its index
+def data_path(file: str, key: str) -> str:
+    return os.path.join(file, f'{key}.bin')
+
+def index_path(file: str, key: str) -> str:
+    return os.path.join(file, f'{key}.index')
@@ -0,0 +1,244 @@
+# Converts legacy text stores into the columnar format of store.py, in parallel.
+# There are two legacy formats, both with the metadata on the first line:
+#   - snapshots:    one dictionary per line, as the old Store.write wrote a run
+#   - flattened:    one 'key:[values]' line per column, as the old Store.flatten_file wrote it
+# The file is split into byte ranges on line boundaries, or on commas within a flattened column, and
+# the ranges are parsed in a process pool. Floats are parsed a whole range at a time by NumPy
+
+import os
+import re
+import json
+import time
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from store import Store
+from compress import Compression
+
+# A scalar value in a snapshot, the text after ': ' that is not a nested dictionary
+scalar: re.Pattern = re.compile(r': ([^,{}]+)')
+
+class Converter:
+    def __init__(self, workers: int = None, chunk_bytes: int = 2 ** 24, compression: Compression = None) -> None:
+
+        # Number of processes; defaults to all cores
+        self.workers: int = workers if workers else os.cpu_count()
+
+        # Bytes of text in each range handed to a worker
+        self.chunk_bytes: int = chunk_bytes
+
+        # How the stores are compressed, if they are
+        self.compression: Compression = compression
+
+        # Bytes converted, seconds taken and rows written by the last conversion
+        self.bytes: int = 0
+        self.time: float = 0
+        self.rows: int = 0
+
+    def __str__(self) -> str:
+        return f'{self.bytes / 1e6:.1f} MB and {self.rows} rows in {self.time:.2f} s ({self.throughput():.1f} MB/s)'
+
+    # Calling a Converter converts a legacy file into a store, and returns the store
+    def __call__(self, legacy: str, file: str) -> Store:
+        start = time.perf_counter()
+
+        with open(legacy, 'rb') as text:
+            first = text.readline().decode()
+            offset = text.tell()
+
+        # Flattened files start with the metadata as a column named metadata
+        if first.startswith('metadata:'):
+            store = Store(file, parse(first.split(':', 1)[1]), compression = self.compression)
+            self.flattened(legacy, offset, store)
+        else:
+            store = Store(file, parse(first), compression = self.compression)
+            self.snapshots(legacy, offset, store)
+
+        store.close()
+
+        self.bytes = os.path.getsize(legacy)
+        self.time = time.perf_counter() - start
+        self.rows = store.rows
+
+        return store
+
+    # Megabytes converted per second by the last conversion
+    def throughput(self) -> float:
+        return self.bytes / 1e6 / self.time if self.time else 0
+
+    # Converts a file of snapshots; each range of lines becomes a chunk of rows, in order
+    def snapshots(self, legacy: str, offset: int, store: Store) -> None:
+        jobs = [(legacy, start, stop) for start, stop in ranges(legacy, offset, os.path.getsize(legacy), b'\n', self.chunk_bytes)]
+
+        with ProcessPoolExecutor(max_workers = self.workers) as pool:
+            for columns, rows in pool.map(parse_snapshots, jobs):
+                if rows:
+                    store.add_chunk(columns, rows)
+
+    # Converts a flattened file. Columns are parsed into scratch files first, since a store is written row-wise;
+    # columns that start late, such as part previews, are shorter, and are padded with nan at the front
+    def flattened(self, legacy: str, offset: int, store: Store) -> None:
+        scratch = os.path.join(store.file, 'convert')
+        os.makedirs(scratch, exist_ok = True)
+
+        # Each column's values are split into ranges on commas
+        jobs = []
+        keys = []
+        for key, start, stop in columns(legacy, offset):
+            keys.append(key)
+            jobs += [(legacy, begin, end, key) for begin, end in ranges(legacy, start, stop, b',', self.chunk_bytes)]
+
+        # Appends each range to its column's scratch file as it arrives, in order
+        lengths = dict.fromkeys(keys, 0)
+        with ProcessPoolExecutor(max_workers = self.workers) as pool:
+            for key, values in zip((job[3] for job in jobs), pool.map(parse_values, jobs)):
+                with open(os.path.join(scratch, f'{keys.index(key)}.bin'), 'ab') as file:
+                    values.tofile(file)
+                lengths[key] += len(values)
+
+        # Hands the columns to the store a chunk of rows at a time
+        rows = max(lengths.values(), default = 0)
+        data = {key: np.memmap(os.path.join(scratch, f'{index}.bin'), dtype = '<f8', mode = 'r') if lengths[key] else np.empty(0) for index, key in enumerate(keys)}
+
+        for start in range(0, rows, store.chunk_size):
+            stop = min(start + store.chunk_size, rows)
+            store.add_chunk({key: pad(column, rows, start, stop) for key, column in data.items()}, stop - start)
+
+        # The writer must be done with the scratch files before they go
+        store.write()
+        del data
+        shutil.rmtree(scratch)
+
+
+
+# Splits a range of a file into ranges of at least some size, each ending at a separator, which the next range skips
+def ranges(legacy: str, start: int, stop: int, separator: bytes, size: int) -> list[tuple[int, int]]:
+    found = []
+
+    with open(legacy, 'rb') as file:
+        while stop - start > size:
+
+            # Looks for the next separator after the size
+            end = start + size
+            file.seek(end)
+            while end < stop:
+                block = file.read(min(2 ** 16, stop - end))
+                index = block.find(separator)
+                if index >= 0:
+                    end += index
+                    break
+                end += len(block)
+
+            found.append((start, min(end, stop)))
+            start = end + 1
+
+    if start < stop:
+        found.append((start, stop))
+
+    return found
+
+# Finds each column of a flattened file, as its key and the byte range of its values between the brackets
+def columns(legacy: str, offset: int) -> list[tuple[str, int, int]]:
+    found = []
+
+    with open(legacy, 'rb') as file:
+        file.seek(offset)
+
+        # Lines may be very long, so only the start of each is read here
+        while True:
+            start = file.tell()
+            head = file.read(4096)
+            if not head:
+                break
+
+            key, bracket = head.split(b':', 1)[0], head.index(b'[')
+
+            # Finds the end of the line
+            file.seek(start)
+            end = start
+            while True:
+                block = file.read(2 ** 20)
+                newline = block.find(b'\n')
+                if newline >= 0 or not block:
+                    end += newline if newline >= 0 else len(block)
+                    break
+                end += len(block)
+
+            # The values, without the brackets
+            found.append((key.decode(), start + bracket + 1, end - 1))
+
+            file.seek(end + 1)
+
+    return found
+
+# Parses one line of a legacy file as a dictionary, as Store.parse_legacy does
+def parse(line: str) -> dict:
+    return json.loads(line.replace("'", '"'))
+
+# The last rows of a column, padded with nan at the front to a number of rows, between two rows
+def pad(column: np.ndarray, rows: int, start: int, stop: int) -> np.ndarray:
+    missing = rows - len(column)
+    if missing <= start:
+        return column[start - missing:stop - missing]
+
+    return np.concatenate((np.full(min(missing, stop) - start, np.nan), column[max(start - missing, 0):max(stop - missing, 0)]))
+
+
+
+# Parses a range of values of a flattened column; runs in a worker process
+def parse_values(job: tuple) -> np.ndarray:
+    legacy, start, stop, key = job
+
+    with open(legacy, 'rb') as file:
+        file.seek(start)
+        text = file.read(stop - start).decode()
+
+    return np.fromstring(text, sep = ',')
+
+# Parses a range of snapshot lines into columns; runs in a worker process.
+# Lines with the same layout, which is nearly all of them, have their values pulled out as text and parsed together
+def parse_snapshots(job: tuple) -> tuple[dict, int]:
+    legacy, start, stop = job
+
+    with open(legacy, 'rb') as file:
+        file.seek(start)
+        lines = file.read(stop - start).decode().splitlines()
+
+    # Layout of each line, as the line with its values taken out, mapped to its keys and the values of each line
+    layouts = {}
+    for row, line in enumerate(lines):
+        if not line.strip():
+            continue
+
+        layout = scalar.sub(': ', line)
+        if not layout in layouts:
+            layouts[layout] = (flatten(parse(line)), [], [])
+
+        keys, rows, values = layouts[layout]
+        rows.append(row)
+        values += scalar.findall(line)
+
+    # Puts each layout's values into their rows of the columns
+    columns = {}
+    for layout, (keys, rows, values) in layouts.items():
+        parsed = np.fromstring(','.join(values), sep = ',')
+        assert len(parsed) == len(keys) * len(rows), f'Values of legacy file {legacy} are not all numbers'
+
+        parsed = parsed.reshape(len(rows), len(keys))
+        for index, key in enumerate(keys):
+            if not key in columns:
+                columns[key] = np.full(len(lines), np.nan)
+            columns[key][rows] = parsed[:, index]
+
+    return columns, len(lines)
+
+# The flattened keys of a snapshot, in order, as in Store.recursive_flatten
+def flatten(data: dict, path: str = '') -> list[str]:
+    keys = []
+    for key, item in data.items():
+        if isinstance(item, dict):
+            keys += flatten(item, f'{path}{key}-')
+        else:
+            keys.append(f'{path}{key}')
+
+    return keys
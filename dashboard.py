@@ -0,0 +1,157 @@
+# A live view of a running simulation, drawn with pygame in its own process.
+# It reads snapshots from a telemetry Feed at the simulation's framerate, so rendering never holds up the integrator
+
+import multiprocessing
+from collections import deque
+import numpy as np
+from telemetry import Feed, Reader
+
+# Size of the window, and colours
+width: int = 900
+height: int = 520
+background: tuple = (12, 14, 22)
+foreground: tuple = (220, 224, 235)
+accent: tuple = (90, 170, 255)
+warning: tuple = (255, 140, 70)
+
+# Gauges drawn as bars: label, key of the value and key of its maximum, or the maximum itself
+gauges: list[tuple] = [
+    ('Fuel',            'ramjet-parts-tank-fuel',                   'ramjet-parts-tank-capacity'),
+    ('Battery',         'ramjet-parts-battery-fuel',                'ramjet-parts-battery-capacity'),
+    ('Fuel throttle',   'ramjet-parts-thruster-fuel_throttle',      1),
+    ('Power throttle',  'ramjet-parts-thruster-power_throttle',     1),
+    ('Scoop throttle',  'ramjet-parts-scoop-power_throttle',        1)
+]
+
+class Dashboard:
+    def __init__(self, name: str, size: int, keys: list[str], framerate: float, trail: int = 4096) -> None:
+
+        # Where to read snapshots from
+        self.reader: Reader = Reader(name, size, keys)
+        self.index: dict = {key: index for index, key in enumerate(keys)}
+
+        # Milliseconds per frame
+        self.framerate: float = framerate
+
+        # The latest snapshot, and the path of the craft so far
+        self.latest: np.ndarray = None
+        self.trail: deque = deque(maxlen = trail)
+
+        # Speed over the trail, for the velocity plot
+        self.speeds: deque = deque(maxlen = trail)
+
+    # Calling a Dashboard opens the window and draws until it is closed
+    def __call__(self) -> None:
+        import pygame
+
+        pygame.init()
+        screen = pygame.display.set_mode((width, height))
+        pygame.display.set_caption('Ion ramjet telemetry')
+        font = pygame.font.SysFont('monospace', 15)
+        clock = pygame.time.Clock()
+
+        running = True
+        while running:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+
+            self.update()
+
+            screen.fill(background)
+            if self.latest is not None:
+                self.draw(screen, font, pygame)
+
+            pygame.display.flip()
+            clock.tick(1000 / self.framerate)
+
+        self.reader.close()
+        pygame.quit()
+
+    # Reads the snapshots published since the last frame
+    def update(self) -> None:
+        rows = self.reader.read()
+        if len(rows) == 0:
+            return
+
+        self.latest = rows[-1]
+        for row in rows:
+            self.trail.append((self.get(row, 'ramjet-spacetime-pos_x'), self.get(row, 'ramjet-spacetime-pos_y')))
+            self.speeds.append((self.get(row, 'sim_time'), self.get(row, 'ramjet-spacetime-vel')))
+
+    # A value of a snapshot, or nan if it is not in the schema
+    def get(self, row: np.ndarray, key: str) -> float:
+        return float(row[self.index[key]]) if key in self.index else np.nan
+
+    def draw(self, screen, font, pygame) -> None:
+        row = self.latest
+
+        # Readouts
+        lines = [
+            f'Steps:     {self.get(row, "steps"):.0f}',
+            f'Sim time:  {self.get(row, "sim_time"):.3e} s',
+            f'Position:  {self.get(row, "ramjet-spacetime-pos"):.3e} m',
+            f'Velocity:  {self.get(row, "ramjet-spacetime-vel"):.3e} m/s',
+            f'Accel:     {self.get(row, "ramjet-spacetime-acc"):.3e} m/s^2',
+            f'Mass:      {self.get(row, "ramjet-mass"):.3e} kg',
+            'Finished' if self.reader.ended() else 'Running'
+        ]
+        for index, line in enumerate(lines):
+            screen.blit(font.render(line, True, foreground), (20, 20 + 22 * index))
+
+        # Gauges
+        for index, (label, key, maximum) in enumerate(gauges):
+            value = self.get(row, key)
+            maximum = self.get(row, maximum) if isinstance(maximum, str) else maximum
+            fraction = min(max(value / maximum, 0), 1) if maximum and value == value else 0
+
+            top = 200 + 40 * index
+            screen.blit(font.render(f'{label}', True, foreground), (20, top))
+            pygame.draw.rect(screen, foreground, (150, top, 200, 16), 1)
+            pygame.draw.rect(screen, accent if fraction > 0.1 else warning, (150, top, 200 * fraction, 16))
+
+        # Path of the craft and speed against time
+        self.plot(screen, font, pygame, self.trail, (380, 20, 500, 230), 'Position')
+        self.plot(screen, font, pygame, self.speeds, (380, 270, 500, 230), 'Velocity')
+
+    # Draws points scaled to fit a rectangle
+    def plot(self, screen, font, pygame, points: deque, area: tuple, title: str) -> None:
+        left, top, span_x, span_y = area
+        pygame.draw.rect(screen, foreground, area, 1)
+        screen.blit(font.render(title, True, foreground), (left + 5, top + 5))
+
+        if len(points) < 2:
+            return
+
+        xy = np.array(points)
+        xy = xy[np.isfinite(xy).all(axis = 1)]
+        if len(xy) < 2:
+            return
+
+        low, high = xy.min(axis = 0), xy.max(axis = 0)
+        scale = np.where(high > low, high - low, 1)
+        screen_x = left + 5 + (xy[:, 0] - low[0]) / scale[0] * (span_x - 10)
+        screen_y = top + span_y - 5 - (xy[:, 1] - low[1]) / scale[1] * (span_y - 10)
+
+        pygame.draw.lines(screen, accent, False, list(zip(screen_x, screen_y)))
+
+
+
+# Opens a Dashboard for a Feed in its own process, and returns the process.
+# Waits until it has attached to the feed's memory, since a short run would otherwise end, and unlink the memory,
+# before the process is up. The window stays open after the simulation ends, until it is closed
+def start(feed: Feed) -> multiprocessing.Process:
+    attached = multiprocessing.Event()
+    process = multiprocessing.Process(target = run, args = (feed.name, feed.size, feed.keys, feed.framerate, attached))
+    process.start()
+
+    while not attached.wait(0.1):
+        assert process.is_alive(), 'The dashboard exited before attaching to the feed'
+
+    return process
+
+# Runs a Dashboard, signalling once it has attached; runs in its own process
+def run(name: str, size: int, keys: list[str], framerate: float, attached) -> None:
+    dashboard = Dashboard(name, size, keys, framerate)
+    attached.set()
+    dashboard()
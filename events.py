@@ -0,0 +1,247 @@
+# Events are conditions that end a run or mark a change in it, such as the tank running dry.
+# Each is a function of the simulation that changes sign when the event happens. After every step the functions are
+# compared with their values before it; when one has crossed zero, the step is taken again from the same state with
+# shorter and shorter lengths until the crossing is pinned down, so large or adaptive steps still land on the event.
+# The root is found with the Illinois variant of regula falsi, which falls back to bisection for functions that
+# stop at zero, as the tank and battery do. Every event is logged in the store
+
+from finkchlib.constants import c
+from math import hypot
+import numpy as np
+
+# An Event is a function of the simulation whose root is the event
+class Event:
+    def __init__(self, name: str, function, terminal: bool = False, direction: int = 0) -> None:
+        self.name: str = name
+        self.function = function
+
+        # Whether the simulation ends when the event happens
+        self.terminal: bool = terminal
+
+        # Which crossings count: 1 when rising through zero, -1 when falling, 0 for both
+        self.direction: int = direction
+
+    def __str__(self) -> str:
+        return self.name
+
+    # Calling an Event evaluates its function
+    def __call__(self, simulation) -> float:
+        return self.function(simulation)
+
+    # Whether the event happened between two values of its function
+    def crossed(self, before: float, after: float) -> bool:
+        if self.direction >= 0 and before < 0 <= after:
+            return True
+        if self.direction <= 0 and before > 0 >= after:
+            return True
+
+        return False
+
+    def get_preview(self) -> dict:
+        return {
+            'name':         self.name,
+            'terminal':     self.terminal,
+            'direction':    self.direction
+        }
+
+
+
+# Events watches a simulation for a list of events
+class Events:
+    def __init__(self, events: list[Event], tolerance: float = 1e-9, iterations: int = 100) -> None:
+        self.events: list[Event] = events
+
+        # An event is located to within this fraction of the step it happens in, or after so many tries
+        self.tolerance: float = tolerance
+        self.iterations: int = iterations
+
+        # The craft and the functions before the step, to go back to
+        self.state: tuple = None
+        self.values: list[float] = []
+
+        # The live row before a jump, since fast-forward also changes telemetry
+        self.row: np.ndarray = None
+
+        # Events that happened in the last step, to be logged
+        self.fired: list[Event] = []
+
+        # Steps left during which fast-forward is held off, after a jump went past an event
+        self.held: int = 0
+
+        # Number of steps that were cut short, and of jumps that were undone
+        self.located: int = 0
+        self.undone: int = 0
+
+    def __str__(self) -> str:
+        return ', '.join(str(event) for event in self.events)
+
+    # Keeps the state before a step
+    def save(self, simulation) -> None:
+        self.state = save(simulation.ramjet)
+        self.values = [event(simulation) for event in self.events]
+
+    # Calling Events after a step cuts it short at the first event within it.
+    # Returns the step taken
+    def __call__(self, simulation, taken: float) -> float:
+        crossed = [index for index, event in enumerate(self.events) if event.crossed(self.values[index], event(simulation))]
+        if not crossed:
+            return taken
+
+        # Locates each event in turn within what is left of the step, so the last one found is the earliest
+        for number, index in enumerate(crossed):
+            if number:
+                self.trial(simulation, taken)
+                if not self.events[index].crossed(self.values[index], self.events[index](simulation)):
+                    continue
+
+            taken = self.locate(simulation, self.events[index], self.values[index], taken)
+
+        # Ends the step at the earliest event; others that happened at the same time fire with it
+        taken = self.trial(simulation, taken)
+        self.fired = [event for event, value in zip(self.events, self.values) if event.crossed(value, event(simulation))]
+        self.located += 1
+
+        return taken
+
+    # Finds the shortest step after which an event has happened, given that it has after the step taken
+    def locate(self, simulation, event: Event, before: float, high: float) -> float:
+        low, value_low = 0, before
+        value_high = event(simulation)
+
+        # Which end moved last; when the same end moves twice, the other end's value is halved (Illinois)
+        side = 0
+
+        for iteration in range(self.iterations):
+            if high - low <= self.tolerance * high:
+                break
+
+            # Where the line through the ends crosses zero, or halfway if that is not strictly between them
+            trial = high - value_high * (high - low) / (value_high - value_low) if value_high != value_low else low
+            if not low < trial < high:
+                trial = (low + high) / 2
+
+            trial = self.trial(simulation, trial)
+            value = event(simulation)
+
+            if event.crossed(before, value):
+                high, value_high = trial, value
+                if side == 1:
+                    value_low /= 2
+                side = 1
+            else:
+                low, value_low = trial, value
+                if side == -1:
+                    value_high /= 2
+                side = -1
+
+        return high
+
+    # Takes a step of some length from the state before the step. Returns the step taken
+    def trial(self, simulation, step: float) -> float:
+        restore(simulation.ramjet, self.state)
+        taken, following = simulation.integrator(simulation.ramjet, step)
+
+        return taken
+
+    # Fast-forwards the simulation, unless an event would happen within the jump.
+    # Then the jump is undone and fast-forward is held off for as many steps, so the event is stepped into and located.
+    # Returns the number of steps skipped
+    def jump(self, simulation) -> int:
+        fast_forward = simulation.fast_forward
+
+        # An event has just happened, and the state must stay there until it is logged
+        if self.fired:
+            return 0
+
+        if self.held:
+            self.held -= 1
+            return 0
+
+        self.save(simulation)
+        if self.row is None:
+            self.row = np.empty_like(simulation.schema.flat)
+        self.row[:] = simulation.schema.flat
+        jumps, skipped = dict(fast_forward.jumps), dict(fast_forward.skipped)
+
+        steps = fast_forward(simulation)
+        if steps and any(event.crossed(value, event(simulation)) for event, value in zip(self.events, self.values)):
+            restore(simulation.ramjet, self.state)
+            simulation.schema.flat[:] = self.row
+            fast_forward.jumps, fast_forward.skipped = jumps, skipped
+
+            self.held = steps + 1
+            self.undone += 1
+
+            return 0
+
+        return steps
+
+    # Logs the events that happened in the last step, ending the simulation if any is terminal.
+    # The step of an event is always recorded
+    def log(self, simulation) -> None:
+        if not self.fired:
+            return
+
+        for event in self.fired:
+            simulation.store.add_event({
+                'name':         event.name,
+                'terminal':     event.terminal,
+                'steps':        simulation.steps,
+                'sim_time':     simulation.sim_time,
+                'time':         simulation.ramjet.spacetime.time
+            })
+
+            if event.terminal:
+                simulation.exist = False
+
+        if simulation.exist and simulation.recorded != simulation.steps:
+            simulation.record()
+
+        self.fired = []
+
+    def get_preview(self) -> dict:
+        return {
+            'events':       [event.get_preview() for event in self.events],
+            'tolerance':    self.tolerance,
+            'located':      self.located,
+            'undone':       self.undone
+        }
+
+
+
+# The state of a craft that a step changes, as plain floats
+def save(ramjet) -> tuple:
+    return ramjet.spacetime.save(), ramjet.tank.fuel, ramjet.battery.fuel, ramjet.mass
+
+# Puts a craft back in a saved state
+def restore(ramjet, state: tuple) -> None:
+    spacetime, ramjet.tank.fuel, ramjet.battery.fuel, ramjet.mass = state
+    ramjet.spacetime.restore(spacetime)
+
+
+
+# The tank has run dry
+def tank_empty(terminal: bool = True) -> Event:
+    return Event('tank_empty', lambda simulation: simulation.ramjet.tank.fuel, terminal, -1)
+
+# The battery has run flat
+def battery_depleted(terminal: bool = False) -> Event:
+    return Event('battery_depleted', lambda simulation: simulation.ramjet.battery.fuel, terminal, -1)
+
+# The craft is some distance from the origin, in metres
+def distance(target: float, terminal: bool = True) -> Event:
+    return Event(f'distance {target:.3g} m', lambda simulation: hypot(simulation.ramjet.spacetime.pos_x, simulation.ramjet.spacetime.pos_y) - target, terminal, 1)
+
+# The craft moves at some fraction of the speed of light
+def fraction_of_c(fraction: float, terminal: bool = True) -> Event:
+    return Event(f'{fraction:.3g} c', lambda simulation: hypot(simulation.ramjet.spacetime.vel_x, simulation.ramjet.spacetime.vel_y) / c - fraction, terminal, 1)
+
+
+
+# Event name -> function of its parameters, returning the Event
+registry: dict = {
+    'tank_empty':       tank_empty,
+    'battery_depleted': battery_depleted,
+    'distance':         distance,
+    'fraction_of_c':    fraction_of_c
+}
@@ -0,0 +1,287 @@
+# Skips ahead analytically while a ramjet is in a regime with a closed-form solution.
+# The solutions follow the per-step model of the parts exactly, so jumping N steps gives the same state as
+# stepping N times, up to rounding. Dilation is frozen over a jump, and jumps are shortened until it barely changes.
+#
+# The regimes are:
+#   - coast:    the tank is empty and nothing is scooped up, so velocity is constant
+#   - steady:   both throttles are pinned at 1 and intake is negligible, which is the rocket equation
+#   - scooping: the tank is empty and everything scooped up is burnt at once, so velocity grows geometrically
+# A jump ends before scoop intake, the tank or the battery would change the regime
+
+from finkchlib.vector import Vector2
+import numpy as np
+
+class FastForward:
+    def __init__(self, max_jump: int = 10000, min_jump: int = 2, tolerance: float = 1e-9) -> None:
+
+        # Bounds on the number of steps in one jump
+        self.max_jump: int = max_jump
+        self.min_jump: int = min_jump
+
+        # Relative tolerance on intake, allignment and drift in dilation
+        self.tolerance: float = tolerance
+
+        # Number of jumps and steps skipped in each regime
+        self.jumps: dict = {'coast': 0, 'steady': 0, 'scooping': 0}
+        self.skipped: dict = {'coast': 0, 'steady': 0, 'scooping': 0}
+
+    def __str__(self) -> str:
+        return f'fast-forward (max jump {self.max_jump} steps)'
+
+    # Calling a FastForward jumps the simulation's ramjet ahead if it can.
+    # Returns the number of steps skipped
+    def __call__(self, simulation) -> int:
+        ramjet = simulation.ramjet
+        step = simulation.step
+
+        # The scoop needs to have acted at least once; the thruster has not if the tank was always empty
+        if not ramjet.scooper.acted():
+            return 0
+
+        # Never jumps past the end of the simulation
+        limit = min(self.max_jump, simulation.max_steps - simulation.steps)
+        if limit < self.min_jump:
+            return 0
+
+        # Finds the regime
+        if ramjet.tank.is_empty() and ramjet.scooper.get('m_H') == 0:
+            regime, jump = 'coast', self.coast
+        elif self.is_steady(ramjet, step):
+            regime, jump = 'steady', self.steady
+        elif self.is_scooping(ramjet, step):
+            regime, jump = 'scooping', self.scooping
+        else:
+            return 0
+
+        steps = jump(ramjet, step, limit)
+
+        if steps:
+            self.jumps[regime] += 1
+            self.skipped[regime] += steps
+
+        return steps
+
+    # Both throttles are full and intake is negligible next to the fuel burnt
+    def is_steady(self, ramjet, step: float) -> bool:
+        thruster = ramjet.thruster
+        scoop = ramjet.scooper
+
+        return thruster.acted() and thruster.get('fuel_throttle') == 1 and thruster.get('power_throttle') == 1 and scoop.get('power_throttle') == 1 \
+            and scoop.get('m_H') <= self.tolerance * ramjet.thruster.m_d * step \
+            and self.is_radial(ramjet)
+
+    # The tank is empty and the thruster burns only what the scoop took in
+    def is_scooping(self, ramjet, step: float) -> bool:
+        thruster = ramjet.thruster
+        scoop = ramjet.scooper
+
+        return thruster.acted() and ramjet.tank.is_empty() and scoop.get('m_H') > 0 \
+            and thruster.get('fuel_throttle') < 1 and thruster.get('power_throttle') == 1 and scoop.get('power_throttle') == 1 \
+            and self.is_radial(ramjet) and ramjet.spacetime.velocity.hypo() > 0
+
+    # Velocity points away from the origin, along the position, so thrust and allignment do not turn
+    def is_radial(self, ramjet) -> bool:
+        position = ramjet.spacetime.position
+        velocity = ramjet.spacetime.velocity
+
+        speed = velocity.hypo()
+        if speed == 0:
+            return True
+
+        cross = position.x * velocity.y - position.y * velocity.x
+        return abs(cross) <= self.tolerance * position.hypo() * speed and position ^ velocity > 0
+
+
+
+    # Constant velocity; the scoop draws power but takes nothing in
+    def coast(self, ramjet, step: float, limit: int) -> int:
+        position = ramjet.spacetime.position
+        velocity = ramjet.spacetime.velocity
+        dilation = ramjet.spacetime.dilation(velocity)
+
+        # Intake starts once the craft passes its closest approach to the origin and allignment becomes positive
+        speed = velocity.hypo()
+        if speed > 0 and self.intake(ramjet, step) > 0:
+            closest = -(position ^ velocity) / (speed ** 2 * dilation * step)
+            limit = min(limit, int(closest) - 1)
+
+        # The battery must keep the scoop at full throttle
+        steps = min(limit, self.battery_horizon(ramjet, step, ramjet.scooper.power))
+        if steps < self.min_jump:
+            return 0
+
+        # Jumps ahead
+        ramjet.spacetime.position = position + velocity * (steps * dilation * step)
+        ramjet.spacetime.time += steps * dilation * step
+        ramjet.spacetime.acceleration_preview = Vector2()
+
+        ramjet.battery.fuel = self.battery_after(ramjet, step, ramjet.scooper.power, steps)
+
+        return steps
+
+    # Constant thrust with mass falling by the same amount each step: the rocket equation
+    def steady(self, ramjet, step: float, limit: int) -> int:
+        position = ramjet.spacetime.position
+        speed = ramjet.spacetime.velocity.hypo()
+        dilation = ramjet.spacetime.dilation(ramjet.spacetime.velocity)
+
+        # Fuel burnt per step, and the thrust it makes, as in Thruster
+        burn = ramjet.thruster.m_d * step
+        thrust = burn * ramjet.thruster.v_e
+
+        # The tank must supply a full burn on every step; intake is ignored, which only shortens the jump
+        steps = min(limit, int(ramjet.tank.fuel / burn) - 1)
+
+        # The battery must power the thruster and scoop at full throttle
+        steps = min(steps, self.battery_horizon(ramjet, step, ramjet.scooper.power + ramjet.thruster.power * step))
+
+        # Shortens the jump until dilation barely changes over it
+        while steps >= self.min_jump:
+            gain = self.rocket(ramjet.mass, burn, ramjet.thruster.v_e, dilation * step, steps)
+            if abs(ramjet.spacetime.dilation(Vector2(speed + gain, 0)) - dilation) <= self.tolerance * dilation:
+                break
+            steps //= 2
+
+        if steps < self.min_jump:
+            return 0
+
+        # Velocity gained and distance travelled
+        gain = self.rocket(ramjet.mass, burn, ramjet.thruster.v_e, dilation * step, steps)
+        distance = dilation * step * (steps * speed + self.rocket_distance(ramjet.mass, burn, ramjet.thruster.v_e, dilation * step, steps))
+
+        # Scooping grows with speed; takes the average over the jump
+        intake = ramjet.scooper.get('m_H')
+        if speed > 0:
+            intake *= (speed + gain / 2) / speed
+
+        # Jumps ahead along the position
+        direction = position.normal()
+        ramjet.spacetime.position = position + direction * distance
+        ramjet.spacetime.velocity = direction * (speed + gain)
+        ramjet.spacetime.time += steps * dilation * step
+
+        ramjet.tank.fuel = ramjet.tank.fuel - steps * (burn - intake)
+        ramjet.battery.fuel = self.battery_after(ramjet, step, ramjet.scooper.power + ramjet.thruster.power * step, steps)
+        ramjet.update_mass()
+
+        ramjet.spacetime.acceleration_preview = direction * (thrust / ramjet.mass)
+        self.scale_intake(ramjet, speed, speed + gain)
+
+        return steps
+
+    # Everything scooped up in a step is burnt in that step, so each step multiplies velocity by 1 + rate
+    def scooping(self, ramjet, step: float, limit: int) -> int:
+        position = ramjet.spacetime.position
+        speed = ramjet.spacetime.velocity.hypo()
+        dilation = ramjet.spacetime.dilation(ramjet.spacetime.velocity)
+
+        # Intake per step per unit of speed, and the growth rate of speed it gives
+        intake = self.intake(ramjet, step)
+        rate = intake * ramjet.thruster.v_e * dilation * step / ramjet.mass
+
+        if rate <= 0:
+            return 0
+
+        # Intake must stay below a full burn, and the battery must power the scoop and thruster at full throttle
+        steps = min(limit, int(np.log(ramjet.thruster.m_d * step / (intake * speed)) / np.log1p(rate)) - 1)
+        steps = min(steps, self.battery_horizon(ramjet, step, ramjet.scooper.power + ramjet.thruster.power * step))
+
+        # Shortens the jump until dilation barely changes over it
+        while steps >= self.min_jump:
+            growth = np.expm1(steps * np.log1p(rate))
+            if abs(ramjet.spacetime.dilation(Vector2(speed * (1 + growth), 0)) - dilation) <= self.tolerance * dilation:
+                break
+            steps //= 2
+
+        if steps < self.min_jump:
+            return 0
+
+        # Velocity after the jump, and the distance travelled, a geometric series
+        growth = np.expm1(steps * np.log1p(rate))
+        final = speed * (1 + growth)
+        distance = dilation * step * speed * (1 + rate) * growth / rate
+
+        # Power drawn by the thruster in the last step, to refill the battery as Ramjet.refund does
+        m_H = intake * speed * (1 + growth) / (1 + rate)
+        throttle = m_H / (ramjet.thruster.m_d * step)
+        demand = ramjet.scooper.power + ramjet.thruster.power * step * throttle
+
+        # Jumps ahead along the position
+        direction = position.normal()
+        ramjet.spacetime.position = position + direction * distance
+        ramjet.spacetime.velocity = direction * final
+        ramjet.spacetime.time += steps * dilation * step
+        ramjet.spacetime.acceleration_preview = direction * (m_H * ramjet.thruster.v_e / ramjet.mass)
+
+        ramjet.battery.fuel = self.battery_after(ramjet, step, demand, steps)
+
+        ramjet.thruster.preview = {
+            'thrust': m_H * ramjet.thruster.v_e,
+            'fuel': m_H,
+            'fuel_throttle': throttle,
+            'power': ramjet.thruster.power * step * throttle,
+            'power_throttle': 1
+        }
+        self.scale_intake(ramjet, speed, speed * (1 + growth) / (1 + rate))
+
+        return steps
+
+
+
+    # Mass scooped up per step per unit of speed, at full throttle and allignment, as in Scoop.
+    # The medium is uniform while fast-forwarding, so its density anywhere will do
+    def intake(self, ramjet, step: float) -> float:
+        scoop = ramjet.scooper
+        return scoop.efficiency * np.pi * scoop.radius ** 2 * step * ramjet.ism(ramjet.spacetime.pos_x, ramjet.spacetime.pos_y)
+
+    # Scales the scoop's telemetry to a new speed
+    def scale_intake(self, ramjet, old: float, new: float) -> None:
+        if old > 0:
+            ramjet.scooper.set('m_H', ramjet.scooper.get('m_H') * new / old)
+            ramjet.scooper.set('volume', ramjet.scooper.get('volume') * new / old)
+
+    # Velocity gained after some steps of a constant burn.
+    # The per-step sum of thrust / mass is taken as an integral over mid-points, which is exact to second order
+    def rocket(self, mass: float, burn: float, v_e: float, step: float, steps: int) -> float:
+        start = mass - burn / 2
+        return step * v_e * np.log(start / (start - burn * steps))
+
+    # Sum of the velocity gained over every step of a constant burn, divided by the steps' length
+    def rocket_distance(self, mass: float, burn: float, v_e: float, step: float, steps: int) -> float:
+        start = mass - burn / 2
+
+        # Integral of the velocity gained from zero to some number of steps
+        def integral(n: float) -> float:
+            end = start - burn * n
+            return step * v_e * (n - end / burn * np.log(start / end))
+
+        return integral(steps + 0.5) - integral(0.5)
+
+    # Battery level after some steps, given the energy drawn each step after charging
+    def battery_after(self, ramjet, step: float, demand: float, steps: int) -> float:
+        supply = ramjet.generator.power * step
+        capacity = ramjet.battery.capacity
+
+        # The first step may be limited by capacity
+        level = min(ramjet.battery.fuel + supply, capacity) - demand
+
+        if supply >= demand:
+            return min(level + (steps - 1) * (supply - demand), capacity - demand)
+
+        return level - (steps - 1) * (demand - supply)
+
+    # Number of steps for which the battery can meet the demand at full throttle
+    def battery_horizon(self, ramjet, step: float, demand: float) -> int:
+        supply = ramjet.generator.power * step
+
+        if supply >= demand:
+            return self.max_jump
+
+        # Each step needs the battery to cover the shortfall
+        shortfall = demand - supply
+        level = min(ramjet.battery.fuel + supply, ramjet.battery.capacity) - demand
+
+        if ramjet.battery.fuel < shortfall or level < shortfall:
+            return 0
+
+        return 1 + int((level - shortfall) / shortfall)
@@ -0,0 +1,238 @@
+# Steps many ramjets at once.
+# A Fleet holds the state of N ramjets as arrays and applies the same logic as the parts in ramjet.py
+
+from finkchlib.constants import c
+from ramjet import Ramjet
+from ism import Uniform
+import numpy as np
+
+# A Fleet of ramjets, stored as a struct of arrays
+class Fleet:
+    def __init__(self, ramjets: list[Ramjet], ism = None, gravity = None) -> None:
+
+        self.names: list[str] = [ramjet.name for ramjet in ramjets]
+
+        # The medium the scoops sweep up, sampled for every craft at once; see ism.py
+        self.ism = ism if ism else Uniform()
+
+        # Gravity on every craft at once, if any; see gravity.py
+        self.gravity = gravity
+
+        # Mass
+        self.core_mass: np.ndarray = array(ramjet.core_mass for ramjet in ramjets)
+        self.mass: np.ndarray = array(ramjet.mass for ramjet in ramjets)
+
+        # Fuel storage
+        self.tank: np.ndarray = array(ramjet.tank.fuel for ramjet in ramjets)
+        self.tank_capacity: np.ndarray = array(ramjet.tank.capacity for ramjet in ramjets)
+        self.battery: np.ndarray = array(ramjet.battery.fuel for ramjet in ramjets)
+        self.battery_capacity: np.ndarray = array(ramjet.battery.capacity for ramjet in ramjets)
+
+        # Thrusters
+        self.thrust: np.ndarray = array(ramjet.thruster.thrust for ramjet in ramjets)
+        self.v_e: np.ndarray = array(ramjet.thruster.v_e for ramjet in ramjets)
+        self.m_d: np.ndarray = array(ramjet.thruster.m_d for ramjet in ramjets)
+        self.thruster_power: np.ndarray = array(ramjet.thruster.power for ramjet in ramjets)
+
+        # Scoops
+        self.scoop_power: np.ndarray = array(ramjet.scooper.power for ramjet in ramjets)
+        self.scoop_radius: np.ndarray = array(ramjet.scooper.radius for ramjet in ramjets)
+        self.scoop_efficiency: np.ndarray = array(ramjet.scooper.efficiency for ramjet in ramjets)
+
+        # Generators
+        self.generator_power: np.ndarray = array(ramjet.generator.power for ramjet in ramjets)
+
+        # Spacetime
+        self.time: np.ndarray = array(ramjet.spacetime.time for ramjet in ramjets)
+        self.pos_x: np.ndarray = array(ramjet.spacetime.position.x for ramjet in ramjets)
+        self.pos_y: np.ndarray = array(ramjet.spacetime.position.y for ramjet in ramjets)
+        self.vel_x: np.ndarray = array(ramjet.spacetime.velocity.x for ramjet in ramjets)
+        self.vel_y: np.ndarray = array(ramjet.spacetime.velocity.y for ramjet in ramjets)
+        self.acc_x: np.ndarray = array(ramjet.spacetime.acceleration_preview.x for ramjet in ramjets)
+        self.acc_y: np.ndarray = array(ramjet.spacetime.acceleration_preview.y for ramjet in ramjets)
+
+        # Part previews; nan until a part first acts, as in the Store
+        self.previews: dict = {key: np.full(len(self), np.nan) for key in preview_keys}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # One step of simulation for every craft
+    def __call__(self, step: float) -> None:
+
+        # Generates power
+        self.battery = np.minimum(self.battery + self.generator_power * step, self.battery_capacity)
+        self.previews['parts-generator-power'][:] = self.generator_power
+
+        # Scoops up hydrogen
+        self.scoop(step)
+
+        # Creates thrust
+        thrust_x, thrust_y = self.thruster(step)
+
+        # Updates mass
+        self.mass = self.core_mass + self.tank
+
+        # Applies thrust and gravity, and steps forward
+        acc_x, acc_y = thrust_x / self.mass, thrust_y / self.mass
+        if self.gravity:
+            gravity_x, gravity_y = self.gravity.sample(self.pos_x, self.pos_y)
+            acc_x, acc_y = acc_x + gravity_x, acc_y + gravity_y
+
+        self.spacetime(step, acc_x, acc_y)
+
+    # Scoops up H from the ISM
+    def scoop(self, step: float) -> None:
+
+        # Allignment of scoop to ISM; the product of norms being zero gives nan, which is no allignment
+        speed = np.hypot(self.vel_x, self.vel_y)
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            allignment = (self.pos_x * self.vel_x + self.pos_y * self.vel_y) / (np.hypot(self.pos_x, self.pos_y) * speed)
+        allignment = np.maximum(np.nan_to_num(allignment, nan = 0), 0)
+
+        # Power available to the scoop
+        self.battery, power, throttle = pipe_out(self.battery, self.scoop_power)
+
+        # Area of scoop and effective volume swept
+        area = np.pi * (self.scoop_radius * throttle) ** 2
+        V_eff = area * allignment * speed * step
+
+        # Mass of hydrogen scooped up is added to the tank
+        m_H = self.scoop_efficiency * V_eff * self.ism.sample(self.pos_x, self.pos_y)
+        self.tank = np.minimum(self.tank + m_H, self.tank_capacity)
+
+        # Updates the previews
+        self.previews['parts-scoop-m_H'][:] = m_H
+        self.previews['parts-scoop-power'][:] = power
+        self.previews['parts-scoop-power_throttle'][:] = throttle
+        self.previews['parts-scoop-allignment'][:] = allignment
+        self.previews['parts-scoop-area'][:] = area
+        self.previews['parts-scoop-volume'][:] = V_eff
+
+    # Converts fuel and power to thrust, returning the components of thrust
+    def thruster(self, step: float) -> tuple[np.ndarray, np.ndarray]:
+
+        # Crafts with an empty tank do not fire
+        firing = self.tank != 0
+
+        # Obtains some fuel and power
+        self.tank, fuel, fuel_throttle = pipe_out(self.tank, np.where(firing, self.m_d * step, 0))
+        self.battery, power, power_throttle = pipe_out(self.battery, np.where(firing, self.thruster_power * step, 0))
+
+        # Refunds spare fuel or power when throttles don't match; same as Ramjet.refund
+        power_limited = power_throttle < fuel_throttle
+        fuel_limited = fuel_throttle < power_throttle
+
+        fuel_effective = np.where(power_limited, fuel * power_throttle / fuel_throttle, fuel)
+        power_effective = np.where(fuel_limited, power * fuel_throttle / np.where(fuel_limited, power_throttle, 1), power)
+
+        self.tank = np.minimum(self.tank + fuel - fuel_effective, self.tank_capacity)
+        self.battery = np.minimum(self.battery + power - power_effective, self.battery_capacity)
+
+        # The thrust generated
+        thrust = fuel_effective * self.v_e
+
+        # Updates the previews of crafts that fired
+        self.previews['parts-thruster-thrust'][firing] = thrust[firing]
+        self.previews['parts-thruster-fuel'][firing] = fuel_effective[firing]
+        self.previews['parts-thruster-fuel_throttle'][firing] = fuel_throttle[firing]
+        self.previews['parts-thruster-power'][firing] = power_effective[firing]
+        self.previews['parts-thruster-power_throttle'][firing] = power_throttle[firing]
+
+        # Thrust is oriented along the craft's position
+        phi = np.arctan2(self.pos_y, self.pos_x)
+        return thrust * np.cos(phi), thrust * np.sin(phi)
+
+    # Steps the crafts' spacetime forward, with relativistic dilation
+    def spacetime(self, step: float, acc_x: np.ndarray, acc_y: np.ndarray) -> None:
+
+        # Same as RelativisticSpacetime.gamma
+        beta = np.hypot(self.vel_x, self.vel_y) / c
+        step_size = step * np.sqrt(1 - beta ** 2)
+
+        # Increases time experienced
+        self.time += step_size
+
+        # Updates postion and velocity
+        self.vel_x += acc_x * step_size
+        self.vel_y += acc_y * step_size
+        self.pos_x += self.vel_x * step_size
+        self.pos_y += self.vel_y * step_size
+
+        self.acc_x = acc_x
+        self.acc_y = acc_y
+
+    # Returns the flattened previews of every craft, keyed as in the Store without the 'ramjet-' prefix
+    def get_previews(self) -> dict:
+        return {
+            'parts-tank-fuel':              self.tank,
+            'parts-tank-capacity':          self.tank_capacity,
+            'parts-battery-fuel':           self.battery,
+            'parts-battery-capacity':       self.battery_capacity,
+            **self.previews,
+            'spacetime-time':               self.time,
+            'spacetime-pos':                np.hypot(self.pos_x, self.pos_y),
+            'spacetime-pos_x':              self.pos_x,
+            'spacetime-pos_y':              self.pos_y,
+            'spacetime-vel':                np.hypot(self.vel_x, self.vel_y),
+            'spacetime-vel_x':              self.vel_x,
+            'spacetime-vel_y':              self.vel_y,
+            'spacetime-acc':                np.hypot(self.acc_x, self.acc_y),
+            'spacetime-acc_x':              self.acc_x,
+            'spacetime-acc_y':              self.acc_y,
+            'mass':                         self.mass
+        }
+
+    # Returns the preview of a single craft, in the same form as Ramjet.get_previews
+    def get_preview(self, index: int) -> dict:
+        preview = {'parts': {}, 'spacetime': {}}
+
+        for key, values in self.get_previews().items():
+            path = key.split('-')
+
+            # Walks down to the dictionary holding this key
+            level = preview
+            for name in path[:-1]:
+                level = level.setdefault(name, {})
+
+            # Parts that have not acted yet have an empty preview
+            if not np.isnan(values[index]) or path[0] != 'parts':
+                level[path[-1]] = float(values[index])
+
+        return preview
+
+
+
+# Pipes an amount out of each tank in an array.
+# Returns the new levels, the outflow, and the throttle, a ratio of supply to request
+def pipe_out(level: np.ndarray, amount: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    # Performs a safety check
+    assert np.all(amount >= 0), 'Cannot pipe-out negative quantities'
+
+    # Requests that cannot be fulfilled output all remaining fuel
+    short = amount > level
+    outflow = np.where(short, level, amount)
+    throttle = np.where(short, level / np.where(short, amount, 1), 1)
+
+    return level - outflow, outflow, throttle
+
+# Builds a float array from an iterable
+def array(values) -> np.ndarray:
+    return np.fromiter(values, dtype = float)
+
+# Part previews kept by a Fleet
+preview_keys: list[str] = [
+    'parts-thruster-thrust',
+    'parts-thruster-fuel',
+    'parts-thruster-fuel_throttle',
+    'parts-thruster-power',
+    'parts-thruster-power_throttle',
+    'parts-scoop-m_H',
+    'parts-scoop-power',
+    'parts-scoop-power_throttle',
+    'parts-scoop-allignment',
+    'parts-scoop-area',
+    'parts-scoop-volume',
+    'parts-generator-power'
+]
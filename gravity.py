@@ -0,0 +1,215 @@
+# Gravity from the star at the origin and from stars of a catalog.
+# A catalog may hold thousands of stars, nearly all of them too far away to matter, so stars are bucketed into a grid
+# of square cells as wide as the cutoff beyond which they are ignored. Every star within the cutoff of a point lies in
+# the cell of that point or the eight around it, and those stars are kept as arrays while the craft stays in its cell.
+# Their pull is summed with numpy, along with how it changes across space (the tidal tensor), and the craft moves
+# only a tiny fraction of the distance to any star in a step, so the sum is carried forward to first order in plain
+# floats, and only summed again once the craft has moved some fraction of the distance to the nearest star.
+# The star at the origin is always felt, and summed every step.
+# Pull is softened as by a Plummer sphere: a star's mass is spread over about the softening length, so it stays
+# finite for a craft that starts at, or passes through, a star
+#
+# A catalog is a CSV file with a header naming at least the columns name, x, y and mass.
+# Positions are in parsecs and masses in solar masses, as catalogs give them, unless other units are given to load
+
+import csv
+import numpy as np
+from math import floor, sqrt
+from astronomy import G, parsec, solar_mass, solar_radius
+
+# Stars are the bodies of a catalog, as arrays
+class Stars:
+    def __init__(self, names: list[str], x: np.ndarray, y: np.ndarray, mass: np.ndarray) -> None:
+        self.names: list[str] = list(names)
+        self.x: np.ndarray = np.asarray(x, dtype = float)
+        self.y: np.ndarray = np.asarray(y, dtype = float)
+        self.mass: np.ndarray = np.asarray(mass, dtype = float)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+# Loads a catalog of stars from a CSV file, converting positions and masses to SI
+def load(file: str, length: float = parsec, mass: float = solar_mass) -> Stars:
+    with open(file, 'r', newline = '') as catalog:
+        rows = list(csv.DictReader(catalog))
+
+    return Stars(
+        [row['name'] for row in rows],
+        [float(row['x']) * length for row in rows],
+        [float(row['y']) * length for row in rows],
+        [float(row['mass']) * mass for row in rows]
+    )
+
+
+
+# Gravity is the acceleration of a craft, wherever it is
+class Gravity:
+    def __init__(self, stars: Stars = None, origin: float = solar_mass, cutoff: float = parsec, softening: float = solar_radius, tolerance: float = 1e-3) -> None:
+        self.stars: Stars = stars if stars else Stars([], [], [], [])
+
+        # Mass of the star at the origin
+        self.origin: float = origin
+
+        # Stars further than the cutoff are not felt
+        self.cutoff: float = cutoff
+
+        # Length over which the mass of each star is spread
+        self.softening: float = softening
+
+        # Fraction of the distance to the nearest star the craft may move before the stars around it are summed again.
+        # The error of carrying the sum forward goes as its square; 0 sums them every step
+        self.tolerance: float = tolerance
+
+        # Index of cells: for each cell, the range of its stars in the arrays sorted by cell
+        columns = np.floor(self.stars.x / cutoff).astype(np.int64)
+        rows = np.floor(self.stars.y / cutoff).astype(np.int64)
+        order = np.lexsort((rows, columns))
+
+        self.x: np.ndarray = self.stars.x[order]
+        self.y: np.ndarray = self.stars.y[order]
+        self.mu: np.ndarray = G * self.stars.mass[order]
+
+        self.cells: dict = {}
+        for index, cell in enumerate(zip(columns[order].tolist(), rows[order].tolist())):
+            start, stop = self.cells.get(cell, (index, index))
+            self.cells[cell] = (start, index + 1)
+
+        # The cell the craft was last in, and the stars around it.
+        # Bounds that nothing lies within until the first call
+        self.low_x = self.low_y = np.inf
+        self.high_x = self.high_y = -np.inf
+        self.near_x: np.ndarray = np.empty(0)
+        self.near_y: np.ndarray = np.empty(0)
+        self.near_mu: np.ndarray = np.empty(0)
+
+        # Where the stars around the craft were last summed, their pull there and its tidal tensor,
+        # and the squared distance the craft may move from there before they are summed again
+        self.at_x = self.at_y = 0
+        self.pull_x = self.pull_y = 0
+        self.tidal_xx = self.tidal_xy = self.tidal_yy = 0
+        self.reach: float = -1
+
+        # Number of calls, of those that summed the stars around the craft, and of those that gathered them
+        self.calls: int = 0
+        self.sums: int = 0
+        self.misses: int = 0
+
+    def __str__(self) -> str:
+        return f'gravity ({len(self.stars)} stars within {self.cutoff:.3g} m, {self.origin:.3g} kg at the origin)'
+
+    # Calling Gravity gives the acceleration at a point
+    def __call__(self, x: float, y: float) -> tuple[float, float]:
+        self.calls += 1
+        softening = self.softening ** 2
+
+        # The star at the origin
+        r2 = x * x + y * y + softening
+        pull = -G * self.origin / (r2 * sqrt(r2))
+        acc_x, acc_y = pull * x, pull * y
+
+        # The stars around the craft's cell, carried forward from where they were last summed
+        if not (self.low_x <= x < self.high_x and self.low_y <= y < self.high_y):
+            self.gather(x, y)
+
+        dx, dy = x - self.at_x, y - self.at_y
+        if dx * dx + dy * dy > self.reach:
+            self.sum(x, y)
+            dx = dy = 0
+
+        acc_x += self.pull_x + self.tidal_xx * dx + self.tidal_xy * dy
+        acc_y += self.pull_y + self.tidal_xy * dx + self.tidal_yy * dy
+
+        return acc_x, acc_y
+
+    # Sums the pull of the stars around the craft's cell at a point, and its tidal tensor
+    def sum(self, x: float, y: float) -> None:
+        self.sums += 1
+        self.at_x, self.at_y = x, y
+
+        if not len(self.near_mu):
+            self.pull_x = self.pull_y = self.tidal_xx = self.tidal_xy = self.tidal_yy = 0
+            self.reach = np.inf
+            return
+
+        softening = self.softening ** 2
+        dx = self.near_x - x
+        dy = self.near_y - y
+        r2 = dx * dx + dy * dy
+        s2 = r2 + softening
+
+        mu = np.where(r2 <= self.cutoff ** 2, self.near_mu, 0)
+        pull = mu / (s2 * np.sqrt(s2))
+        tidal = 3 * pull / s2
+
+        self.pull_x = float(pull @ dx)
+        self.pull_y = float(pull @ dy)
+        self.tidal_xx = float(tidal @ (dx * dx)) - float(pull.sum())
+        self.tidal_xy = float(tidal @ (dx * dy))
+        self.tidal_yy = float(tidal @ (dy * dy)) - float(pull.sum())
+
+        self.reach = (self.tolerance ** 2) * float(s2.min())
+
+    # Keeps the stars of the cell a point lies in and the cells around it
+    def gather(self, x: float, y: float) -> None:
+        self.misses += 1
+
+        column, row = floor(x / self.cutoff), floor(y / self.cutoff)
+        self.low_x, self.low_y = column * self.cutoff, row * self.cutoff
+        self.high_x, self.high_y = self.low_x + self.cutoff, self.low_y + self.cutoff
+
+        indices = self.neighbours(column, row)
+        self.near_x = self.x[indices]
+        self.near_y = self.y[indices]
+        self.near_mu = self.mu[indices]
+        self.reach = -1
+
+    # Indices of the stars in a cell and the cells around it
+    def neighbours(self, column: int, row: int) -> np.ndarray:
+        ranges = [self.cells[cell] for cell in ((column + i, row + j) for i in (-1, 0, 1) for j in (-1, 0, 1)) if cell in self.cells]
+        return np.concatenate([np.arange(start, stop) for start, stop in ranges]) if ranges else np.empty(0, dtype = np.int64)
+
+    # Accelerations at many points at once, such as the crafts of a Fleet.
+    # Points are grouped by cell, and each group is summed over its neighbours at once; the kept cell is not touched
+    def sample(self, x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        x, y = np.broadcast_arrays(np.asarray(x, dtype = float), np.asarray(y, dtype = float))
+        softening = self.softening ** 2
+
+        r2 = x * x + y * y + softening
+        pull = -G * self.origin / (r2 * np.sqrt(r2))
+        acc_x, acc_y = pull * x, pull * y
+
+        if len(self.mu):
+            columns = np.floor(x / self.cutoff).astype(np.int64).ravel()
+            rows = np.floor(y / self.cutoff).astype(np.int64).ravel()
+            acc_x, acc_y = acc_x.ravel(), acc_y.ravel()
+
+            cells, groups = np.unique(np.stack((columns, rows), axis = 1), axis = 0, return_inverse = True)
+            for group, (column, row) in enumerate(cells.tolist()):
+                indices = self.neighbours(column, row)
+                if not len(indices):
+                    continue
+
+                points = np.flatnonzero(groups.ravel() == group)
+                dx = self.x[indices] - x.ravel()[points, None]
+                dy = self.y[indices] - y.ravel()[points, None]
+                r2 = dx * dx + dy * dy
+
+                pull = np.where(r2 <= self.cutoff ** 2, self.mu[indices], 0) / ((r2 + softening) * np.sqrt(r2 + softening))
+                acc_x[points] += (pull * dx).sum(axis = 1)
+                acc_y[points] += (pull * dy).sum(axis = 1)
+
+            acc_x, acc_y = acc_x.reshape(x.shape), acc_y.reshape(y.shape)
+
+        return acc_x, acc_y
+
+    def get_preview(self) -> dict:
+        return {
+            'stars':        len(self.stars),
+            'origin':       self.origin,
+            'cutoff':       self.cutoff,
+            'softening':    self.softening,
+            'tolerance':    self.tolerance,
+            'calls':        self.calls,
+            'sums':         self.sums,
+            'misses':       self.misses
+        }
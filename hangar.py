@@ -3,23 +3,44 @@
 from finkchlib.vector import Vector2
 from ramjet import Ramjet
 
-# Calling this function returns a Ramjet
-def get_ramjet(name: str) -> Ramjet:
-    
-    ramjet = None
-    
+# Calling this function returns a Ramjet.
+# Any parameters supplied override those of the design
+def get_ramjet(name: str, **parameters) -> Ramjet:
+
+    # Builds the Ramjet
+    ramjet: Ramjet = Ramjet(name, **get_design(name, **parameters))
+
+    # Offsets from centre to prevent double div-by-zero
+    ramjet.spacetime.position = Vector2(1, 0)
+
+    # Returns the Ramjet
+    return ramjet
+
+# Returns the Ramjet constructor parameters of a design
+def get_design(name: str, **parameters) -> dict:
+
+    design = None
+
     # Selects the Ramjet
     match name:
 
         # The classic test
         case 'ioRam-Beta':
-            
+
             # Update thrust:
             # X_e   = 131.293 u
             # H     = 1.00784 u
-            ramjet: Ramjet = Ramjet(name, 100, 10, 1e7, 26, 4.9e4, 1.5e6, 1e6, 1e2, 1e8)
-
-            ramjet
+            design = {
+                'mass':             100,
+                'fuel_capacity':    10,
+                'battery_capacity': 1e7,
+                'thrust':           26,
+                'v_e':              4.9e4,
+                'engine_power':     1.5e6,
+                'scoop_power':      1e6,
+                'scoop_radius':     1e2,
+                'power':            1e8
+            }
 
 
         # Crashes if supplied name does not match any entries
@@ -27,8 +48,10 @@ def get_ramjet(name: str) -> Ramjet:
             assert False, f'No such ramjet \'{name}\'.'
 
 
-    # Offsets from centre to prevent double div-by-zero
-    ramjet.spacetime.position = Vector2(1, 0)
+    # Crashes if a parameter is not part of the design
+    for key in parameters:
+        assert key in design, f'No such parameter \'{key}\' for ramjet \'{name}\'.'
 
-    # Returns the Ramjet
-    return ramjet
+    design.update(parameters)
+
+    return design
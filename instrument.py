@@ -0,0 +1,145 @@
+# Times the stages of the step loop, for finding where a slow run spends its time.
+# Every call of a stage adds to its total time and count; every few calls, its latency also goes into a histogram.
+# Simulation and Ramjet start and stop a timer around each stage of their loops. A run without instruments gets
+# idle timers that do nothing, so there is one loop either way, and it pays only the calls to them
+
+import json
+import marshal
+from time import perf_counter_ns
+
+# Calls between latency samples
+sample: int = 64
+
+# A Stage of the step loop
+class Stage:
+
+    __slots__ = ('name', 'parent', 'time', 'count', 'histogram', 'started')
+
+    def __init__(self, name: str, parent: str = None) -> None:
+        self.name: str = name
+
+        # The stage this one runs within, if any
+        self.parent: str = parent
+
+        # Nanoseconds spent in the stage, and number of calls
+        self.time: int = 0
+        self.count: int = 0
+
+        # Sampled latencies; bin b counts calls of 2 ** (b - 1) to 2 ** b nanoseconds
+        self.histogram: list[int] = [0] * 64
+
+        # When the call under way started
+        self.started: int = 0
+
+    # Marks the start of a call
+    def start(self) -> None:
+        self.started = perf_counter_ns()
+
+    # Marks the end of a call, and adds it
+    def stop(self) -> None:
+        self.add(perf_counter_ns() - self.started)
+
+    # Adds a call that took some nanoseconds
+    def add(self, elapsed: int) -> None:
+        self.time += elapsed
+        self.count += 1
+
+        if self.count % sample == 0:
+            self.histogram[elapsed.bit_length()] += 1
+
+    # Mean nanoseconds per call
+    def mean(self) -> float:
+        return self.time / self.count if self.count else 0
+
+    # Nanoseconds under which a fraction of the sampled calls fell, to the upper edge of its bin
+    def percentile(self, fraction: float) -> float:
+        total = sum(self.histogram)
+        if total == 0:
+            return 0
+
+        seen = 0
+        for bin, count in enumerate(self.histogram):
+            seen += count
+            if seen >= fraction * total:
+                return 2 ** bin
+
+    def get_preview(self) -> dict:
+        return {
+            'parent':       self.parent,
+            'time':         self.time / 1e9,
+            'count':        self.count,
+            'mean':         self.mean() / 1e9,
+            'histogram':    {f'{2 ** (bin - 1) if bin else 0}-{2 ** bin} ns': count for bin, count in enumerate(self.histogram) if count}
+        }
+
+
+
+# Idle stands in for every stage of a run without instruments; timing it does nothing
+class Idle:
+
+    __slots__ = ()
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+idle: Idle = Idle()
+
+# The stages of some names, within a parent stage if given, or idle if there are no instruments
+def stages(instruments, names: list[str], parent: str = None) -> list:
+    return [instruments.stage(name, parent) if instruments else idle for name in names]
+
+
+
+# Instruments hold the stages of a run
+class Instruments:
+    def __init__(self) -> None:
+        self.stages: dict = {}
+
+    # Returns a stage, making it if it is new
+    def stage(self, name: str, parent: str = None) -> Stage:
+        if not name in self.stages:
+            self.stages[name] = Stage(name, parent)
+
+        return self.stages[name]
+
+    # Time spent in a stage, not counting the stages within it
+    def own_time(self, stage: Stage) -> int:
+        return stage.time - sum(child.time for child in self.stages.values() if child.parent == stage.name)
+
+    # The stages that were called as a table, slowest first
+    def table(self) -> str:
+        total = sum(stage.time for stage in self.stages.values() if stage.parent is None)
+
+        lines = [f'{"Stage":<24}{"Calls":>12}{"Total (s)":>12}{"Share":>8}{"Mean (ns)":>12}{"p50 (ns)":>10}{"p99 (ns)":>10}']
+        for stage in sorted((stage for stage in self.stages.values() if stage.count), key = lambda stage: -stage.time):
+            name = f'  {stage.name}' if stage.parent else stage.name
+            share = stage.time / total if total else 0
+            lines.append(f'{name:<24}{stage.count:>12}{stage.time / 1e9:>12.3e}{share:>8.1%}{stage.mean():>12.0f}{stage.percentile(0.5):>10.0f}{stage.percentile(0.99):>10.0f}')
+
+        return '\n'.join(lines)
+
+    # Writes the stages as JSON
+    def write(self, file: str) -> None:
+        with open(file, 'w') as out:
+            json.dump(self.get_preview(), out, indent = 4)
+
+    # Writes the stages in the format of cProfile, to be read with pstats.Stats(file)
+    def dump_stats(self, file: str) -> None:
+
+        # Each stage poses as a function of this file
+        def key(stage: Stage) -> tuple:
+            return ('instrument.py', 0, stage.name)
+
+        stats = {}
+        for stage in self.stages.values():
+            callers = {key(self.stages[stage.parent]): (stage.count, stage.count, self.own_time(stage) / 1e9, stage.time / 1e9)} if stage.parent in self.stages else {}
+            stats[key(stage)] = (stage.count, stage.count, self.own_time(stage) / 1e9, stage.time / 1e9, callers)
+
+        with open(file, 'wb') as out:
+            marshal.dump(stats, out)
+
+    def get_preview(self) -> dict:
+        return {name: stage.get_preview() for name, stage in self.stages.items()}
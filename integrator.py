@@ -0,0 +1,272 @@
+# Integrators step a ramjet forward in time.
+# Euler steps the parts directly, as the ramjet always has, and Fused does the same on plain floats.
+# RK4 and RK45 integrate the continuous model of the ramjet, Ramjet.derivative, and RK45 chooses its own step size.
+# Rapidity integrates the same model in rapidity and proper time, for steps far larger than the others allow near c
+
+from finkchlib.constants import day
+from ramjet import Ramjet
+from spacetime import RapiditySpacetime
+import numpy as np
+
+# An Integrator steps a ramjet with semi-implicit Euler, through its parts
+class Integrator:
+
+    # Names of the telemetry in the slots, as with parts of a Ramjet
+    fields: list[str] = ['step', 'error', 'rejected']
+
+    # The kind of spacetime the integrator needs the ramjet to have, if not its own
+    spacetime: type = None
+
+    def __init__(self) -> None:
+
+        # The last step taken and its estimated error, relative to tolerance
+        self.taken: float = 0
+        self.error: float = 0
+
+        # Number of steps that were retried with a smaller step
+        self.rejected: int = 0
+
+        # Telemetry, filled in when a snapshot is taken
+        self.slots: np.ndarray = np.full(len(self.fields), np.nan)
+
+    def __str__(self) -> str:
+        return 'euler'
+
+    # Calling an Integrator steps the ramjet.
+    # Returns the step taken and the step to try next
+    def __call__(self, ramjet: Ramjet, step: float) -> tuple[float, float]:
+        ramjet(step)
+
+        self.taken = step
+        return step, step
+
+    # Copies the state into the slots
+    def capture(self) -> None:
+        self.slots[0] = self.taken
+        self.slots[1] = self.error
+        self.slots[2] = self.rejected
+
+    def get_preview(self):
+        return {
+            'step': self.taken,
+            'error': self.error,
+            'rejected': self.rejected
+        }
+
+# An alias, for symmetry with the other integrators
+Euler = Integrator
+
+
+
+# The same semi-implicit Euler step, through Ramjet.fused, which does the parts' arithmetic on plain floats.
+# It follows the parts exactly, so it can stand in for Euler anywhere. The step itself is about 2.5 times as fast,
+# but the rest of the loop, such as the recorder and end checks, is not, so a whole run is about 1.3 to 1.9 times as fast.
+# When the recorder knows its next step ahead, as EveryN and Interval do, the Simulation takes the steps up to it in one
+# call, skipping the loop between them; recording rarely, a run is then about 5 times as fast as with Euler
+class Fused(Integrator):
+    def __init__(self) -> None:
+        super().__init__()
+
+    def __str__(self) -> str:
+        return 'euler (fused)'
+
+    def __call__(self, ramjet: Ramjet, step: float) -> tuple[float, float]:
+        ramjet.fused(step)
+
+        self.taken = step
+        return step, step
+
+
+
+# Classic fourth-order Runge-Kutta with a fixed step
+class RK4(Integrator):
+    def __init__(self) -> None:
+        super().__init__()
+
+    def __str__(self) -> str:
+        return 'rk4'
+
+    def __call__(self, ramjet: Ramjet, step: float) -> tuple[float, float]:
+        state = ramjet.get_state()
+
+        k1 = ramjet.derivative(state)
+        k2 = ramjet.derivative(state + step / 2 * k1)
+        k3 = ramjet.derivative(state + step / 2 * k2)
+        k4 = ramjet.derivative(state + step * k3)
+
+        ramjet.set_state(state + step / 6 * (k1 + 2 * k2 + 2 * k3 + k4), step)
+
+        self.taken = step
+        return step, step
+
+
+
+# Flows that Rapidity averages between the start of a step and its guess at the end
+averaged: list[str] = ['dilation', 'acc_x', 'acc_y', 'gravity_x', 'gravity_y', 'thrust', 'intake', 'burn', 'battery', 'fuel_throttle', 'power_throttle']
+
+# Heun's method on the continuous model, in the craft's rest frame.
+# Thrust per unit mass is a proper acceleration, which RapiditySpacetime turns into hyperbolic motion over each step,
+# so speed stays below c and position and proper time stay accurate however long the step. The acceleration and the
+# flows into the stores are averaged between the start of the step and a first guess at its end. The parts burn fuel
+# and generate and draw power over the proper time of the step, as they run on the craft's own clock, but the scoop
+# sweeps up the medium over the step on the ground, where the medium is
+class Rapidity(Integrator):
+
+    spacetime: type = RapiditySpacetime
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    def __str__(self) -> str:
+        return 'rapidity (heun)'
+
+    def __call__(self, ramjet: Ramjet, step: float) -> tuple[float, float]:
+        spacetime = ramjet.spacetime
+        assert isinstance(spacetime, RapiditySpacetime), 'Rapidity needs a RapiditySpacetime'
+
+        start = spacetime.save()
+        fuel, battery = ramjet.tank.fuel, ramjet.battery.fuel
+
+        # First guess, with the flows at the start held over the step
+        first = self.cap(ramjet, ramjet.flows(ramjet.get_state()), fuel, step)
+        proper = self.advance(spacetime, step, first['acc_x'], first['acc_y'])
+        guess = ramjet.get_state()
+        guess[5] = 0 if first.get('empty') else fuel + self.fuel(ramjet, fuel, first['intake'], first['burn'], step, proper)
+        guess[6] = battery + first['battery'] * proper
+
+        # The step again, with the flows averaged between the start and the guess.
+        # A store that the guess takes past empty or full changes its flows partway through the step, and averaging
+        # across that would put the moment it empties or fills too late, so the flows at the start are kept instead
+        within = 0 < guess[5] < ramjet.tank.capacity and 0 < guess[6] < ramjet.battery.capacity
+        second = ramjet.flows(guess) if within else first
+        flows = self.cap(ramjet, {key: (first[key] + second[key]) / 2 for key in averaged}, fuel, step)
+        spacetime.restore(start)
+        proper = self.advance(spacetime, step, flows['acc_x'], flows['acc_y'])
+
+        # Only the stores are set; setting velocity would lose rapidity near c
+        fuel = 0 if flows.get('empty') else fuel + self.fuel(ramjet, fuel, flows['intake'], flows['burn'], step, proper)
+        ramjet.set_stores(fuel, battery + flows['battery'] * proper, step)
+
+        self.taken = step
+        return step, step
+
+    # Throttles the burn to the fuel there is over a step, what is in the tank and what is scooped up, with its thrust
+    # and the power it draws. The flows only throttle an empty tank, and then to what is scooped up over time on the
+    # ground, not over proper time, so a step could burn more than there is, or leave a trace that the next step burns
+    # at full thrust. A burn limited by fuel instead uses up exactly what there is, and leaves the tank empty
+    def cap(self, ramjet: Ramjet, flows: dict, fuel: float, step: float) -> dict:
+        proper = step * flows['dilation']
+        limit = (max(fuel, 0) + flows['intake'] * step) / proper
+        if flows['burn'] == 0 or (flows['burn'] < limit and flows['fuel_throttle'] >= 1):
+            return flows
+
+        burn = min(limit, ramjet.thruster.m_d * flows['power_throttle'])
+        scale = burn / flows['burn']
+
+        return {
+            **flows,
+            'acc_x':    flows['gravity_x'] + (flows['acc_x'] - flows['gravity_x']) * scale,
+            'acc_y':    flows['gravity_y'] + (flows['acc_y'] - flows['gravity_y']) * scale,
+            'thrust':   flows['thrust'] * scale,
+            'burn':     burn,
+            'battery':  flows['battery'] - ramjet.thruster.power * (burn - flows['burn']) / ramjet.thruster.m_d,
+            'empty':    burn == limit
+        }
+
+    # Change in fuel over a step: hydrogen scooped up over the time on the ground, less that burnt over proper time.
+    # A full tank takes in no more, as in Ramjet.flows
+    def fuel(self, ramjet: Ramjet, fuel: float, intake: float, burn: float, step: float, proper: float) -> float:
+        change = intake * step - burn * proper
+        return 0 if fuel >= ramjet.tank.capacity and change > 0 else change
+
+    # Advances the spacetime under an acceleration, returning the proper time that passed
+    def advance(self, spacetime: RapiditySpacetime, step: float, acc_x: float, acc_y: float) -> float:
+        time = spacetime.time
+        spacetime.advance(step, acc_x, acc_y)
+
+        return spacetime.time - time
+
+
+
+# Dormand-Prince 5(4): an embedded pair that estimates the error of each step from the difference
+# of a fifth- and a fourth-order solution, and grows or shrinks the step to keep it within tolerance.
+# Steps are also limited so that the tank and battery change by no more than a fraction of their capacity,
+# which keeps steps short while thrust, mass or scoop intake change quickly
+class RK45(Integrator):
+    def __init__(self, rtol: float = 1e-9, atol: float = 1e-6, min_step: float = 1e-6, max_step: float = day, max_change: float = 1e-2) -> None:
+        super().__init__()
+
+        # Tolerances; absolute tolerance of the stores is relative to their capacity
+        self.rtol: float = rtol
+        self.atol: float = atol
+
+        # Bounds on step size
+        self.min_step: float = min_step
+        self.max_step: float = max_step
+
+        # Largest fraction of a store's capacity that may change in one step
+        self.max_change: float = max_change
+
+    def __str__(self) -> str:
+        return f'rk45 (rtol {self.rtol}, atol {self.atol})'
+
+    def __call__(self, ramjet: Ramjet, step: float) -> tuple[float, float]:
+        state = ramjet.get_state()
+        step = min(max(step, self.min_step), self.max_step)
+
+        # Absolute tolerance of each component of the state
+        scale = self.atol * np.array([1, 1, 1, 1, 1, ramjet.tank.capacity, ramjet.battery.capacity])
+
+        # Retries with smaller steps until the error is within tolerance
+        while True:
+            new, error = self.attempt(ramjet, state, step)
+            error = np.max(np.abs(error) / (scale + self.rtol * np.maximum(np.abs(state), np.abs(new))))
+
+            if error <= 1 or step <= self.min_step:
+                break
+
+            self.rejected += 1
+            step = max(step * max(0.2, 0.9 * error ** -0.2), self.min_step)
+
+        ramjet.set_state(new, step)
+
+        self.taken = step
+        self.error = error
+
+        # Grows the next step by how far within tolerance this one was
+        factor = 5 if error == 0 else min(5, max(0.2, 0.9 * error ** -0.2))
+        following = min(step * factor, self.max_step)
+
+        # Limits how far the stores may change over the next step
+        rates = ramjet.derivative(ramjet.get_state())
+        for rate, capacity in ((rates[5], ramjet.tank.capacity), (rates[6], ramjet.battery.capacity)):
+            if rate != 0:
+                following = min(following, self.max_change * capacity / abs(rate))
+
+        return step, max(following, self.min_step)
+
+    # Takes a single step, returning the new state and its error estimate
+    def attempt(self, ramjet: Ramjet, state: np.ndarray, step: float) -> tuple[np.ndarray, np.ndarray]:
+        k = [ramjet.derivative(state)]
+
+        for row in a:
+            k.append(ramjet.derivative(state + step * sum(coefficient * stage for coefficient, stage in zip(row, k))))
+
+        new = state + step * sum(coefficient * stage for coefficient, stage in zip(b5, k))
+        error = step * sum(coefficient * stage for coefficient, stage in zip(b5 - b4, k))
+
+        return new, error
+
+
+
+# Dormand-Prince coefficients
+a: list[list[float]] = [
+    [1 / 5],
+    [3 / 40,        9 / 40],
+    [44 / 45,       -56 / 15,       32 / 9],
+    [19372 / 6561,  -25360 / 2187,  64448 / 6561,   -212 / 729],
+    [9017 / 3168,   -355 / 33,      46732 / 5247,   49 / 176,   -5103 / 18656],
+    [35 / 384,      0,              500 / 1113,     125 / 192,  -2187 / 6784,   11 / 84]
+]
+b5: np.ndarray = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+b4: np.ndarray = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
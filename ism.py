@@ -0,0 +1,167 @@
+# The interstellar medium (ISM) that a Scoop sweeps up, as a field of hydrogen mass density over the plane.
+# Uniform is the constant density the scoop has always used. Grid is a precomputed grid of densities on disk,
+# mapped into memory rather than read, so a field much larger than memory costs only the pages the route passes
+# through. It is interpolated bilinearly between the nodes around a point. A craft stays in the same cell of the
+# grid for many steps, so the cell it was last in is kept, with its four corners and bounds as plain floats, and a
+# lookup within it is a few comparisons and multiplications, with no indexing into the map at all
+#
+# A grid is a directory:
+#   header.json     {'origin': [x, y], 'spacing': [dx, dy], 'shape': [rows, columns], 'outside': density}
+#   density.bin     little-endian float64 densities, row by row; row i is at y = origin y + i dy
+#
+# Points off the grid have the density 'outside', by default the vacuum's
+
+import os
+import json
+import numpy as np
+from finkchlib.constants import vacuum_H_mass_density
+
+# A Uniform field has the same density everywhere
+class Uniform:
+    def __init__(self, density: float = vacuum_H_mass_density) -> None:
+        self.density: float = density
+
+        # Whether the density is the same everywhere, which fast-forward needs
+        self.uniform: bool = True
+
+    def __str__(self) -> str:
+        return f'uniform ({self.density:.3e} kg/m^3)'
+
+    # Calling a field gives the density at a point, in kg/m^3
+    def __call__(self, x: float, y: float) -> float:
+        return self.density
+
+    # Densities at many points at once
+    def sample(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        return np.full(np.broadcast(x, y).shape, self.density)
+
+    def get_preview(self) -> dict:
+        return {
+            'uniform':  self.uniform,
+            'density':  self.density
+        }
+
+
+
+# A Grid is a field of densities at evenly spaced nodes, mapped from disk
+class Grid:
+    def __init__(self, file: str) -> None:
+        self.file: str = file
+
+        with open(os.path.join(file, 'header.json'), 'r') as header:
+            header = json.load(header)
+
+        self.origin_x, self.origin_y = header['origin']
+        self.spacing_x, self.spacing_y = header['spacing']
+        self.rows, self.columns = header['shape']
+        self.outside: float = header['outside']
+        self.uniform: bool = False
+
+        self.density: np.memmap = np.memmap(data_path(file), dtype = '<f8', mode = 'r', shape = (self.rows, self.columns))
+
+        # Bounds of the grid, beyond which the density is outside
+        self.end_x: float = self.origin_x + (self.columns - 1) * self.spacing_x
+        self.end_y: float = self.origin_y + (self.rows - 1) * self.spacing_y
+
+        # The cell last looked up: its bounds and the densities at its corners.
+        # Bounds that nothing lies within until the first lookup
+        self.low_x = self.low_y = np.inf
+        self.high_x = self.high_y = -np.inf
+        self.corners: tuple = (0, 0, 0, 0)
+
+        # Number of lookups, and of those that had to load a cell
+        self.lookups: int = 0
+        self.misses: int = 0
+
+    def __str__(self) -> str:
+        return f'grid {self.file} ({self.rows} x {self.columns})'
+
+    def __call__(self, x: float, y: float) -> float:
+        self.lookups += 1
+
+        if not (self.low_x <= x <= self.high_x and self.low_y <= y <= self.high_y):
+            if not (self.origin_x <= x <= self.end_x and self.origin_y <= y <= self.end_y):
+                return self.outside
+
+            self.load(x, y)
+
+        # Bilinear interpolation between the corners
+        t = (x - self.low_x) / self.spacing_x
+        u = (y - self.low_y) / self.spacing_y
+        low_left, low_right, high_left, high_right = self.corners
+
+        return (low_left * (1 - t) + low_right * t) * (1 - u) + (high_left * (1 - t) + high_right * t) * u
+
+    # Keeps the cell a point lies in. The last row and column of nodes belong to the cells before them
+    def load(self, x: float, y: float) -> None:
+        self.misses += 1
+
+        column = min(int((x - self.origin_x) / self.spacing_x), self.columns - 2)
+        row = min(int((y - self.origin_y) / self.spacing_y), self.rows - 2)
+
+        self.low_x = self.origin_x + column * self.spacing_x
+        self.low_y = self.origin_y + row * self.spacing_y
+        self.high_x = self.low_x + self.spacing_x
+        self.high_y = self.low_y + self.spacing_y
+
+        cell = self.density[row:row + 2, column:column + 2]
+        self.corners = (float(cell[0, 0]), float(cell[0, 1]), float(cell[1, 0]), float(cell[1, 1]))
+
+    # Densities at many points at once, without touching the kept cell
+    def sample(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        x, y = np.broadcast_arrays(np.asarray(x, dtype = float), np.asarray(y, dtype = float))
+        inside = (self.origin_x <= x) & (x <= self.end_x) & (self.origin_y <= y) & (y <= self.end_y)
+
+        # Cells and positions within them, for the points on the grid
+        column = np.minimum(((x[inside] - self.origin_x) / self.spacing_x).astype(np.int64), self.columns - 2)
+        row = np.minimum(((y[inside] - self.origin_y) / self.spacing_y).astype(np.int64), self.rows - 2)
+        t = (x[inside] - self.origin_x) / self.spacing_x - column
+        u = (y[inside] - self.origin_y) / self.spacing_y - row
+
+        density = self.density
+        densities = np.full(x.shape, self.outside)
+        densities[inside] = (
+            (density[row, column] * (1 - t) + density[row, column + 1] * t) * (1 - u) +
+            (density[row + 1, column] * (1 - t) + density[row + 1, column + 1] * t) * u
+        )
+
+        return densities
+
+    def get_preview(self) -> dict:
+        return {
+            'uniform':  self.uniform,
+            'file':     self.file,
+            'shape':    (self.rows, self.columns),
+            'lookups':  self.lookups,
+            'misses':   self.misses
+        }
+
+
+
+# Writes a grid of densities, rows along y, with its first node at the origin
+def create(file: str, density: np.ndarray, origin: tuple[float, float], spacing: tuple[float, float], outside: float = vacuum_H_mass_density) -> Grid:
+    density = np.asarray(density, dtype = '<f8')
+    assert density.ndim == 2 and min(density.shape) >= 2, 'A grid needs at least 2 x 2 nodes'
+
+    os.makedirs(file, exist_ok = True)
+    density.tofile(data_path(file))
+
+    with open(os.path.join(file, 'header.json'), 'w') as header:
+        json.dump({'origin': list(origin), 'spacing': list(spacing), 'shape': list(density.shape), 'outside': outside}, header)
+
+    return Grid(file)
+
+# Densities of clouds on a background, for a grid of nodes.
+# Each cloud is (x, y, radius, density), a Gaussian with that peak density, radius its standard deviation
+def clouds(origin: tuple[float, float], spacing: tuple[float, float], shape: tuple[int, int], clouds: list[tuple], background: float = vacuum_H_mass_density) -> np.ndarray:
+    y, x = np.meshgrid(origin[1] + spacing[1] * np.arange(shape[0]), origin[0] + spacing[0] * np.arange(shape[1]), indexing = 'ij')
+
+    density = np.full(shape, background)
+    for cloud_x, cloud_y, radius, peak in clouds:
+        density += peak * np.exp(-((x - cloud_x) ** 2 + (y - cloud_y) ** 2) / (2 * radius ** 2))
+
+    return density
+
+# Returns the path to a grid's densities
+def data_path(file: str) -> str:
+    return os.path.join(file, 'density.bin')
@@ -0,0 +1,37 @@
+# Benchmarks the simulation, the store and the plotter
+
+import sys
+import argparse
+from benchmark import Benchmark, registry
+
+# Gets everything going
+def main():
+
+    # Reads the command line
+    parser = argparse.ArgumentParser(description = 'Benchmarks the simulation, store and plotter.')
+    parser.add_argument('scenarios', nargs = '*', help = f'scenarios to run, from {", ".join(registry)}; defaults to all')
+    parser.add_argument('--out', default = 'benchmark.json', help = 'file to which to write the results')
+    parser.add_argument('--baseline', default = None, help = 'results of an earlier run to compare against')
+    parser.add_argument('--threshold', type = float, default = 0.1, help = 'fraction by which a metric may get worse before it is flagged')
+    parser.add_argument('--repeat', type = int, default = 3, help = 'number of runs of each scenario, of which the best is kept')
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.scenarios, args.repeat)
+    benchmark()
+    benchmark.write(args.out)
+
+    # Fails if anything got slower than the baseline
+    if args.baseline:
+        regressions = benchmark.compare(args.baseline, args.threshold)
+
+        for regression in regressions:
+            print(f'Regression: {regression}')
+
+        if regressions:
+            sys.exit(1)
+
+        print(f'No regressions against {args.baseline}')
+
+# Ready, set, go!
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# Looks up runs in the catalog
+
+import argparse
+from catalog import Catalog
+
+# Gets everything going
+def main():
+
+    # Reads the command line
+    parser = argparse.ArgumentParser(description = 'Lists runs in the catalog, or runs a query on it.')
+    parser.add_argument('query', nargs = '?', default = None, help = 'SQL to run, such as "SELECT store FROM runs ORDER BY final_velocity DESC LIMIT 10"')
+    parser.add_argument('--catalog', default = 'catalog.sqlite', help = 'the catalog to read')
+    args = parser.parse_args()
+
+    catalog = Catalog(args.catalog)
+
+    # By default, lists every run with its parameters and statistics
+    rows = [dict(row) for row in catalog.query(args.query)] if args.query else catalog.table()
+
+    if rows:
+        keys = list(rows[0])
+        print('\t'.join(keys))
+        for row in rows:
+            print('\t'.join(f'{value:.4g}' if isinstance(value, float) else str(value) for value in row.values()))
+
+    print(f'{len(rows)} rows')
+
+# Ready, set, go!
+if __name__ == '__main__':
+    main()
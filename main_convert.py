@@ -0,0 +1,31 @@
+# Converts legacy text stores into the columnar format
+
+import argparse
+from convert import Converter
+from compress import Compression, codecs
+
+# Gets everything going
+def main():
+
+    # Reads the command line
+    parser = argparse.ArgumentParser(description = 'Converts legacy text stores into column stores.')
+    parser.add_argument('legacy', nargs = '+', help = 'legacy text files, of snapshots or flattened columns')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of processes; defaults to all cores')
+    parser.add_argument('--compression', choices = list(codecs), default = None, help = 'compress the columns in blocks with this codec')
+    parser.add_argument('--level', type = int, default = None, help = 'compression level of the codec')
+    parser.add_argument('--plain', action = 'store_true', help = 'compress blocks as they are, without encoding them as runs or differences')
+    parser.add_argument('--downcast', nargs = '+', default = None, help = 'columns to store as float32, losing precision')
+    args = parser.parse_args()
+
+    converter = Converter(args.workers, compression = Compression(args.compression, args.level, encode = not args.plain, downcast = args.downcast) if args.compression else None)
+
+    # Each file becomes a store of the same name, without the extension
+    for legacy in args.legacy:
+        file = legacy.rsplit('.', 1)[0] if legacy.endswith('.txt') else f'{legacy}.store'
+
+        converter(legacy, file)
+        print(f'{legacy} -> {file}: {converter}')
+
+# Ready, set, go!
+if __name__ == '__main__':
+    main()
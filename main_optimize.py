@@ -0,0 +1,48 @@
+# Searches the design space of a ramjet for the fastest design, dropping poor designs early
+
+from optimize import *
+from record import *
+from integrator import Fused
+from finkchlib.constants import hour
+
+# Gets everything going
+def main():
+
+    # The Ramjet whose design is varied
+    ramjet = 'ioRam-Beta'
+
+    # Candidate designs, drawn between bounds on a log scale; sweep.grid works as well
+    runs = sample(
+        81,
+        scoop_radius    = (1e1, 1e3),
+        scoop_power     = (1e5, 1e7),
+        power           = (1e6, 1e9),
+        v_e             = (1e4, 1e5)
+    )
+
+    # How many seconds are simulated in each step, and how many steps the best designs are run for
+    rate = 1
+    max_steps = 12 * hour
+
+    # What to rank designs by, from optimize.objectives, and how many designs go on from each rung: one in this many.
+    # Velocity early on says little about velocity later, since every design burns at the same thrust until its tank is dry
+    objective = 'reach'
+    reduction = 3
+
+    # The directory in which each run and the summary table are stored
+    directory = 'optimize'
+
+    # Designs that reach the full horizon are filed in this catalog; see main_catalog.py
+    catalog = 'catalog.sqlite'
+
+    # Creates the optimizer; Adaptive keeps each run's store small
+    optimizer = Optimizer(ramjet, runs, rate, directory, max_steps, objective, reduction = reduction, recorder = Adaptive, integrator = Fused, catalog = catalog)
+    print(optimizer)
+
+    # Runs the search, and shows the best designs
+    for result in optimizer()[:3]:
+        print(f'{result["objective"]:.3e} ({result["vel"]:.3e} m/s): {({key: result[key] for key in runs[0]})}')
+
+# Ready, set, go!
+if __name__ == '__main__':
+    main()
@@ -5,17 +5,14 @@ from plot import Plotter
 
 def main():
 
-    # The file from which to read
-    file: str = 'temp.txt'
+    # The directory from which to read
+    file: str = 'temp'
 
     # Gets the data Store up
     store: Store = Store(file)
 
-    # Reads from the data file
-    data, metadata = store.read()
-
-    # Creates Plotter
-    plot = Plotter(data, metadata)
+    # Creates Plotter, which reads only what it draws
+    plot = Plotter(store)
 
     # Plots some data
     plot('sim_time', 'ramjet-spacetime-pos_x', 'Position vs. Time', ['Time (s)', 'Position (m)'])
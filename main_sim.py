@@ -1,9 +1,37 @@
 # This file gets the ball rolling
 
+import argparse
 from simulation import *
+from record import *
+from integrator import *
+from fastforward import FastForward
+from checkpoint import Checkpoint
+from instrument import Instruments
+from telemetry import Feed
+from events import *
+from compress import Compression, codecs
+from catalog import Catalog
+from ism import Grid
+from gravity import Gravity, load
+from astronomy import solar_mass
+import dashboard
 
 # Gets everything going
 def main():
+
+    # Reads the command line
+    parser = argparse.ArgumentParser(description = 'Simulates a ramjet.')
+    parser.add_argument('--checkpoint', action = 'store_true', help = 'save the state of the run every ten minutes, so it can be resumed')
+    parser.add_argument('--resume', action = 'store_true', help = 'continue the last run from its checkpoint; implies --checkpoint')
+    parser.add_argument('--catalog', nargs = '?', const = 'catalog.sqlite', help = 'file the run with statistics of its flight in a catalog, catalog.sqlite if not named')
+    parser.add_argument('--adaptive', action = 'store_true', help = 'store only the steps where velocity, fuel or throttles have changed')
+    parser.add_argument('--compression', choices = list(codecs), default = None, help = 'compress the store in blocks with this codec')
+    parser.add_argument('--profile', action = 'store_true', help = 'time each stage of the step loop')
+    parser.add_argument('--dashboard', action = 'store_true', help = 'watch the run live in a window; needs pygame')
+    parser.add_argument('--ism', help = 'a grid of ISM densities, made with ism.create, to fly through instead of the uniform vacuum')
+    parser.add_argument('--stars', help = 'a CSV catalog of stars, with name, x and y in parsecs, and mass in solar masses, to feel the gravity of')
+    parser.add_argument('--origin', type = float, default = 0, help = 'mass of the star at the origin, in solar masses, when feeling gravity')
+    args = parser.parse_args()
     
     # The Ramjet to use in this simulation
     ramjet = 'ioRam-Beta'
@@ -18,15 +46,74 @@ def main():
     # Desired framerate for printouts
     framerate = 1000 / 60 if not debug else 1000
 
-    # The file to store data in
-    file = 'temp.txt'
+    # The directory to store data in
+    file = 'temp'
+
+    # Which steps to store.
+    # Recorder() keeps every step, EveryN(n) every nth step, Interval(t) one step per t seconds,
+    # and Adaptive(), with --adaptive, only steps where velocity, fuel or throttles have changed
+    recorder = Adaptive() if args.adaptive else Recorder()
+
+    # How to step the craft.
+    # Integrator() steps the parts with Euler at the rate above, Fused() does the same about twice as fast,
+    # or about 5 times as fast with a recorder that keeps every nth step or interval, as it takes the steps between at once,
+    # RK4() integrates with a fixed step, RK45() adapts the step to keep error within tolerance,
+    # and Rapidity() carries rapidity and proper time, and stays accurate near c with steps of days
+    integrator = Fused()
+
+    # Skips ahead analytically through coasts and steady burns; only works with Integrator() or Fused().
+    # Set to None to step through every second
+    fast_forward = FastForward() if not args.ism and not args.stars else None
+
+    # The medium the scoop sweeps up; a grid varies over the route, and cannot be fast-forwarded through
+    ism = Grid(args.ism) if args.ism else None
+
+    # Gravity of nearby stars and of the star at the origin. The craft starts at the origin, softened by the star's
+    # radius, so a star there holds on to it unless it can outthrust the star's surface gravity
+    gravity = Gravity(load(args.stars), origin = args.origin * solar_mass) if args.stars else None
+
+    # Conditions that end the run or are logged as it passes them, located within the step they happen in.
+    # See events.registry: tank_empty(), battery_depleted(), distance(metres) and fraction_of_c(fraction);
+    # terminal = True ends the run
+    events = Events([tank_empty(terminal = False), battery_depleted()])
+
+    # Compresses the store in blocks with zlib or lzma, in a pool of threads, if asked with --compression;
+    # otherwise columns are raw, and read back mapped from disk without copying.
+    # Blocks that rarely change are kept as runs and smooth ones as differences; downcast = [keys] keeps columns as float32
+    compression = Compression(args.compression) if args.compression else None
+
+    # Files the run with statistics of its flight when it ends, for comparing runs, if asked; see main_catalog.py
+    catalog = Catalog(args.catalog) if args.catalog else None
+
+    # Saves the state of the run every ten minutes, if asked, so it can be resumed with --resume
+    checkpoint = Checkpoint(f'{file}.checkpoint', 10 * minute) if args.checkpoint or args.resume else None
+
+    # Times each stage of the loop when profiling; the parts are only timed with Integrator()
+    instruments = Instruments() if args.profile else None
+
+    # Publishes snapshots for the dashboard
+    feed = Feed() if args.dashboard else None
 
     # Creates the simulation
-    simulation = Simulation(rate, framerate, ramjet, file) if not debug else DebugSimulation(rate, framerate, ramjet, file) 
+    simulation = Simulation(rate, framerate, ramjet, file, recorder, integrator = integrator, fast_forward = fast_forward, checkpoint = checkpoint, resume = args.resume, instruments = instruments, feed = feed, events = events, compression = compression, catalog = catalog, ism = ism, gravity = gravity) if not debug else DebugSimulation(rate, framerate, ramjet, file, recorder)
+
+    # Opens the dashboard in its own process
+    viewer = dashboard.start(feed) if feed else None
 
     # Runs the simulation
     simulation()
 
+    # Saves the timings, as JSON and for pstats
+    if instruments:
+        instruments.write(f'{file}.profile.json')
+        instruments.dump_stats(f'{file}.prof')
+
+    # Leaves the dashboard open until its window is closed
+    if viewer:
+        viewer.join()
+
 # Ready, set, go!
-main()
+# The dashboard's process imports this file, so it must not start a run of its own
+if __name__ == '__main__':
+    main()
 
@@ -0,0 +1,39 @@
+# Searches the design space of a ramjet
+
+from sweep import *
+from record import *
+from finkchlib.constants import hour
+
+# Gets everything going
+def main():
+
+    # The Ramjet whose design is varied
+    ramjet = 'ioRam-Beta'
+
+    # The parameters of each run; every combination is simulated
+    runs = grid(
+        scoop_radius    = [1e1, 1e2, 1e3],
+        scoop_power     = [1e5, 1e6],
+        power           = [1e6, 1e8],
+        v_e             = [2.5e4, 4.9e4]
+    )
+
+    # How many seconds are simulated in each step, and how many steps in each run
+    rate = 1
+    max_steps = 12 * hour
+
+    # The directory in which each run and the summary table are stored
+    directory = 'sweep'
+
+    # Every run is filed in this catalog, along with those of earlier sweeps; see main_catalog.py
+    catalog = 'catalog.sqlite'
+
+    # Creates the sweep; Adaptive keeps each run's store small
+    sweep = Sweep(ramjet, runs, rate, directory, max_steps, Adaptive, catalog = catalog)
+
+    # Runs the sweep
+    sweep()
+
+# Ready, set, go!
+if __name__ == '__main__':
+    main()
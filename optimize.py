@@ -0,0 +1,141 @@
+# Searches for the best ramjet design by successive halving, instead of running every design to the end.
+# Every candidate is run to a short horizon, ranked by an objective such as its velocity there, and only the best
+# fraction go on to a horizon that many times longer; the rest are dropped. Survivors are not started again: each
+# run ends on a checkpoint, and the next rung resumes it from there, so no step is simulated twice. Each rung is one
+# batch of runs in a process pool, as in a Sweep. With n candidates and a reduction of 3, about n log3(n) short runs'
+# worth of steps are simulated instead of n full runs.
+# Pruning is only as good as the ranking at short horizons. Designs that burn at the same thrust are all as fast
+# early on, so 'reach', which adds what the fuel left can still give, ranks them better than velocity does
+
+import os
+import math
+import numpy as np
+from math import hypot, log
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sweep import Sweep
+from simulation import Simulation
+from record import Recorder
+from integrator import Integrator
+from checkpoint import Checkpoint
+from catalog import Catalog
+
+# Returns sets of parameters drawn at random between bounds, evenly on a log scale, as designs span decades.
+# For example, sample(20, scoop_radius = (1e1, 1e3)) gives twenty scoop radii between 10 and 1000 m
+def sample(count: int, seed: int = 0, **bounds) -> list[dict]:
+    generator = np.random.default_rng(seed)
+
+    return [
+        {key: float(np.exp(generator.uniform(np.log(low), np.log(high)))) for key, (low, high) in bounds.items()}
+        for index in range(count)
+    ]
+
+# Objective name -> function of a simulation, higher being better
+objectives: dict = {
+    'velocity': lambda simulation: hypot(simulation.ramjet.spacetime.vel_x, simulation.ramjet.spacetime.vel_y),
+    'distance': lambda simulation: hypot(simulation.ramjet.spacetime.pos_x, simulation.ramjet.spacetime.pos_y),
+
+    # Velocity, plus the change in velocity the fuel left gives by the rocket equation
+    'reach':    lambda simulation: hypot(simulation.ramjet.spacetime.vel_x, simulation.ramjet.spacetime.vel_y) +
+                                   simulation.ramjet.thruster.v_e * log(simulation.ramjet.mass / simulation.ramjet.core_mass)
+}
+
+# An Optimizer runs candidate designs by successive halving, keeping the best of each rung
+class Optimizer(Sweep):
+    def __init__(self, ramjet: str, runs: list[dict], rate: float, directory: str, max_steps: int, objective: str = 'velocity', reduction: int = 3, rungs: int = None, recorder = Recorder, integrator = Integrator, workers: int = None, catalog: str = None) -> None:
+        super().__init__(ramjet, runs, rate, directory, max_steps, recorder, integrator, workers, catalog)
+
+        # What runs are ranked by; see objectives
+        assert objective in objectives, f'No such objective \'{objective}\'; there are {", ".join(objectives)}'
+        self.objective: str = objective
+
+        # One in this many runs goes on to the next rung
+        self.reduction: int = reduction
+
+        # Number of rungs; by default, enough that one run is left at the last
+        self.rungs: int = rungs if rungs else max(1, math.floor(math.log(len(runs), reduction) + 1e-9) + 1)
+
+        # Steps run by each rung, ending with the full horizon
+        self.horizons: list[int] = [max(1, max_steps // reduction ** (self.rungs - 1 - rung)) for rung in range(self.rungs)]
+
+        # Runs still in the search, and the steps simulated over the whole search
+        self.survivors: list[int] = []
+        self.simulated: int = 0
+
+    def __str__(self) -> str:
+        return f'successive halving of {len(self.runs)} designs by {self.objective} over {self.rungs} rungs, keeping 1 in {self.reduction} (horizons {self.horizons})'
+
+    # Calling an Optimizer runs every rung, then writes the summary table.
+    # Returns the runs that reached the last rung, best first
+    def __call__(self) -> list[dict]:
+        os.makedirs(self.directory, exist_ok = True)
+
+        self.results = [None] * len(self.runs)
+        self.survivors = list(range(len(self.runs)))
+        self.simulated = 0
+
+        with ProcessPoolExecutor(max_workers = self.workers) as pool:
+            for rung, horizon in enumerate(self.horizons):
+                futures = {pool.submit(extend, self.job(index, rung)): index for index in self.survivors}
+
+                for future in as_completed(futures):
+                    index = futures[future]
+                    self.simulated += future.result()['steps'] - (self.results[index]['steps'] if self.results[index] else 0)
+                    self.results[index] = {**future.result(), 'rung': rung}
+
+                # The best go on to the next rung
+                ranked = sorted(self.survivors, key = self.score)
+                if rung < self.rungs - 1:
+                    self.survivors = ranked[:max(1, len(ranked) // self.reduction)]
+                else:
+                    self.survivors = ranked
+
+                best = self.results[ranked[0]]
+                print(f'Rung {rung + 1} / {self.rungs}: {len(ranked)} runs to {horizon} steps, best {self.objective} {best["objective"]:.3e}: {self.runs[ranked[0]]}')
+
+        print(f'Simulated {self.simulated:.3e} steps, against {len(self.runs) * (self.max_steps + 1):.3e} for running every design to the end')
+
+        self.write()
+
+        return [self.results[index] for index in self.survivors]
+
+    # Rank of a run by its objective, lowest first; a run whose objective is not a number is last
+    def score(self, index: int) -> float:
+        value = self.results[index]['objective']
+        return -value if value == value else math.inf
+
+    # Everything a worker needs to take a run to a rung
+    def job(self, index: int, rung: int = None) -> dict:
+        rung = self.rungs - 1 if rung is None else rung
+
+        return {
+            **super().job(index),
+            'max_steps':    self.horizons[rung],
+            'resume':       rung > 0,
+            'final':        rung == self.rungs - 1,
+            'objective':    self.objective
+        }
+
+
+
+# Takes a run of an optimizer to a horizon, from where its last rung left it; runs in a worker process
+def extend(job: dict) -> dict:
+    checkpoint = Checkpoint(f'{job["file"]}.checkpoint', math.inf)
+
+    simulation = Simulation(job['rate'], 1000, job['ramjet'], job['file'], job['recorder'](), job['parameters'], job['max_steps'], job['integrator'](), checkpoint = checkpoint, resume = job['resume'], catalog = Catalog(job['catalog']) if job['catalog'] else None)
+    simulation.verbose = False
+
+    # Statistics are kept from the first rung, in the checkpoint, but a run is only filed once it reaches the last
+    if not job['final']:
+        simulation.catalog = None
+
+    # The last rung ended the run at its horizon; it goes on to this one
+    simulation.exist = simulation.steps <= simulation.max_steps
+    simulation()
+
+    return {
+        'run':      job['index'],
+        'file':     job['file'],
+        **job['parameters'],
+        **simulation.summary(),
+        'objective':    objectives[job['objective']](simulation)
+    }
@@ -1,28 +1,39 @@
 # Plots data
 
 import matplotlib.pyplot as mpl
+import numpy as np
+import pyramid
+from store import Store
 
-# Responsible for plotting data from text files
+# Responsible for plotting data from a Store.
+# Long runs are drawn from the level of each column's pyramid that gives about one bucket per pixel,
+# so drawing takes the same time however many rows there are. Zooming in redraws from a finer level
 class Plotter:
-    def __init__(self, data: dict, metadata: dict) -> None:
+    def __init__(self, store: Store) -> None:
 
-        self.metadata: dict = metadata
-        self.data: dict = data
+        self.store: Store = store
+        self.store.read_header()
 
+        self.metadata: dict = self.store.metadata
 
-
-    # Calling Plotter plots data
-    def __call__(self, x_key: str, y_key: str, plot_name: str, axes_names: list[str, str]) -> None:
-
-        # Grabs the necessary data
-        x = self.data[x_key]
-        y = self.data[y_key]
+    # Calling Plotter plots data.
+    # The x column must rise with the rows, as time and steps do; limits zooms in on a range of it
+    def __call__(self, x_key: str, y_key: str, plot_name: str, axes_names: list[str, str], limits: tuple[float, float] = None) -> None:
 
         # Grabs the figure and axes
         figure, axes = mpl.subplots()
 
         # Plots the data
-        axes.plot(x, y)
+        line, = axes.plot(*self.points(axes, x_key, y_key, limits))
+
+        if limits:
+            axes.set_xlim(*limits)
+
+        # Redraws from the right level when zoomed or panned
+        def redraw(axes) -> None:
+            line.set_data(*self.points(axes, x_key, y_key, axes.get_xlim()))
+
+        axes.callbacks.connect('xlim_changed', redraw)
 
         # Sets the title
         axes.set_title(plot_name)
@@ -31,6 +42,42 @@ class Plotter:
         mpl.xlabel(axes_names[0])
         mpl.ylabel(axes_names[1])
 
+    # Points to draw between some limits of x, read from the level that best fits the axes' width
+    def points(self, axes, x_key: str, y_key: str, limits: tuple[float, float] = None) -> tuple[np.ndarray, np.ndarray]:
+        start, stop = self.rows(x_key, limits)
+
+        # Width of the axes in pixels
+        width = max(axes.get_window_extent().width, 1)
+
+        level = self.level(stop - start, width)
+        buckets_x = self.store.buckets(x_key, level, start, stop)
+        buckets_y = self.store.buckets(y_key, level, start, stop)
+
+        # Each bucket is drawn through its first value, its extremes at its middle, and its last value
+        middle = (buckets_x['first'] + buckets_x['last']) / 2
+        x = np.stack((buckets_x['first'], middle, middle, buckets_x['last']), axis = 1).ravel()
+        y = np.stack((buckets_y['first'], buckets_y['min'], buckets_y['max'], buckets_y['last']), axis = 1).ravel()
+
+        return x, y
+
+    # The range of rows whose x is within some limits, or every row.
+    # A row either side is kept so the line runs to the edges of the axes
+    def rows(self, x_key: str, limits: tuple[float, float] = None) -> tuple[int, int]:
+        if not limits:
+            return 0, self.store.rows
+
+        start, stop = self.store.span(x_key, *limits)
+
+        return max(start - 1, 0), min(stop + 1, self.store.rows)
+
+    # The coarsest level with at least one bucket per pixel
+    def level(self, rows: int, width: float) -> int:
+        level = 0
+        while level < pyramid.levels and rows / pyramid.factor ** (level + 1) >= width:
+            level += 1
+
+        return level
+
     # Shows plot
     def show(self):
-        mpl.show()
\ No newline at end of file
+        mpl.show()
@@ -0,0 +1,93 @@
+# Downsampled copies of a Store's columns, for drawing long runs quickly.
+# Level L of a column holds one bucket per factor ** L rows, and each bucket keeps the first, lowest,
+# highest and last value of its rows, so a line drawn through the buckets looks the same as one drawn
+# through every row at the resolution of a screen. Levels are built as chunks are written, each from the one below
+
+import os
+import numpy as np
+
+# Rows per bucket of each level are factor ** level
+factor: int = 16
+
+# Number of levels above the raw column; the top level has a bucket per 268 million rows
+levels: int = 7
+
+# A bucket on disk
+bucket: np.dtype = np.dtype([('first', '<f8'), ('min', '<f8'), ('max', '<f8'), ('last', '<f8')])
+
+class Pyramid:
+    def __init__(self, file: str, key: str) -> None:
+
+        # The store's directory, and the column this is of
+        self.file: str = file
+        self.key: str = key
+
+        # Rows or buckets of the level below each level that do not fill a bucket yet.
+        # Index 0 is the raw rows waiting for level 1
+        self.pending: list[np.ndarray] = [np.empty(0)] + [np.empty(0, dtype = bucket) for level in range(1, levels)]
+
+    # Adds rows of the column, appending any buckets they complete
+    def add(self, values: np.ndarray) -> None:
+        incoming = values.astype('<f8', copy = False)
+
+        for level in range(1, levels + 1):
+            values = np.concatenate((self.pending[level - 1], incoming))
+
+            # Splits off the rows that fill whole buckets
+            count = len(values) // factor
+            self.pending[level - 1] = values[count * factor:]
+
+            if count == 0:
+                return
+
+            incoming = reduce(values[:count * factor])
+
+            with open(pyramid_path(self.file, self.key, level), 'ab') as file:
+                incoming.tofile(file)
+
+    # Cuts the pyramid back to a number of rows of the column, and reloads what is pending from disk.
+    # Of the column itself, only the rows after the last whole bucket of level 1 are needed
+    def resume(self, rows: int, tail: np.ndarray) -> None:
+        below = tail
+
+        for level in range(1, levels + 1):
+            count = rows // factor ** level
+            path = pyramid_path(self.file, self.key, level)
+
+            # Level files are only made once they have a bucket
+            if os.path.exists(path):
+                with open(path, 'r+b') as file:
+                    file.truncate(count * bucket.itemsize)
+
+            # The tail of the level below that does not fill a bucket
+            self.pending[level - 1] = np.array(below if level == 1 else below[count * factor:])
+
+            below = read(self.file, self.key, level, count)
+
+
+
+# Reduces rows, raw or buckets, to buckets of factor rows each
+def reduce(values: np.ndarray) -> np.ndarray:
+    if values.dtype.names:
+        first, low, high, last = (values[name].reshape(-1, factor) for name in bucket.names)
+    else:
+        first = low = high = last = values.reshape(-1, factor)
+
+    buckets = np.empty(len(first), dtype = bucket)
+    buckets['first'] = first[:, 0]
+    buckets['max'] = np.fmax.reduce(high, axis = 1) # Ignores nan, unless all rows are nan
+    buckets['min'] = np.fmin.reduce(low, axis = 1)
+    buckets['last'] = last[:, -1]
+
+    return buckets
+
+# Reads the first buckets of a level, memory-mapped
+def read(file: str, key: str, level: int, count: int) -> np.ndarray:
+    if count == 0:
+        return np.empty(0, dtype = bucket)
+
+    return np.memmap(pyramid_path(file, key, level), dtype = bucket, mode = 'r', shape = (count,))
+
+# Returns the path to a level of a column's pyramid
+def pyramid_path(file: str, key: str, level: int) -> str:
+    return os.path.join(file, 'pyramid', f'{key}.{level}.bin')
@@ -1,13 +1,20 @@
 # A spacecraft
 
 from finkchlib.vector import radial_to_cartesian2, Vector2
-from finkchlib.constants import vacuum_H_mass_density
-from spacetime import RelativisticSpacetime
+from spacetime import Spacetime, RelativisticSpacetime
+from finkchlib.constants import c
+from ism import Uniform
+from math import hypot, atan2, cos, sin, pi, sqrt
+from instrument import stages
 import numpy as np
 
 # A ramjet is our basic spacecraft.
 # This class will act like an interface for our proper crafts
 class Ramjet:
+
+    # Names of the telemetry in the slots, as with parts
+    fields: list[str] = ['mass']
+
     def __init__(self, name: str, mass: float, fuel_capacity: float, battery_capacity: float, thrust: float, v_e: float, engine_power: float, scoop_power: float, scoop_radius: float, power: float) -> None:
         
         self.name: str = name
@@ -25,8 +32,20 @@ class Ramjet:
         self.scooper = Scoop('scoop', scoop_power, scoop_radius, 1)
         self.generator = Generator('generator', power)
 
+        # The medium the scoop sweeps up; see ism.py
+        self.ism = Uniform()
+
+        # Gravity acting on the craft, if any; see gravity.py
+        self.gravity = None
+
         self.update_mass()
 
+        # Telemetry, filled in when a snapshot is taken
+        self.slots: np.ndarray = np.full(len(self.fields), np.nan)
+
+        # Times each part as it acts; idle until instrumented
+        self.stages: list = stages(None, ['generator', 'scoop', 'thruster', 'spacetime'])
+
     def __str__(self) -> str:
         return f'{self.name},\t\t{self.mass} kg\n\
             fuel:\t{self.tank}  kg\n\
@@ -35,31 +54,216 @@ class Ramjet:
             vel:\t{self.spacetime.velocity} m/s\n\
             acc:\t{self.spacetime.acceleration_preview} m/s^2'
 
+    # Times each part as it acts, within the integrator's stage, if instruments are supplied; see instrument.py
+    def instrument(self, instruments) -> None:
+        self.stages = stages(instruments, ['generator', 'scoop', 'thruster', 'spacetime'], 'integrator')
+
     # One step of simulation for the craft
     def __call__(self, step):
+        generator, scoop, thruster, spacetime = self.stages
 
         # Generates power
+        generator.start()
         self.generator(self, step)
+        generator.stop()
 
         # Scoops up hydrogen
+        scoop.start()
         self.scooper(self, step)
+        scoop.stop()
 
         # Creates thrust
+        thruster.start()
         thrust = self.thruster(self, step)
-        
+        thruster.stop()
+
+        spacetime.start()
+
         # Updates mass
         self.update_mass()
 
-        # Applies thrust
+        # Applies thrust and gravity
         self.spacetime.force(self.mass, thrust)
+        self.pull()
 
         # Steps the craft forward
         self.spacetime(step)
+        spacetime.stop()
+
+    # One step of simulation for the craft, as __call__, with the parts' logic fused into plain float arithmetic.
+    # Nothing is allocated. Takes some number of steps at once if asked, as the Simulation does between steps it
+    # records: the state is kept in locals throughout, and written back, with the parts' telemetry of the last step,
+    # only at the end. Each step is the same arithmetic as one at a time, so the result is the same to the bit
+    def fused(self, step: float, count: int = 1) -> None:
+        spacetime = self.spacetime
+        thruster = self.thruster
+        scoop = self.scooper
+        ism, gravity = self.ism, self.gravity
+
+        # The step of the spacetime is done here for those that step in Newtonian or dilated time;
+        # any other spacetime steps itself, from the state written back to it each step
+        kind = type(spacetime)
+        inlined = kind is RelativisticSpacetime or kind is Spacetime
+        dilated = kind is not Spacetime
+
+        # The design, which stepping does not change
+        generation = self.generator.power * step
+        tank_capacity, battery_capacity = self.tank.capacity, self.battery.capacity
+        scoop_power, radius, efficiency = scoop.power, scoop.radius, scoop.efficiency
+        m_d, engine_power, v_e = thruster.m_d, thruster.power, thruster.v_e
+        core_mass = self.core_mass
+
+        # The state, which it does
+        tank, battery = self.tank.fuel, self.battery.fuel
+        time, pos_x, pos_y, vel_x, vel_y = spacetime.time, spacetime.pos_x, spacetime.pos_y, spacetime.vel_x, spacetime.vel_y
+        applied_x, applied_y = spacetime.acc_x, spacetime.acc_y
+        mass = self.mass
+
+        # Whether the thruster fired, as its telemetry is only written when it does
+        fired = False
+
+        for index in range(count):
+
+            # Generates power
+            battery += generation
+            if battery > battery_capacity:
+                battery = battery_capacity
+
+            # Allignment of scoop to ISM, as in Scoop
+            distance = hypot(pos_x, pos_y)
+            speed = hypot(vel_x, vel_y)
+            allignment = pos_x / distance * (vel_x / speed) + pos_y / distance * (vel_y / speed) if distance and speed else 0
+            if not allignment > 0: # Also catches nan
+                allignment = 0
+
+            # Power available to the scoop
+            scoop_drawn = scoop_power
+            if scoop_drawn > battery:
+                scoop_drawn, scoop_throttle = battery, battery / scoop_drawn
+                battery = 0
+            else:
+                battery -= scoop_drawn
+                scoop_throttle = 1
+
+            # Hydrogen scooped up into the tank
+            area = pi * (radius * scoop_throttle) ** 2
+            volume = area * allignment * speed * step
+            m_H = efficiency * volume * ism(pos_x, pos_y) if volume else 0
+
+            tank += m_H
+            if tank > tank_capacity:
+                tank = tank_capacity
+
+            # Creates thrust, as in Thruster
+            thrust_x = thrust_y = 0
+            if tank != 0:
+                fired = True
+
+                # Obtains some fuel and power
+                fuel = m_d * step
+                if fuel > tank:
+                    fuel, fuel_throttle = tank, tank / fuel
+                    tank = 0
+                else:
+                    tank -= fuel
+                    fuel_throttle = 1
+
+                power = engine_power * step
+                if power > battery:
+                    power, power_throttle = battery, battery / power
+                    battery = 0
+                else:
+                    battery -= power
+                    power_throttle = 1
+
+                # Refunds spare fuel or power when throttles don't match, as Ramjet.refund
+                if fuel_throttle < power_throttle:
+                    effective = power * fuel_throttle / power_throttle
+                    battery += power - effective
+                    if battery > battery_capacity:
+                        battery = battery_capacity
+                    power = effective
+                elif power_throttle < fuel_throttle:
+                    effective = fuel * power_throttle / fuel_throttle
+                    tank += fuel - effective
+                    if tank > tank_capacity:
+                        tank = tank_capacity
+                    fuel = effective
+
+                thrust = fuel * v_e
+
+                # Oriented backwards from the craft
+                phi = atan2(pos_y, pos_x)
+                thrust_x = thrust * cos(phi)
+                thrust_y = thrust * sin(phi)
+
+            # Updates mass
+            mass = core_mass + tank
+
+            # Applies thrust and gravity
+            acc_x, acc_y = thrust_x / mass, thrust_y / mass
+            if gravity:
+                gravity_x, gravity_y = gravity(pos_x, pos_y)
+                acc_x += gravity_x
+                acc_y += gravity_y
+
+            # Steps the craft forward, as Spacetime.advance, in the craft's time if dilated
+            if inlined:
+                proper = step / (1 / sqrt(1 - (speed / c) ** 2)) if dilated else step
+                time += proper
+                acc_x += applied_x
+                acc_y += applied_y
+                vel_x = vel_x + acc_x * proper
+                vel_y = vel_y + acc_y * proper
+                pos_x += vel_x * proper
+                pos_y += vel_y * proper
+                applied_x = applied_y = 0
+            else:
+                spacetime.time, spacetime.pos_x, spacetime.pos_y, spacetime.vel_x, spacetime.vel_y = time, pos_x, pos_y, vel_x, vel_y
+                spacetime.advance(step, acc_x, acc_y)
+                time, pos_x, pos_y, vel_x, vel_y = spacetime.time, spacetime.pos_x, spacetime.pos_y, spacetime.vel_x, spacetime.vel_y
+
+        # Writes the state back
+        self.tank.fuel, self.battery.fuel, self.mass = tank, battery, mass
+        if inlined:
+            spacetime.time, spacetime.pos_x, spacetime.pos_y, spacetime.vel_x, spacetime.vel_y = time, pos_x, pos_y, vel_x, vel_y
+            spacetime.preview_x, spacetime.preview_y = acc_x, acc_y
+            spacetime.acc_x = spacetime.acc_y = 0
+
+        # And the telemetry of the last step
+        self.generator.slots[0] = self.generator.power
+
+        slots = scoop.slots
+        slots[0] = m_H
+        slots[1] = scoop_drawn
+        slots[2] = scoop_throttle
+        slots[3] = allignment
+        slots[4] = area
+        slots[5] = volume
+
+        if fired:
+            slots = thruster.slots
+            slots[0] = thrust
+            slots[1] = fuel
+            slots[2] = fuel_throttle
+            slots[3] = power
+            slots[4] = power_throttle
+
+    # Applies gravity to the craft, if there is any
+    def pull(self) -> None:
+        if self.gravity:
+            gravity_x, gravity_y = self.gravity(self.spacetime.pos_x, self.spacetime.pos_y)
+            self.spacetime.acc_x += gravity_x
+            self.spacetime.acc_y += gravity_y
 
     # Craft mass is craft of the parts plus fuel in tank
     def update_mass(self) -> None:
         self.mass = self.core_mass + self.tank.fuel
 
+    # Copies the state into the slots
+    def capture(self) -> None:
+        self.slots[0] = self.mass
+
     # Applies a force to the craft
     def force(self, amount) -> None:
         self.spacetime.force(self.mass, amount)
@@ -79,6 +283,144 @@ class Ramjet:
         tank.pipe_in(fuel - fuel_effective)
         return fuel_effective
     
+    # The state of the craft as an array, for the integrators in integrator.py.
+    # State is [pos_x, pos_y, vel_x, vel_y, time, fuel, battery]
+    def get_state(self) -> np.ndarray:
+        return np.array([
+            self.spacetime.position.x,
+            self.spacetime.position.y,
+            self.spacetime.velocity.x,
+            self.spacetime.velocity.y,
+            self.spacetime.time,
+            self.tank.fuel,
+            self.battery.fuel
+        ])
+
+    # Sets the state of the craft after an integrator steps it forward.
+    # Part previews are updated with the flows at the new state over the step
+    def set_state(self, state: np.ndarray, step: float) -> None:
+        pos_x, pos_y, vel_x, vel_y, time, fuel, battery = state
+
+        self.spacetime.position = Vector2(pos_x, pos_y)
+        self.spacetime.velocity = Vector2(vel_x, vel_y)
+        self.spacetime.time = time
+
+        flows = self.set_stores(fuel, battery, step)
+        self.spacetime.acceleration_preview = Vector2(flows['acc_x'], flows['acc_y'])
+
+    # Sets the tank and battery, leaving the spacetime as it is, as for a spacetime that keeps more than the state
+    # shows, such as rapidity. Part previews are updated with the flows at the new state over the step, which are returned
+    def set_stores(self, fuel: float, battery: float, step: float) -> dict:
+
+        # Stores cannot leave their bounds
+        self.tank.fuel = min(max(fuel, 0), self.tank.capacity)
+        self.battery.fuel = min(max(battery, 0), self.battery.capacity)
+
+        self.update_mass()
+
+        flows = self.flows(self.get_state())
+
+        self.thruster.preview = {
+            'thrust': flows['thrust'],
+            'fuel': flows['burn'] * step,
+            'fuel_throttle': flows['fuel_throttle'],
+            'power': self.thruster.power * flows['thruster_throttle'] * step,
+            'power_throttle': flows['power_throttle']
+        }
+        self.scooper.preview = {
+            'm_H': flows['intake'] * step,
+            'power': self.scooper.power * flows['power_throttle'] * step,
+            'power_throttle': flows['power_throttle'],
+            'allignment': flows['allignment'],
+            'area': flows['area'],
+            'volume': flows['volume'] * step
+        }
+        self.generator.preview = {
+            'power': self.generator.power
+        }
+
+        return flows
+
+    # Rate of change of the state, for the integrators in integrator.py
+    def derivative(self, state: np.ndarray) -> np.ndarray:
+        flows = self.flows(state)
+
+        return np.array([
+            state[2] * flows['dilation'],
+            state[3] * flows['dilation'],
+            flows['acc_x'] * flows['dilation'],
+            flows['acc_y'] * flows['dilation'],
+            flows['dilation'],
+            flows['fuel'],
+            flows['battery']
+        ])
+
+    # The same logic as the parts, but fuel and power are treated as continuous flows.
+    # Throttles only drop when a store is empty and its supply cannot meet demand,
+    # so this does not depend on the step size
+    def flows(self, state: np.ndarray) -> dict:
+        pos_x, pos_y, vel_x, vel_y, time, fuel, battery = state
+
+        position = Vector2(pos_x, pos_y)
+        velocity = Vector2(vel_x, vel_y)
+
+        # Power throttle: full while there is charge, otherwise whatever the generator can supply
+        demand = self.thruster.power + self.scooper.power
+        power_throttle = 1 if battery > 0 or demand <= self.generator.power else self.generator.power / demand
+
+        # Allignment of scoop to ISM, as in Scoop
+        allignment = max(position.normal() ^ velocity.normal(), 0)
+        if allignment != allignment: # Check for nan
+            allignment = 0
+
+        # Hydrogen scooped up per second
+        area = np.pi * (self.scooper.radius * power_throttle) ** 2
+        volume = area * allignment * velocity.hypo()
+        intake = self.scooper.efficiency * volume * self.ism(pos_x, pos_y) if volume else 0
+
+        # Fuel throttle: full while there is fuel, otherwise whatever the scoop can supply
+        fuel_throttle = 1 if fuel > 0 or self.thruster.m_d <= intake else intake / self.thruster.m_d
+
+        # The thruster runs at the lower of its throttles, as with Ramjet.refund
+        thruster_throttle = min(fuel_throttle, power_throttle)
+        burn = self.thruster.m_d * thruster_throttle
+        thrust = burn * self.thruster.v_e
+
+        # Net flows into the stores, which cannot fill past capacity
+        fuel_flow = intake - burn
+        if fuel >= self.tank.capacity and fuel_flow > 0:
+            fuel_flow = 0
+
+        battery_flow = self.generator.power - self.thruster.power * thruster_throttle - self.scooper.power * power_throttle
+        if battery >= self.battery.capacity and battery_flow > 0:
+            battery_flow = 0
+
+        # Thrust is oriented along the position, as in Thruster
+        phi = position.phi()
+        mass = self.core_mass + max(fuel, 0)
+
+        # Gravity, if there is any
+        gravity_x, gravity_y = self.gravity(pos_x, pos_y) if self.gravity else (0, 0)
+
+        return {
+            'dilation':             self.spacetime.dilation(velocity),
+            'acc_x':                thrust * np.cos(phi) / mass + gravity_x,
+            'acc_y':                thrust * np.sin(phi) / mass + gravity_y,
+            'gravity_x':            gravity_x,
+            'gravity_y':            gravity_y,
+            'thrust':               thrust,
+            'burn':                 burn,
+            'intake':               intake,
+            'fuel':                 fuel_flow,
+            'battery':              battery_flow,
+            'fuel_throttle':        fuel_throttle,
+            'power_throttle':       power_throttle,
+            'thruster_throttle':    thruster_throttle,
+            'allignment':           allignment,
+            'area':                 area,
+            'volume':               volume
+        }
+
     def get_previews(self):
         return {
             'parts': {
@@ -94,17 +436,63 @@ class Ramjet:
 
 
 
-# A Part is any component of a spacecraft
+# A Part is any component of a spacecraft.
+# A part's telemetry lives in slots, a preallocated float array with one entry per field.
+# The slots start out on their own and are later bound to a row of a Schema, so that writing
+# telemetry as the part acts is also writing the snapshot; nothing is allocated per step
 class Part:
+
+    __slots__ = ('name', 'slots')
+
+    # Names of the part's telemetry, in the order of its slots
+    fields: list[str] = []
+
     def __init__(self, name: str) -> None:
         self.name: str = name
-        self.preview = {}
+
+        # Telemetry is nan until the part first acts
+        self.slots: np.ndarray = np.full(len(self.fields), np.nan)
+
+    # Reads a field of telemetry, or the default if the part has not acted yet
+    def get(self, field: str, default: float = np.nan) -> float:
+        value = self.slots[self.fields.index(field)]
+        return default if value != value else float(value)
+
+    # Writes a field of telemetry
+    def set(self, field: str, value: float) -> None:
+        self.slots[self.fields.index(field)] = value
+
+    # Whether the part has acted yet
+    def acted(self) -> bool:
+        return len(self.fields) > 0 and self.slots[0] == self.slots[0]
+
+    # Copies state into the slots; parts whose telemetry is written as they act have nothing to do
+    def capture(self) -> None:
+        pass
+
+    # The telemetry as a dictionary; empty until the part first acts
+    @property
+    def preview(self) -> dict:
+        if not self.acted():
+            return {}
+
+        return {field: float(value) for field, value in zip(self.fields, self.slots)}
+
+    @preview.setter
+    def preview(self, preview: dict) -> None:
+        for index, field in enumerate(self.fields):
+            self.slots[index] = preview.get(field, np.nan)
 
     def get_preview(self):
         return self.preview
 
 # A Tank holds fuel or battery charge
 class Tank(Part):
+
+    __slots__ = ('capacity', 'fuel')
+
+    fields: list[str] = ['fuel', 'capacity']
+
     def __init__(self, name: str, capacity: float) -> None:
         super().__init__(name)
         
@@ -152,6 +540,11 @@ class Tank(Part):
     # Checks if the tank is empty
     def is_empty(self) -> bool:
         return self.fuel == 0
+
+    # A tank's telemetry is its state, which is copied when a snapshot is taken
+    def capture(self) -> None:
+        self.slots[0] = self.fuel
+        self.slots[1] = self.capacity
     
     def get_preview(self):
         return {
@@ -163,6 +556,11 @@ class Tank(Part):
 
 # A Thruster provides thrust
 class Thruster(Part):
+
+    __slots__ = ('thrust', 'v_e', 'm_d', 'power')
+
+    fields: list[str] = ['thrust', 'fuel', 'fuel_throttle', 'power', 'power_throttle']
+
     def __init__(self, name: str, thrust: float, v_e: float, power: float) -> None:
         super().__init__(name)
 
@@ -200,14 +598,13 @@ class Thruster(Part):
         # The thrust generated
         thrust = fuel * self.v_e
 
-        # Updates the part's preview
-        self.preview = {
-            'thrust': thrust,
-            'fuel': fuel,
-            'fuel_throttle': fuel_throttle,
-            'power': power,
-            'power_throttle': power_throttle
-            }
+        # Updates the part's telemetry
+        slots = self.slots
+        slots[0] = thrust
+        slots[1] = fuel
+        slots[2] = fuel_throttle
+        slots[3] = power
+        slots[4] = power_throttle
 
         # Converts the thrust to a vector oriented backwards from the craft
         return radial_to_cartesian2(thrust, ramjet.spacetime.position.phi())
@@ -216,6 +613,11 @@ class Thruster(Part):
 
 # A Scoop provides fuel
 class Scoop(Part):
+
+    __slots__ = ('power', 'radius', 'efficiency')
+
+    fields: list[str] = ['m_H', 'power', 'power_throttle', 'allignment', 'area', 'volume']
+
     def __init__(self, name: str, power: float, max_radius: float, efficiency: float) -> None:
         super().__init__(name)
         self.power = power
@@ -242,25 +644,29 @@ class Scoop(Part):
         V_eff = area * allignment * ramjet.spacetime.velocity.hypo() * step
 
         # Mass of hydrogen scooped up
-        m_H = self.efficiency * V_eff * vacuum_H_mass_density
+        m_H = self.efficiency * V_eff * ramjet.ism(ramjet.spacetime.pos_x, ramjet.spacetime.pos_y) if V_eff else 0
 
         # Adds the mass scooped up to the tank
         ramjet.tank.pipe_in(m_H)
 
-        # Updates the part's preview
-        self.preview = {
-            'm_H': m_H,
-            'power': power,
-            'power_throttle': throttle,
-            'allignment': allignment,
-            'area': area,
-            'volume': V_eff
-        }
+        # Updates the part's telemetry
+        slots = self.slots
+        slots[0] = m_H
+        slots[1] = power
+        slots[2] = throttle
+        slots[3] = allignment
+        slots[4] = area
+        slots[5] = V_eff
 
 
 
 # A Generator provides power
 class Generator(Part):
+
+    __slots__ = ('power',)
+
+    fields: list[str] = ['power']
+
     def __init__(self, name, power) -> None:
         super().__init__(name)
         self.power = power
@@ -269,7 +675,5 @@ class Generator(Part):
     def __call__(self, ramjet: Ramjet, step: float) -> float:
         ramjet.battery.pipe_in(self.power * step)
         
-        # Updates the part's preview
-        self.preview = {
-            'power': self.power
-        }
\ No newline at end of file
+        # Updates the part's telemetry
+        self.slots[0] = self.power
\ No newline at end of file
@@ -0,0 +1,127 @@
+# Decides which steps of a simulation are recorded to the Store.
+# The first and last steps are always recorded by the Simulation itself
+
+from math import ceil
+
+# A Recorder records every step
+class Recorder:
+    def __init__(self) -> None:
+        pass
+
+    def __str__(self) -> str:
+        return 'every step'
+
+    # Calling a Recorder returns whether to record the current step
+    def __call__(self, simulation) -> bool:
+        return True
+
+    # Steps from the current one to the next that may be recorded, so the steps between can be taken without asking.
+    # 1 when that cannot be told ahead, as when it depends on the state
+    def ahead(self, simulation) -> int:
+        return 1
+
+
+
+# Records every nth step
+class EveryN(Recorder):
+    def __init__(self, n: int) -> None:
+        super().__init__()
+
+        assert n >= 1, f'Cannot record every {n} steps'
+        self.n: int = n
+
+    def __str__(self) -> str:
+        return f'every {self.n} steps'
+
+    def __call__(self, simulation) -> bool:
+        return simulation.steps % self.n == 0
+
+    def ahead(self, simulation) -> int:
+        return self.n - simulation.steps % self.n
+
+
+
+# Records once every interval of sim time
+class Interval(Recorder):
+    def __init__(self, interval: float) -> None:
+        super().__init__()
+
+        assert interval > 0, f'Cannot record every {interval} s'
+        self.interval: float = interval
+
+        # Sim time of the next recording
+        self.next: float = 0
+
+    def __str__(self) -> str:
+        return f'every {self.interval} s'
+
+    def __call__(self, simulation) -> bool:
+        if simulation.sim_time < self.next:
+            return False
+
+        # Skips intervals that a large step jumped over
+        while self.next <= simulation.sim_time:
+            self.next += self.interval
+
+        return True
+
+    # One step short of where the steps reach the next recording, as sim time adds up with rounding
+    def ahead(self, simulation) -> int:
+        return max(1, ceil((self.next - simulation.sim_time) / simulation.step) - 1)
+
+
+
+# Records only when a watched quantity has moved past its tolerance since the last recording.
+# A quantity has moved when |value - last| > atol + rtol * |last|
+class Adaptive(Recorder):
+    def __init__(self, rtol: float = 1e-2, watch: dict = None, longest: float = None) -> None:
+        super().__init__()
+
+        # Relative tolerance shared by all quantities
+        self.rtol: float = rtol
+
+        # Name -> (getter, absolute tolerance)
+        self.watch: dict = watch if watch else watched()
+
+        # Longest sim time allowed between recordings, if any
+        self.longest: float = longest
+
+        # Values and sim time at the last recording
+        self.last: dict = {}
+        self.last_time: float = None
+
+    def __str__(self) -> str:
+        return f'adaptive (rtol {self.rtol}, watching {", ".join(self.watch)})'
+
+    def __call__(self, simulation) -> bool:
+        values = {name: getter(simulation) for name, (getter, atol) in self.watch.items()}
+
+        # Always records the first call and after the longest gap
+        record = self.last_time is None
+        if not record and self.longest:
+            record = simulation.sim_time - self.last_time >= self.longest
+
+        # Records when any quantity moves past its tolerance
+        if not record:
+            for name, (getter, atol) in self.watch.items():
+                if abs(values[name] - self.last[name]) > atol + self.rtol * abs(self.last[name]):
+                    record = True
+                    break
+
+        if record:
+            self.last = values
+            self.last_time = simulation.sim_time
+
+        return record
+
+
+
+# The default quantities to watch: velocity, tank fuel and the throttles
+def watched() -> dict:
+    return {
+        'velocity':         (lambda simulation: simulation.ramjet.spacetime.velocity.hypo(),                    1),
+        'fuel':             (lambda simulation: simulation.ramjet.tank.fuel,                                    1e-3),
+        'fuel_throttle':    (lambda simulation: simulation.ramjet.thruster.get('fuel_throttle', 0),     1e-3),
+        'power_throttle':   (lambda simulation: simulation.ramjet.thruster.get('power_throttle', 0),    1e-3),
+        'scoop_throttle':   (lambda simulation: simulation.ramjet.scooper.get('power_throttle', 0),     1e-3)
+    }
@@ -6,29 +6,121 @@ from finkchlib.vector import Vector2
 from finkchlib.constants import *
 from ramjet import Ramjet
 from store import Store
+from compress import Compression
+from record import Recorder
+from integrator import Integrator, Fused
+from fastforward import FastForward
+from checkpoint import Checkpoint
+from snapshot import Schema, Ring, components
+from instrument import Instruments, stages
+from telemetry import Feed
+from events import Events, restore
+from catalog import Catalog, Statistics
+import numpy as np
 import hangar
 
 class Simulation:
-    def __init__(self, rate: float, framerate: float, ramjet: str, file: str) -> None:
+
+    # Names of the telemetry in the slots, as with parts of a Ramjet
+    fields: list[str] = ['steps', 'sim_time', 'real_time']
+
+    def __init__(self, rate: float, framerate: float, ramjet: str, file: str, recorder: Recorder = None, parameters: dict = None, max_steps: int = 2 * day, integrator: Integrator = None, fast_forward: FastForward = None, checkpoint: Checkpoint = None, resume: bool = False, instruments: Instruments = None, feed: Feed = None, events: Events = None, compression: Compression = None, catalog: Catalog = None, ism = None, gravity = None) -> None:
         self.exist: bool = True
 
+        # Whether to print a summary at the end
+        self.verbose: bool = True
+
         # Used to track performance
         self.clock: Time = Time(rate, framerate)
 
-        # Seconds per simulation step
+        # Seconds per simulation step; adaptive integrators change this as they go
         self.step: float = rate
 
         # Keep track of simulation parameters
         self.steps = 0
         self.sim_time = 0
 
+        # Safety limit on the number of steps
+        self.max_steps: int = max_steps
+
+
+        # The craft to simulate; parameters override those of the design
+        self.parameters: dict = parameters if parameters else {}
+        self.ramjet: Ramjet = hangar.get_ramjet(ramjet, **self.parameters)
+
+        # The medium the scoop sweeps up, if not the uniform vacuum; see ism.py
+        if ism:
+            self.ramjet.ism = ism
+
+        # Gravity of the star at the origin and of nearby stars, if supplied; see gravity.py
+        self.ramjet.gravity = gravity
+
+
+        # Steps the craft forward; by default, Euler through the parts
+        self.integrator: Integrator = integrator if integrator else Integrator()
+
+        # Some integrators need a spacetime of their own kind, which takes over where the ramjet's is
+        if self.integrator.spacetime:
+            spacetime = self.ramjet.spacetime
+            self.ramjet.spacetime = self.integrator.spacetime(spacetime.position, spacetime.velocity)
+
+        # Skips ahead through closed-form regimes, if supplied.
+        # Its solutions follow the per-step model of the parts, so it needs an Euler integrator
+        self.fast_forward: FastForward = fast_forward
+        assert not fast_forward or type(self.integrator) in (Integrator, Fused), 'Fast-forward needs an Euler integrator'
+        assert not fast_forward or self.ramjet.ism.uniform, 'Fast-forward needs a uniform medium'
+        assert not fast_forward or not gravity, 'Fast-forward cannot be used with gravity'
 
-        # The craft to simulate
-        self.ramjet: Ramjet = hangar.get_ramjet(ramjet)
+        # Decides which steps are stored; by default, every step
+        self.recorder: Recorder = recorder if recorder else Recorder()
 
+        # The fused integrator takes the steps between those the recorder keeps many at a time, up to this many, so the
+        # feed and checkpoint, which count passes of the loop, still come round often enough.
+        # After an event undoes a batch, steps are taken one at a time for as many as it held
+        self.batching: bool = type(self.integrator) is Fused
+        self.batch_size: int = 1024
+        self.held: int = 0
 
-        # Used to store data at each step
-        self.store: Store = Store(file, {'step_size': self.step, 'name': self.ramjet.name})
+        # The last step that was stored
+        self.recorded: int = None
+
+        # Saves the state of the simulation now and then, if supplied
+        self.checkpoint: Checkpoint = checkpoint
+
+        # End and transition conditions, located within the step they happen in, if supplied
+        self.events: Events = events
+
+        # Where to file the run when it ends, if supplied, with statistics kept as it steps
+        self.catalog: Catalog = catalog
+        self.statistics: Statistics = Statistics() if catalog else None
+
+        # Whether the run has been filed, kept in checkpoints so that resuming a finished run does not file it again
+        self.filed: bool = False
+
+        # Layout of a snapshot, derived once; the components' telemetry is written straight into its live row
+        self.slots: np.ndarray = np.full(len(self.fields), np.nan)
+        self.schema: Schema = Schema(components(self))
+
+        # Used to store data at each step, compressed if supplied.
+        # When resuming, the existing store is appended to from the checkpoint onwards, compressed as it was
+        if resume:
+            assert checkpoint and checkpoint.exists(), 'Cannot resume without a checkpoint'
+            self.store: Store = Store(file)
+            self.checkpoint.load(self)
+        else:
+            self.store: Store = Store(file, {'step_size': self.step, 'name': self.ramjet.name, 'recorder': str(self.recorder), 'integrator': str(self.integrator), 'events': str(self.events) if self.events else None, 'ism': str(self.ramjet.ism), 'gravity': str(gravity) if gravity else None, 'parameters': self.parameters}, compression = compression)
+
+        # Holds snapshots until there are enough for a chunk of the store
+        self.ring: Ring = Ring(self.schema, self.store, self.store.chunk_size)
+
+        # Times each stage of the loop, if supplied
+        self.instruments: Instruments = instruments
+        self.ramjet.instrument(instruments)
+
+        # Publishes snapshots for live views once a frame, if supplied
+        self.feed: Feed = feed
+        if self.feed:
+            self.feed.open(self.schema, framerate)
     
     # Calling Simulation begins simulation loop
     def __call__(self):
@@ -36,45 +128,164 @@ class Simulation:
         # Stamps start of simulation
         self.clock.real_time.stamp()
 
+        # Times each stage of the loop; idle unless instruments are supplied
+        recorder, capture, commit, clock, integrator, events, statistics, fast_forward, check_end, checkpoint, feed = stages(self.instruments,
+            ['recorder', 'capture', 'commit', 'clock', 'integrator', 'events', 'statistics', 'fast_forward', 'check_end', 'checkpoint', 'feed'])
+
         # Simulation loop
         while self.exist:
             
-            # Adds snapshot to data store
-            self.store.add(self.preview())
+            # Adds snapshot to data store.
+            # The first step is always kept; the step of an event already has been
+            recorder.start()
+            record = self.recorded != self.steps and (self.recorder(self) or self.recorded is None)
+            recorder.stop()
+
+            if record:
+                capture.start()
+                self.schema.capture()
+                capture.stop()
+
+                commit.start()
+                self.ring.commit()
+                commit.stop()
+
+                self.recorded = self.steps
             
             # Stamps time taken for sim step
+            clock.start()
             self.clock()
-            self.sim_time += self.step
-            self.steps += 1
-
-            # Simulates the ramjet
-            self.ramjet(self.step)
+            clock.stop()
+
+            # Keeps the state before the step, to go back to an event within it
+            if self.events:
+                events.start()
+                self.events.save(self)
+                events.stop()
+
+            # Simulates the ramjet; the integrator may take a different step than requested.
+            # Up to the next step the recorder may keep, the fused integrator takes many steps at once
+            integrator.start()
+            batched = self.batch() if self.batching else 0
+            if not batched:
+                taken, self.step = self.integrator(self.ramjet, self.step)
+            integrator.stop()
+
+            if not batched:
+
+                # Cuts the step short at the first event within it
+                if self.events:
+                    events.start()
+                    taken = self.events(self, taken)
+                    events.stop()
+
+                self.sim_time += taken
+                self.steps += 1
+
+            # Adds the step, or the steps, to the run's statistics
+            if self.statistics:
+                statistics.start()
+                self.statistics(self, batched * self.step, batched) if batched else self.statistics(self, taken)
+                statistics.stop()
+
+            # Jumps ahead while the craft is in a regime with a closed-form solution, but not past an event
+            if self.fast_forward:
+                fast_forward.start()
+                skipped = self.events.jump(self) if self.events else self.fast_forward(self)
+                fast_forward.stop()
+                self.sim_time += skipped * self.step
+                self.steps += skipped
+
+                if skipped and self.statistics:
+                    self.statistics(self, skipped * self.step, skipped)
             
             # Checks whether the simulation can end
+            check_end.start()
             self.check_end()
+            check_end.stop()
+
+            # Saves a checkpoint now and then
+            if self.checkpoint:
+                checkpoint.start()
+                self.checkpoint(self)
+                checkpoint.stop()
+
+            # Publishes a snapshot for live views now and then
+            if self.feed:
+                feed.start()
+                self.feed(self)
+                feed.stop()
 
         # Handles the end of the simulation
         self.end()
 
 
+    # Takes the steps up to the next that the recorder may keep at once, through Ramjet.fused, if there are several.
+    # Events are checked over the whole batch, as over a jump of fast-forward: if one happened within it, the batch is
+    # undone and its steps are taken one at a time, so the event is stepped into and located.
+    # Returns the number of steps taken, or 0 if the next step is to be taken on its own
+    def batch(self) -> int:
+        if self.held:
+            self.held -= 1
+            return 0
+
+        count = min(self.recorder.ahead(self), self.max_steps + 1 - self.steps, self.batch_size)
+        if count < 2:
+            return 0
+
+        # The live row, as the steps change the parts' telemetry; the state before them was kept by Events.save
+        events = self.events
+        if events:
+            if events.row is None:
+                events.row = np.empty_like(self.schema.flat)
+            events.row[:] = self.schema.flat
+
+        self.ramjet.fused(self.step, count)
+
+        if events and any(event.crossed(value, event(self)) for event, value in zip(events.events, events.values)):
+            restore(self.ramjet, events.state)
+            self.schema.flat[:] = events.row
+
+            self.held = count
+            events.undone += 1
+
+            return 0
+
+        # Sim time adds up a step at a time, as it would have
+        sim_time, step = self.sim_time, self.step
+        for index in range(count):
+            sim_time += step
+
+        self.sim_time = sim_time
+        self.steps += count
+
+        return count
+
     # Performs a printout
     def printout(self):
         print('\n\n')
-        print(f'Rate:\t\t\t{self.step:.0f} s : 1 step')
+        print(f'Rate:\t\t\t{self.step:.0f} s : 1 step ({self.integrator})')
         print(f'Total time:\t\t{readable_time((self.clock.real_time.peek_dif(1) + self.clock.real_time.peek_dif(0)) / 1000)} -> {(self.clock.real_time.peek_dif(1) + self.clock.real_time.peek_dif(0)) / 1000:.2e} s')
         print(f'Time to simulate:\t{readable_time(self.clock.real_time.peek_dif(1) / 1000)} -> {self.clock.real_time.peek_dif(1) / 1000:.2e} s')
         print(f'Time to store:\t\t{readable_time(self.clock.real_time.peek_dif()/ 1000)} -> {self.clock.real_time.peek_dif()/ 1000:.2e} s')
         print(f'Sim time:\t\t{readable_time(self.sim_time)} -> {self.sim_time:.2e} s')
         print(f'Ramjet time (dilated):\t{readable_time(self.ramjet.spacetime.time)} -> {self.ramjet.spacetime.time:.2e} s')
+        if self.events:
+            logged = ', '.join(f'{event["name"]} at {event["sim_time"]:.2e} s' for event in self.store.events)
+            print(f'Events:\t\t\t{logged if logged else "none"} ({self.events.located} located, {self.events.undone} jumps undone)')
+        if self.fast_forward:
+            print(f'Fast-forwarded:\t\t{sum(self.fast_forward.skipped.values())} steps in {sum(self.fast_forward.jumps.values())} jumps {self.fast_forward.skipped}')
         print(f'Steps per second:\t{self.steps / self.clock.sim_time:.0f} (recent: {1000 / self.clock.timer.get_average_difs():.0f})')
+        print(f'Store stalled:\t\t{self.store.stats()["stall_time"]:.2e} s over {self.store.stats()["stalls"]} stalls (peak queue: {self.store.stats()["peak_depth"]} chunks, {self.store.stats()["peak_bytes"]:.2e} B)')
         print(self.ramjet)
 
     # Check if the simulation should end
     def check_end(self):
 
-        # One end condition: tank is empty
-        # This is not always a condition
-        #self.tank_empty()
+        # End conditions, such as the tank running dry, and transitions were located during the step.
+        # Which apply is not always the same, so they are supplied as Events; see events.py
+        if self.events:
+            self.events.log(self)
 
         # Safety end condition: a century of steps (not time!) has past
         self.heat_death()
@@ -85,27 +296,72 @@ class Simulation:
         # Timestamps end of simulation
         self.clock.real_time.stamp()
 
-        # Adds final snapshot; writes any remaining data
-        self.store.add(self.preview())
-        self.store.write()
+        # Adds final snapshot, which is also the step that ended the simulation; writes any remaining data
+        if self.recorded != self.steps:
+            self.record()
+
+        # Files the run once its store is complete, but marks it filed first, so the last checkpoint knows
+        filing = self.catalog and not self.filed
+        self.filed = self.filed or bool(self.catalog)
+
+        # The last checkpoint is of the finished run, so resuming it does nothing
+        if self.checkpoint:
+            self.checkpoint.save(self)
 
-        # Re-writes the file to be easily read
-        self.store.flatten_file()
+        self.ring.flush()
+        self.store.close()
 
-        # Timestamps time taken to write and flatten
+        if self.feed:
+            self.feed.close()
+
+        if filing:
+            self.catalog.add(self)
+
+        # Timestamps time taken to write
         self.clock.real_time.stamp()
 
-        self.printout()
-        print('All done!')
+        if self.verbose:
+            self.printout()
+            if self.instruments:
+                print(self.instruments.table())
+            print('All done!')
 
 
     
+    # Final state of the simulation, used to compare runs
+    def summary(self) -> dict:
+        return {
+            'steps':        self.steps,
+            'sim_time':     self.sim_time,
+            'real_time':    self.clock.sim_time,
+            'time':         self.ramjet.spacetime.time,
+            'pos':          self.ramjet.spacetime.position.hypo(),
+            'vel':          self.ramjet.spacetime.velocity.hypo(),
+            'mass':         self.ramjet.mass,
+            'fuel':         self.ramjet.tank.fuel,
+            'battery':      self.ramjet.battery.fuel
+        }
+
+    # Adds a snapshot of this step to the store
+    def record(self) -> None:
+        self.schema.capture()
+        self.ring.commit()
+
+        self.recorded = self.steps
+
+    # Copies the state into the slots
+    def capture(self) -> None:
+        self.slots[0] = self.steps
+        self.slots[1] = self.sim_time
+        self.slots[2] = self.clock.sim_time
+
     # Gets a full snapshot at this step
     def preview(self):
         return {
             'steps': self.steps,
             'sim_time': self.sim_time,
             'real_time': self.clock.sim_time,
+            'integrator': self.integrator.get_preview(),
             'ramjet': self.ramjet.get_previews()
         }
 
@@ -118,7 +374,7 @@ class Simulation:
 
     # Safety condition
     def heat_death(self) -> None:
-        if self.steps > 2 * day:
+        if self.steps > self.max_steps:
             self.exist = False
 
 
@@ -126,8 +382,8 @@ class Simulation:
 # The same as Simulation but the steps are taken at a rate of 1:1 with printouts.
 # Only DebugSim can perform printouts
 class DebugSimulation(Simulation):
-    def __init__(self, rate: float, framerate: float, ramjet: str, file: str) -> None:
-        super().__init__(rate, framerate, ramjet, file)
+    def __init__(self, rate: float, framerate: float, ramjet: str, file: str, recorder: Recorder = None) -> None:
+        super().__init__(rate, framerate, ramjet, file, recorder)
 
     def __call__(self) -> None:
         while self.exist:
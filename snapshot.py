@@ -0,0 +1,76 @@
+# Snapshots of a simulation as rows of a structured array.
+# A Schema lays out one float per flattened key, with the same names and order as Simulation.preview.
+# It is derived once, and each component's slots are bound to its window of the schema's live row.
+# Parts write telemetry into their slots as they act, state is captured when a snapshot is taken,
+# and the live row is copied into a Ring of rows that goes straight to the Store as columns
+
+from store import Store
+import numpy as np
+
+class Schema:
+    def __init__(self, components: list[tuple[str, object]]) -> None:
+
+        # Components that report telemetry, each with the prefix of its keys
+        self.components: list = [component for prefix, component in components]
+
+        # Flattened keys, and the row type they make
+        self.keys: list[str] = [f'{prefix}{field}' for prefix, component in components for field in component.fields]
+        self.dtype: np.dtype = np.dtype([(key, '<f8') for key in self.keys])
+
+        # The live row, as floats and as a structured row over the same memory
+        self.flat: np.ndarray = np.full(len(self.keys), np.nan)
+        self.live: np.ndarray = self.flat.view(self.dtype).reshape(())
+
+        # Binds each component's slots to its window of the live row, keeping any telemetry it already has
+        offset = 0
+        for component in self.components:
+            window = self.flat[offset:offset + len(component.fields)]
+            window[:] = component.slots
+            component.slots = window
+
+            offset += len(component.fields)
+
+    # Copies the state of each component into the live row
+    def capture(self) -> None:
+        for component in self.components:
+            component.capture()
+
+
+
+# A Ring holds snapshots until there are enough to hand to the store as a chunk
+class Ring:
+    def __init__(self, schema: Schema, store: Store, size: int) -> None:
+        self.schema: Schema = schema
+        self.store: Store = store
+
+        # Preallocated rows, and the index of the next one
+        self.rows: np.ndarray = np.zeros(size, dtype = schema.dtype)
+        self.head: int = 0
+
+    # Copies the live row into the ring
+    def commit(self) -> None:
+        self.rows[self.head] = self.schema.live
+        self.head += 1
+
+        if self.head == len(self.rows):
+            self.flush()
+
+    # Hands the rows to the store and starts over
+    def flush(self) -> None:
+        if self.head:
+            self.store.add_rows(self.rows[:self.head])
+            self.head = 0
+
+
+
+# The components of a simulation that report telemetry, with the prefix of their keys
+def components(simulation) -> list[tuple[str, object]]:
+    ramjet = simulation.ramjet
+
+    return [
+        ('',                                        simulation),
+        ('integrator-',                             simulation.integrator),
+        *[(f'ramjet-parts-{part.name}-', part)      for part in (ramjet.tank, ramjet.battery, ramjet.thruster, ramjet.scooper, ramjet.generator)],
+        ('ramjet-spacetime-',                       ramjet.spacetime),
+        ('ramjet-',                                 ramjet)
+    ]
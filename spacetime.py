@@ -1,9 +1,19 @@
 from finkchlib.vector import Vector2
 from finkchlib.constants import c
+from math import hypot, sqrt, sinh, cosh, tanh, asinh, atanh
+import numpy as np
 
 # Oversees the space and time of a thing.
-# From an observer aboard the craft
+# From an observer aboard the craft.
+# State is kept as plain floats in slots, so stepping allocates nothing; position, velocity and
+# acceleration are still read and written as Vector2s through properties
 class Spacetime:
+
+    __slots__ = ('time', 'pos_x', 'pos_y', 'vel_x', 'vel_y', 'acc_x', 'acc_y', 'preview_x', 'preview_y', 'slots')
+
+    # Names of the telemetry in the slots, as with parts of a Ramjet
+    fields: list[str] = ['time', 'pos', 'pos_x', 'pos_y', 'vel', 'vel_x', 'vel_y', 'acc', 'acc_x', 'acc_y']
+
     def __init__(self, position: Vector2 = Vector2(), velocity: Vector2 = Vector2(), acceleration: Vector2 = Vector2()) -> None:
         self.time = 0
 
@@ -12,24 +22,101 @@ class Spacetime:
         self.acceleration: Vector2 = acceleration
 
         self.acceleration_preview: Vector2 = Vector2()
+
+        # Telemetry, filled in when a snapshot is taken
+        self.slots: np.ndarray = np.full(len(self.fields), np.nan)
     
     # Updates the space and time
     def __call__(self, step: float) -> None:
+        self.advance(step, 0, 0)
+
+    # Updates the space and time under an acceleration, on top of any forces applied.
+    # This is the whole step in plain floats, for Ramjet.fused
+    def advance(self, step: float, acc_x: float, acc_y: float) -> None:
 
         # Increases the amount of time experienced
         self.time += step
 
         # Updates postion and velocity
-        self.velocity += self.acceleration * step
-        self.position += self.velocity * step
+        acc_x += self.acc_x
+        acc_y += self.acc_y
+        vel_x = self.vel_x = self.vel_x + acc_x * step
+        vel_y = self.vel_y = self.vel_y + acc_y * step
+        self.pos_x += vel_x * step
+        self.pos_y += vel_y * step
 
         # Resets acceleration
-        self.acceleration_preview: Vector2 = self.acceleration
-        self.acceleration: Vector2 = Vector2()
+        self.preview_x = acc_x
+        self.preview_y = acc_y
+        self.acc_x = 0
+        self.acc_y = 0
+
+    @property
+    def position(self) -> Vector2:
+        return Vector2(self.pos_x, self.pos_y)
+
+    @position.setter
+    def position(self, position: Vector2) -> None:
+        self.pos_x = position.x
+        self.pos_y = position.y
+
+    @property
+    def velocity(self) -> Vector2:
+        return Vector2(self.vel_x, self.vel_y)
+
+    @velocity.setter
+    def velocity(self, velocity: Vector2) -> None:
+        self.vel_x = velocity.x
+        self.vel_y = velocity.y
+
+    @property
+    def acceleration(self) -> Vector2:
+        return Vector2(self.acc_x, self.acc_y)
+
+    @acceleration.setter
+    def acceleration(self, acceleration: Vector2) -> None:
+        self.acc_x = acceleration.x
+        self.acc_y = acceleration.y
+
+    # Acceleration over the last step
+    @property
+    def acceleration_preview(self) -> Vector2:
+        return Vector2(self.preview_x, self.preview_y)
+
+    @acceleration_preview.setter
+    def acceleration_preview(self, acceleration: Vector2) -> None:
+        self.preview_x = acceleration.x
+        self.preview_y = acceleration.y
 
     # Applies a force to the craft
     def force(self, mass, amount: Vector2) -> None:
-        self.acceleration += amount / mass
+        self.acc_x += amount.x / mass
+        self.acc_y += amount.y / mass
+
+    # Ratio of time experienced to time passed; there is no dilation without relativity
+    def dilation(self, velocity: Vector2) -> float:
+        return 1
+
+    # The state as plain floats, to go back to with restore
+    def save(self) -> tuple:
+        return (self.time, self.pos_x, self.pos_y, self.vel_x, self.vel_y, self.acc_x, self.acc_y, self.preview_x, self.preview_y)
+
+    def restore(self, state: tuple) -> None:
+        self.time, self.pos_x, self.pos_y, self.vel_x, self.vel_y, self.acc_x, self.acc_y, self.preview_x, self.preview_y = state
+
+    # Copies the state into the slots
+    def capture(self) -> None:
+        slots = self.slots
+        slots[0] = self.time
+        slots[1] = hypot(self.pos_x, self.pos_y)
+        slots[2] = self.pos_x
+        slots[3] = self.pos_y
+        slots[4] = hypot(self.vel_x, self.vel_y)
+        slots[5] = self.vel_x
+        slots[6] = self.vel_y
+        slots[7] = hypot(self.preview_x, self.preview_y)
+        slots[8] = self.preview_x
+        slots[9] = self.preview_y
 
     def get_preview(self):
         return {
@@ -49,22 +136,178 @@ class Spacetime:
 # A spacetime that incorporates special relativity.
 # Same as spacetime, but from an observer on the ground
 class RelativisticSpacetime(Spacetime):
+
+    __slots__ = ()
+
     def __init__(self, position: Vector2 = Vector2(), velocity: Vector2 = Vector2(), acceleration: Vector2 = Vector2()) -> None:
         super().__init__(position, velocity, acceleration)
 
-    def __call__(self, step: float) -> None:
-        gamma = self.gamma(self.velocity)
+    def advance(self, step: float, acc_x: float, acc_y: float) -> None:
+        gamma = 1 / sqrt(1 - (hypot(self.vel_x, self.vel_y) / c) ** 2)
 
         # Increases time experienced
         step_size = step / gamma
         
-        # Steps forward in time'
-        super().__call__(step_size)
+        # Steps forward in time
+        Spacetime.advance(self, step_size, acc_x, acc_y)
 
 
+    def dilation(self, velocity: Vector2) -> float:
+        return 1 / self.gamma(velocity)
+
     # Returns some useful factors
     def gamma(self, velocity: Vector2) -> float:
-        return 1 / (1 - self.beta(velocity) ** 2)
+        return 1 / sqrt(1 - self.beta(velocity) ** 2)
     
     def beta(self, velocity: Vector2) -> float:
         return velocity.hypo() / c
+
+
+
+# A spacetime that carries rapidity instead of velocity, for runs that near c.
+# Rapidity is the hyperbolic angle of velocity, v = c tanh(w), and adds up without bound under thrust in the
+# craft's own frame, so velocity never reaches c however large the step. Steps are of time on the ground;
+# over each, the thrust per unit mass is taken as a constant proper acceleration, whose hyperbolic motion is
+# solved exactly when it is along the velocity, as it is for a radial flight. Time is the craft's proper time.
+# Velocity is still kept, from rapidity, for everything that reads it
+class RapiditySpacetime(RelativisticSpacetime):
+
+    __slots__ = ('rap_x', 'rap_y')
+
+    # Names of the telemetry in the slots, as with parts of a Ramjet
+    fields: list[str] = Spacetime.fields + ['rapidity', 'gamma']
+
+    def __init__(self, position: Vector2 = Vector2(), velocity: Vector2 = Vector2(), acceleration: Vector2 = Vector2()) -> None:
+        super().__init__(position, velocity, acceleration)
+
+    def advance(self, step: float, acc_x: float, acc_y: float) -> None:
+
+        # Forces applied are per unit of the craft's rest mass, in its own frame
+        acc_x += self.acc_x
+        acc_y += self.acc_y
+
+        rapidity = hypot(self.rap_x, self.rap_y)
+        acceleration = hypot(acc_x, acc_y)
+
+        if acceleration == 0:
+            # Coasting: rapidity is constant
+            proper = step / cosh(rapidity)
+            self.pos_x += self.vel_x * step
+            self.pos_y += self.vel_y * step
+
+        elif rapidity == 0 or abs(self.rap_x * acc_y - self.rap_y * acc_x) <= 1e-12 * rapidity * acceleration:
+            # Along the velocity: hyperbolic motion, in the direction of the acceleration
+            normal_x, normal_y = acc_x / acceleration, acc_y / acceleration
+            start = self.rap_x * normal_x + self.rap_y * normal_y
+            change, proper, distance = hyperbolic(start, acceleration, step)
+            end = start + change
+
+            self.pos_x += distance * normal_x
+            self.pos_y += distance * normal_y
+            self.rap_x = end * normal_x
+            self.rap_y = end * normal_y
+
+        else:
+            # Turning: rapidity changes linearly in proper time, which is found from the rapidity halfway through.
+            # Position follows from Simpson's rule over the step
+            proper = step / cosh(rapidity)
+            for iteration in range(3):
+                proper = step / cosh(hypot(self.rap_x + acc_x * proper / (2 * c), self.rap_y + acc_y * proper / (2 * c)))
+
+            velocities = [self.celerity(self.rap_x + acc_x * proper * fraction / c, self.rap_y + acc_y * proper * fraction / c) for fraction in (0, 0.5, 1)]
+            self.pos_x += proper * (velocities[0][0] + 4 * velocities[1][0] + velocities[2][0]) / 6
+            self.pos_y += proper * (velocities[0][1] + 4 * velocities[1][1] + velocities[2][1]) / 6
+            self.rap_x += acc_x * proper / c
+            self.rap_y += acc_y * proper / c
+
+        self.time += proper
+        self.set_rapidity(self.rap_x, self.rap_y)
+
+        # Resets acceleration
+        self.preview_x = acc_x
+        self.preview_y = acc_y
+        self.acc_x = 0
+        self.acc_y = 0
+
+    # Sets rapidity, and velocity from it
+    def set_rapidity(self, rap_x: float, rap_y: float) -> None:
+        self.rap_x = rap_x
+        self.rap_y = rap_y
+
+        rapidity = hypot(rap_x, rap_y)
+        speed = c * tanh(rapidity) / rapidity if rapidity else 0
+        self.vel_x = rap_x * speed
+        self.vel_y = rap_y * speed
+
+    # Displacement per unit of proper time at a rapidity, gamma times velocity
+    def celerity(self, rap_x: float, rap_y: float) -> tuple[float, float]:
+        rapidity = hypot(rap_x, rap_y)
+        scale = c * sinh(rapidity) / rapidity if rapidity else 0
+        return rap_x * scale, rap_y * scale
+
+    # Velocity is set through rapidity; a speed of c or more is not allowed
+    @property
+    def velocity(self) -> Vector2:
+        return Vector2(self.vel_x, self.vel_y)
+
+    @velocity.setter
+    def velocity(self, velocity: Vector2) -> None:
+        speed = hypot(velocity.x, velocity.y)
+        assert speed < c, f'Cannot move at {speed} m/s, c or faster'
+
+        scale = atanh(speed / c) / speed if speed else 0
+        self.set_rapidity(velocity.x * scale, velocity.y * scale)
+
+    # Ratio of time experienced to time passed, from rapidity when the velocity is the craft's own
+    def dilation(self, velocity: Vector2) -> float:
+        if velocity.x == self.vel_x and velocity.y == self.vel_y:
+            return 1 / cosh(hypot(self.rap_x, self.rap_y))
+
+        return super().dilation(velocity)
+
+    def save(self) -> tuple:
+        return (*super().save(), self.rap_x, self.rap_y)
+
+    def restore(self, state: tuple) -> None:
+        super().restore(state[:-2])
+        self.rap_x, self.rap_y = state[-2:]
+
+    def capture(self) -> None:
+        super().capture()
+
+        rapidity = hypot(self.rap_x, self.rap_y)
+        self.slots[10] = rapidity
+        self.slots[11] = cosh(rapidity)
+
+    def get_preview(self):
+        rapidity = hypot(self.rap_x, self.rap_y)
+
+        return {
+            **super().get_preview(),
+            'rapidity': rapidity,
+            'gamma': cosh(rapidity)
+        }
+
+# Hyperbolic motion over some time on the ground, from a rapidity along a constant proper acceleration.
+# Returns the change in rapidity, the proper time that passed and the distance covered.
+# sinh of rapidity grows linearly with time on the ground; the differences in rapidity and cosh that follow are
+# taken in forms that do not cancel, since the acceleration is often tiny next to c, as when coasting through the ISM
+def hyperbolic(rapidity: float, acceleration: float, step: float) -> tuple[float, float, float]:
+    change = acceleration * step / c
+    before = sinh(rapidity)
+    after = before + change
+    cosh_before, cosh_after = sqrt(1 + before ** 2), sqrt(1 + after ** 2)
+
+    # after² - before², over the sum or difference of the cross terms, whichever does not cancel
+    difference = change * (before + after)
+    distance = c * step * (before + after) / (cosh_before + cosh_after)
+
+    if before * after > 0:
+        ratio = difference / (after * cosh_before + before * cosh_after)
+        rapidity = asinh(ratio)
+        proper = step * (before + after) / (after * cosh_before + before * cosh_after) * (rapidity / ratio if ratio else 1)
+    else:
+        rapidity = asinh(after * cosh_before - before * cosh_after)
+        proper = c / acceleration * rapidity
+
+    return rapidity, proper, distance
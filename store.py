@@ -1,144 +1,345 @@
 # Stores ALL information from a given simulation
 
-import sys
+import os
 import json
-
-# A Store stores data
+import time
+import threading
+import numpy as np
+import pyramid
+import compress
+from pyramid import Pyramid
+from compress import Compression
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# A Store stores data.
+# Data is kept column-wise on disk: a directory holding one binary file per flattened key
+# and a header describing the columns. Columns are appended to in chunks and read back with memmap.
+# Each column also gets a pyramid of downsampled levels as it is written, for plotting long runs.
+# Columns may instead be written as compressed blocks, with an index for reading ranges of them; see compress.py
 class Store:
-    def __init__(self, file: str, initial_data = None) -> None:
-        self.data: list = []
-        
-        # The file to which to write
-        self.file: str = 'temp.txt'
+    def __init__(self, file: str, initial_data = None, chunk_size: int = 2 ** 16, memory: float = 1e9, compression: Compression = None) -> None:
+
+        # The directory to which to write
+        self.file: str = file
+
+        # Number of rows to buffer before handing them to the writer
+        self.chunk_size: int = chunk_size
+
+        # Most bytes of chunks allowed to wait for the writer
+        self.memory: float = memory
+
+        # How columns are compressed, if they are; a store read from disk takes this from its header
+        self.compression: Compression = compression
 
         # Used for reading data
         self.metadata: dict = {}
         self.data: dict = {}
-        self.unflattened: list = []
 
-        # If supplied with some starting data, write it out immediatly
+        # Column-wise buffer of rows that are yet to be written
+        self.buffer: dict = {}
+        self.buffered: int = 0
+
+        # Rows on disk and the type of each column
+        self.rows: int = 0
+        self.columns: dict = {}
+
+        # Log of events, such as the tank running dry, kept beside the columns
+        self.events: list[dict] = []
+
+        # Writes chunks in the background
+        self.writer: Writer = None
+
+        # If supplied with some starting data, start a fresh store immediatly
         if initial_data:
-            self.unflattened.append(initial_data)
-            self.write(flag = 'w')
+            self.metadata = initial_data
+            self.create()
+
+    # Creates an empty store, removing any old columns
+    def create(self) -> None:
+        self.buffer = {}
+        self.buffered = 0
+        self.rows = 0
+        self.columns = {}
+        self.events = []
+
+        os.makedirs(os.path.join(self.file, 'pyramid'), exist_ok = True)
+
+        if os.path.exists(events_path(self.file)):
+            os.remove(events_path(self.file))
+
+        for directory in (self.file, os.path.join(self.file, 'pyramid')):
+            for name in os.listdir(directory):
+                if name.endswith('.bin') or name.endswith('.index'):
+                    os.remove(os.path.join(directory, name))
+
+        # Starts the writer
+        self.writer = Writer(self.file, self.metadata, self.memory, self.compression)
+        self.writer.write_header()
+        self.writer.start()
+
+    # Reopens a store to append to it, cutting it back to a number of rows, set of columns and number of events.
+    # Anything written after that point, such as after the last checkpoint of a run that crashed, is dropped
+    def resume(self, rows: int, columns: dict, events: int = 0) -> None:
+        self.read_header()
+
+        self.events = self.events[:events]
+        self.write_events()
+
+        # Removes columns that did not exist yet
+        for key in self.columns:
+            if not key in columns:
+                os.remove(self.path(key))
+                if self.compression:
+                    os.remove(compress.index_path(self.file, key))
+
+                for level in range(1, pyramid.levels + 1):
+                    if os.path.exists(pyramid.pyramid_path(self.file, key, level)):
+                        os.remove(pyramid.pyramid_path(self.file, key, level))
+
+        # Starts the writer where the store left off
+        self.writer = Writer(self.file, self.metadata, self.memory, self.compression)
+        self.writer.rows = rows
+        self.writer.columns = dict(columns)
+
+        # Cuts columns back
+        for key, dtype in columns.items():
+            if self.compression:
+                self.writer.compressed[key] = compress.Column(self.file, key, self.compression, dtype)
+                self.writer.compressed[key].resume(rows)
+            else:
+                with open(self.path(key), 'r+b') as file:
+                    file.truncate(rows * np.dtype(dtype).itemsize)
+
+        self.rows = rows
+        self.columns = dict(columns)
+        self.buffer = {key: np.full(self.chunk_size, np.nan, dtype = dtype) for key, dtype in self.columns.items()}
+        self.buffered = 0
+
+        # Cuts the pyramids back too
+        os.makedirs(os.path.join(self.file, 'pyramid'), exist_ok = True)
+        for key, dtype in columns.items():
+            self.writer.pyramids[key] = Pyramid(self.file, key)
+            self.writer.pyramids[key].resume(rows, self.values(key, rows - rows % pyramid.factor, rows))
 
-    # Adds the data to the array
+        self.writer.write_header()
+        self.writer.start()
+
+    # Adds a snapshot to the buffer
     def add(self, data: dict) -> None:
-        self.unflattened.append(data)
-
-        # If we're storing more than a gigabyte, write it out
-        if self.data_size() > 1e9:
-            self.write()
-
-    # Writes data to text
-    def write(self, dictionary: list | dict = None, flag = 'a') -> None:
-        
-        # Sets the default thing to write
-        if not dictionary:
-            dictionary = self.unflattened
-        
-        # Writes the data
-        with open(self.file, flag) as file:
-            for step in dictionary:
-
-                # Writes a dictionary
-                if isinstance(dictionary, dict):
-                    file.write(f"{step}:{dictionary[step]}\n")
-                
-                # Writes a list
-                else:
-                    file.write(f'{str(step)}\n')
-
-        # Since we're done writing, clear data
-        self.unflattened = []
-        self.data = {}
-
-    # Returns how large the data size is
-    def data_size(self) -> int:
-        return sys.getsizeof(self.unflattened)
-    
-
-
-    # Reads data from a file, returning it as a dictionary
-    def flatten_file(self) -> None:
-        with open(self.file, 'r') as file:
-            for line in file:
-                line = line.replace("'", '"') # Replaces single-quotes with double-quotes
-                self.unflattened.append(json.loads(line))
+        self.recursive_flatten(data, '')
+        self.buffered += 1
 
-        # Grabs the metadata from data
-        self.data['metadata'] = self.unflattened.pop(0)
+        # If the buffer is full, send it to the writer
+        if self.buffered >= self.chunk_size:
+            self.send()
 
-        # Flattens the dictionary to minimal depth
-        self.flatten()
+    # Adds rows of a structured array whose fields are flattened keys, such as from a snapshot Ring
+    def add_rows(self, rows: np.ndarray) -> None:
+        self.add_chunk({key: rows[key] for key in rows.dtype.names}, len(rows))
+
+    # Adds rows given as whole columns, each copied out and handed straight to the writer.
+    # Always copied, even when already contiguous, since callers such as the Ring reuse their buffers while the
+    # writer's thread still has the chunk queued
+    def add_chunk(self, columns: dict, rows: int) -> None:
+
+        # Rows added as dictionaries go first
+        self.send()
+
+        chunk = {}
+        for key, column in columns.items():
 
-        # Writes the flattened file
-        self.write(self.data, 'w')
+            # If this is a new column, make a buffer for it
+            if not key in self.columns:
+                self.columns[key] = column.dtype.str
+                self.buffer[key] = np.full(self.chunk_size, np.nan, dtype = self.columns[key])
 
-    # Reads the text file
-    def read(self) -> dict:
-        first_line = True
+            chunk[key] = np.array(column, copy = True, order = 'C')
 
-        # Opens the file and parses line by line
-        with open(self.file, 'r') as file:
-            for line in file:
+        # Columns missing from the rows are nan
+        for key, dtype in self.columns.items():
+            if not key in chunk:
+                chunk[key] = np.full(rows, np.nan, dtype = dtype)
+
+        self.writer.put(chunk, rows)
+
+    # Hands the buffered rows to the writer and starts a new buffer.
+    # Blocks while the writer's queue is over its memory budget
+    def send(self) -> None:
+        if self.buffered == 0:
+            return
+
+        # A partial chunk is trimmed so that its size is exact
+        chunk = self.buffer
+        if self.buffered < self.chunk_size:
+            chunk = {key: column[:self.buffered].copy() for key, column in chunk.items()}
+
+        self.writer.put(chunk, self.buffered)
+
+        # Keys missing from a snapshot stay nan
+        self.buffer = {key: np.full(self.chunk_size, np.nan, dtype = dtype) for key, dtype in self.columns.items()}
+        self.buffered = 0
+
+    # Adds an entry to the event log. Events are rare, so the whole log is rewritten each time
+    def add_event(self, event: dict) -> None:
+        self.events.append(event)
+        self.write_events()
+
+    def write_events(self) -> None:
+        with open(events_path(self.file), 'w') as file:
+            json.dump(self.events, file, indent = 4)
+
+    # Reads the event log; stores written before events were logged have none
+    def read_events(self) -> list[dict]:
+        if not os.path.exists(events_path(self.file)):
+            return []
 
-                # Deliminates data and key with a colon
-                data = line.split(':', 1)
+        with open(events_path(self.file), 'r') as file:
+            return json.load(file)
 
+    # Writes out all buffered rows, waiting until they are on disk
+    def write(self) -> None:
+        self.send()
+        self.writer.flush()
 
+        self.rows = self.writer.rows
 
-                # Obtains the metadata, stored on the first line
-                if first_line:
-                    first_line = False
-                    
-                    # Grabs the key-values for metadata
-                    #   1) Metadata is the second item in the two-item list called data
-                    #   2) Removes braces and the newline
-                    #   3) Removes quotation marks
-                    #   4) Deliminats key-value pairs by a comma followed by a space
-                    pairs = data[1][1:-2].replace("'", '').split(', ')
-                    
-                    # Iterates over every key-value pair, putting them into the metadata dictionary
-                    for pair in pairs:
-                        kv = pair.split(': ')
-                        try:
-                            self.metadata[kv[0]] = float(kv[1])
-                        except:
-                            self.metadata[kv[0]] = kv[1]
+    # Writes out all buffered rows and stops the writer
+    def close(self) -> None:
+        self.write()
+        self.writer.close()
 
-                    # Skips the rest of the processing
-                    continue
+    # Bytes held by the buffer and the writer's queue
+    def memory_used(self) -> int:
+        buffered = sum(column.nbytes for column in self.buffer.values())
+        return buffered + (self.writer.queued_bytes if self.writer else 0)
 
+    # Performance counters of the writer
+    def stats(self) -> dict:
+        return self.writer.stats() if self.writer else {}
 
+    # Reads the header and the event log
+    def read_header(self) -> None:
+        with open(os.path.join(self.file, 'header.json'), 'r') as file:
+            header = json.load(file)
 
-                # The key
-                key = data[0]
+        self.metadata = header['metadata']
+        self.rows = header['rows']
+        self.columns = header['columns']
+        self.compression = compress.from_preview(header.get('compression'))
+        self.events = self.read_events()
 
-                # Converts the data into a list of floats
-                #   1) Gets rid of the brackets and newline
-                #   2) Deliminates on a comma followed by a space
-                #   3) Constructs array with floats
-                values = [float(x) for x in data[1][1:-2].split(', ')]                
+    # Returns the path to a column's file
+    def path(self, key: str) -> str:
+        return column_path(self.file, key)
 
-                # Sets the data
-                self.data[key] = values
+    # A column between two rows, memory-mapped, or decompressed from only the blocks they lie in.
+    # Row r of an uncompressed column starts r * itemsize bytes into its file, so a range is mapped at that offset
+    # and nothing outside it is read
+    def values(self, key: str, start: int = 0, stop: int = None) -> np.ndarray:
+        stop = self.rows if stop is None else stop
+        dtype = np.dtype(self.columns[key])
+
+        if self.compression:
+            return compress.read(self.file, key, dtype, self.compression, start, stop)
+
+        # Memmap cannot map an empty range
+        if start >= stop:
+            return np.empty(0, dtype = dtype)
+
+        return np.memmap(self.path(key), dtype = dtype, mode = 'r', offset = start * dtype.itemsize, shape = (stop - start,))
+
+
+
+    # Converts a legacy text file, one dictionary per line, into this store.
+    # The file is streamed line by line, so no more than one chunk of rows is held in memory
+    def flatten_file(self, legacy: str) -> None:
+        with open(legacy, 'r') as file:
+
+            # Grabs the metadata from the first line
+            self.metadata = self.parse_legacy(file.readline())
+            self.create()
+
+            # Flattens each line straight into the column buffer
+            for line in file:
+                self.add(self.parse_legacy(line))
+
+        # Writes the remaining rows
+        self.close()
+
+    # Parses one line of a legacy text file
+    def parse_legacy(self, line: str) -> dict:
+        return json.loads(line.replace("'", '"')) # Replaces single-quotes with double-quotes
+
+    # Reads the store, returning its columns as memory-mapped arrays, or as arrays if the store is compressed.
+    # Only the columns asked for are read, and only between some steps or some sim time if given
+    def read(self, columns: list[str] = None, steps: tuple[float, float] = None, time: tuple[float, float] = None) -> tuple[dict, dict]:
+        self.read_header()
+
+        columns = list(self.columns) if columns is None else columns
+        for key in columns:
+            assert key in self.columns, f'No such column \'{key}\' in {self.file}'
+
+        # Rows within the range
+        start, stop = 0, self.rows
+        if steps is not None:
+            start, stop = self.span('steps', *steps)
+        elif time is not None:
+            start, stop = self.span('sim_time', *time)
+
+        self.data = {key: self.values(key, start, stop) for key in columns}
 
         # Returns the data
         return self.data, self.metadata
 
-    # Flattens the data array so that it has minimal depth
-    def flatten(self):
+    # The range of rows whose value in a column, which must rise with the rows as steps and sim_time do,
+    # is between a low and a high value, inclusive
+    def span(self, key: str, low: float, high: float) -> tuple[int, int]:
+        if self.rows == 0:
+            return 0, 0
+
+        if self.compression:
+            return tuple(compress.search(self.file, key, self.columns[key], self.compression, self.rows, value, side) for value, side in ((low, 'left'), (high, 'right')))
+
+        column = np.memmap(self.path(key), dtype = self.columns[key], mode = 'r', shape = (self.rows,))
+        return int(np.searchsorted(column, low, 'left')), int(np.searchsorted(column, high, 'right'))
+
+    # Reads a column between two rows as buckets of a level of its pyramid, each with the first, lowest, highest
+    # and last value of its rows. Level 0 is the column itself, with each row a bucket of one.
+    # Buckets are whole, so they may reach a little past either end; rows after the last whole bucket of
+    # the level come from the levels below, so the end of the run is always included
+    def buckets(self, key: str, level: int, start: int = 0, stop: int = None) -> np.ndarray:
+        stop = self.rows if stop is None else min(stop, self.rows)
+
+        if start >= stop:
+            return np.empty(0, dtype = pyramid.bucket)
+
+        if level == 0:
+            values = self.values(key, start, stop)
+
+            buckets = np.empty(len(values), dtype = pyramid.bucket)
+            for name in pyramid.bucket.names:
+                buckets[name] = values
+
+            return buckets
 
-        # Iterates over every line
-        for line in self.unflattened:
-            self.recursive_flatten(line, '')
+        size = pyramid.factor ** level
+        count = self.rows // size
 
-        # Deletes unnecessary data
-        self.unflattened = None
+        # Whole buckets of this level
+        first = start // size
+        last = min(-(-stop // size), count)
+        buckets = np.array(pyramid.read(self.file, key, level, count)[first:last])
+
+        # Whatever is left comes from below
+        if stop > last * size:
+            buckets = np.concatenate((buckets, self.buckets(key, level - 1, max(start, last * size), stop)))
+
+        return buckets
 
     # Recurse through the dictionary, adding items
     def recursive_flatten(self, data: dict, path: str):
-        
+
         # Iterate over all items at this depth
         for key in data.keys():
 
@@ -150,19 +351,238 @@ class Store:
             else:
                 self.add_flat(f'{path}{key}-', data[key])
 
-    # Adds the piece of data to the flattened list
+    # Adds the piece of data to the column buffer
     def add_flat(self, key: str, item) -> None:
 
         # Removes the trailing hyphen
         key = key[:-1]
 
-        # If this is a new entry, make a list for it
-        if not key in self.data:
-            self.data[key] = []
+        # If this is a new column, make a buffer for it.
+        # Rows it missed are nan; the writer back-fills rows already on disk
+        column = self.buffer.get(key)
+        if column is None:
+            self.columns[key] = '<f8'
+            column = self.buffer[key] = np.full(self.chunk_size, np.nan, dtype = self.columns[key])
 
         # Add the item to data
-        self.data[key].append(item)
+        column[self.buffered] = item
+
+
+
+# Writes chunks of columns to disk on its own thread, so the simulation keeps stepping.
+# Chunks wait in a queue that is bounded by the bytes they hold
+class Writer(threading.Thread):
+    def __init__(self, file: str, metadata: dict, memory: float, compression: Compression = None) -> None:
+        super().__init__(daemon = True)
+
+        self.file: str = file
+        self.metadata: dict = metadata
+
+        # How columns are compressed, the compressed columns, and the threads that compress their blocks
+        self.compression: Compression = compression
+        self.compressed: dict = {}
+        self.pool: ThreadPoolExecutor = ThreadPoolExecutor(compression.workers) if compression else None
+
+        # Most bytes allowed in the queue
+        self.memory: float = memory
+
+        # Rows on disk and the type of each column
+        self.rows: int = 0
+        self.columns: dict = {}
+
+        # Chunks waiting to be written, including the one being written
+        self.queue: deque = deque()
+        self.queued_bytes: int = 0
+        self.condition: threading.Condition = threading.Condition()
+
+        self.running: bool = True
+        self.error: BaseException = None
+
+        # Downsampled levels of each column
+        self.pyramids: dict = {}
+
+        # Performance counters
+        self.stalls: int = 0
+        self.stall_time: float = 0
+        self.peak_depth: int = 0
+        self.peak_bytes: int = 0
+        self.chunks_written: int = 0
+        self.bytes_written: int = 0
+
+    # Queues a chunk for writing; blocks while the queue is over budget
+    def put(self, chunk: dict, rows: int) -> None:
+        size = sum(column.nbytes for column in chunk.values())
+
+        with self.condition:
+            self.check()
+
+            # Waits for room. A chunk larger than the budget still goes through an empty queue
+            if self.queue and self.queued_bytes + size > self.memory:
+                self.stalls += 1
+                start = time.perf_counter()
+
+                while self.queue and self.queued_bytes + size > self.memory and self.error is None:
+                    self.condition.wait()
+
+                self.stall_time += time.perf_counter() - start
+                self.check()
+
+            self.queue.append((chunk, rows, size))
+            self.queued_bytes += size
+
+            self.peak_depth = max(self.peak_depth, len(self.queue))
+            self.peak_bytes = max(self.peak_bytes, self.queued_bytes)
+
+            self.condition.notify_all()
+
+    # Waits until every queued chunk is on disk
+    def flush(self) -> None:
+        with self.condition:
+            while self.queue and self.error is None:
+                self.condition.wait()
+
+            self.check()
+
+    # Stops the thread once the queue is empty
+    def close(self) -> None:
+        self.flush()
+
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        self.join()
+
+        if self.pool:
+            self.pool.shutdown()
+
+    # Raises an error from the writer thread on the caller's thread
+    def check(self) -> None:
+        if self.error is not None:
+            raise RuntimeError(f'Store writer failed: {self.error}') from self.error
+
+    # Number of chunks waiting to be written
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def stats(self) -> dict:
+        return {
+            'depth':            self.depth(),
+            'queued_bytes':     self.queued_bytes,
+            'peak_depth':       self.peak_depth,
+            'peak_bytes':       self.peak_bytes,
+            'stalls':           self.stalls,
+            'stall_time':       self.stall_time,
+            'chunks_written':   self.chunks_written,
+            'bytes_written':    self.bytes_written
+        }
+
+    # Writes chunks as they arrive
+    def run(self) -> None:
+        while True:
+
+            # Waits for a chunk; the chunk stays queued, and counted, until it is written
+            with self.condition:
+                while not self.queue and self.running:
+                    self.condition.wait()
+
+                if not self.queue:
+                    return
+
+                chunk, rows, size = self.queue[0]
+
+            try:
+                self.write(chunk, rows)
+            except BaseException as error:
+                with self.condition:
+                    self.error = error
+                    self.queue.clear()
+                    self.queued_bytes = 0
+                    self.condition.notify_all()
+                return
+
+            with self.condition:
+                self.queue.popleft()
+                self.queued_bytes -= size
+                self.condition.notify_all()
+
+    # Appends a chunk to the column files
+    def write(self, chunk: dict, rows: int) -> None:
+        if self.compression:
+            return self.write_compressed(chunk, rows)
+
+        for key, column in chunk.items():
+
+            # A new column is back-filled with nan for the rows it missed
+            if not key in self.columns:
+                self.columns[key] = column.dtype.str
+                self.pyramids[key] = Pyramid(self.file, key)
+
+                with open(column_path(self.file, key), 'wb') as file:
+                    np.full(self.rows, np.nan, dtype = column.dtype).tofile(file)
+                self.pyramids[key].add(np.full(self.rows, np.nan))
+
+            with open(column_path(self.file, key), 'ab') as file:
+                column[:rows].tofile(file)
+            self.pyramids[key].add(column[:rows])
+
+            self.bytes_written += column[:rows].nbytes
+
+        self.rows += rows
+        self.chunks_written += 1
+
+        self.write_header()
+
+    # Appends a chunk to compressed columns. Every column's blocks are handed to the pool before any is written,
+    # so they are compressed side by side while the pyramids are built
+    def write_compressed(self, chunk: dict, rows: int) -> None:
+        jobs = {}
+        for key, column in chunk.items():
+
+            # A new column is back-filled with nan for the rows it missed
+            if not key in self.columns:
+                dtype = self.compression.dtype(key, column.dtype)
+
+                self.columns[key] = dtype.str
+                self.pyramids[key] = Pyramid(self.file, key)
+                self.compressed[key] = compress.Column(self.file, key, self.compression, dtype)
+
+                values = np.concatenate((np.full(self.rows, np.nan, dtype = dtype), column[:rows].astype(dtype, copy = False)))
+            else:
+                values = column[:rows].astype(self.columns[key], copy = False)
+
+            jobs[key] = self.compressed[key].compress(values, self.pool)
+            self.pyramids[key].add(values)
+
+        for key, (blocks, futures) in jobs.items():
+            self.compressed[key].write(blocks, futures)
+
+            self.bytes_written += sum(len(future.result()) for future in futures)
+
+        self.rows += rows
+        self.chunks_written += 1
+
+        self.write_header()
+
+    # Writes the header, which describes the columns on disk
+    def write_header(self) -> None:
+        header = {
+            'metadata':     self.metadata,
+            'rows':         self.rows,
+            'columns':      self.columns,
+            'pyramid':      {'factor': pyramid.factor, 'levels': pyramid.levels},
+            'compression':  self.compression.get_preview() if self.compression else None
+        }
+
+        with open(os.path.join(self.file, 'header.json'), 'w') as file:
+            json.dump(header, file)
 
 
 
+# Returns the path to a column's file
+def column_path(file: str, key: str) -> str:
+    return os.path.join(file, f'{key}.bin')
 
+# Returns the path to the event log
+def events_path(file: str) -> str:
+    return os.path.join(file, 'events.json')
@@ -0,0 +1,107 @@
+# Runs many simulations over a grid of ramjet designs, one process per core
+
+import os
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation import Simulation
+from record import Recorder
+from integrator import Integrator
+from catalog import Catalog
+
+# Returns every combination of the supplied values, as a list of parameter dictionaries.
+# For example, grid(thrust = [10, 20], v_e = [1e4]) gives two sets of parameters
+def grid(**axes) -> list[dict]:
+    keys = list(axes.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*axes.values())]
+
+# A Sweep runs one Simulation per set of parameters in a process pool
+class Sweep:
+    def __init__(self, ramjet: str, runs: list[dict], rate: float, directory: str, max_steps: int, recorder = Recorder, integrator = Integrator, workers: int = None, catalog: str = None) -> None:
+
+        # The design to vary and the parameters of each run
+        self.ramjet: str = ramjet
+        self.runs: list[dict] = runs
+
+        # Seconds per step and number of steps in each run
+        self.rate: float = rate
+        self.max_steps: int = max_steps
+
+        # Each run is stored in its own directory within this one
+        self.directory: str = directory
+
+        # Called with no arguments to make each run's Recorder and Integrator, since they may not be picklable
+        self.recorder = recorder
+        self.integrator = integrator
+
+        # Number of processes; defaults to all cores
+        self.workers: int = workers if workers else os.cpu_count()
+
+        # The SQLite catalog each run is filed in, if any
+        self.catalog: str = catalog
+
+        # Summary of each run, in the order of runs
+        self.results: list[dict] = []
+
+    # Calling a Sweep runs every simulation, then writes the summary table
+    def __call__(self) -> list[dict]:
+        os.makedirs(self.directory, exist_ok = True)
+
+        self.results = [None] * len(self.runs)
+
+        with ProcessPoolExecutor(max_workers = self.workers) as pool:
+            futures = {pool.submit(run, self.job(index)): index for index in range(len(self.runs))}
+
+            for future in as_completed(futures):
+                index = futures[future]
+                self.results[index] = future.result()
+
+                print(f'Run {index + 1} / {len(self.runs)} done: {self.runs[index]}')
+
+        self.write()
+
+        return self.results
+
+    # Everything a worker needs to perform one run
+    def job(self, index: int) -> dict:
+        return {
+            'index':        index,
+            'ramjet':       self.ramjet,
+            'parameters':   self.runs[index],
+            'rate':         self.rate,
+            'max_steps':    self.max_steps,
+            'file':         self.file(index),
+            'recorder':     self.recorder,
+            'integrator':   self.integrator,
+            'catalog':      self.catalog
+        }
+
+    # The store directory of a run
+    def file(self, index: int) -> str:
+        return os.path.join(self.directory, f'run_{index:04d}')
+
+    # Writes the merged summary of every run as a table
+    def write(self) -> None:
+
+        # Runs may vary different parameters
+        keys = list(dict.fromkeys(key for result in self.results for key in result))
+
+        with open(os.path.join(self.directory, 'summary.csv'), 'w', newline = '') as file:
+            writer = csv.DictWriter(file, keys)
+            writer.writeheader()
+            writer.writerows(self.results)
+
+
+
+# Performs a single run of a sweep; runs in a worker process
+def run(job: dict) -> dict:
+    simulation = Simulation(job['rate'], 1000, job['ramjet'], job['file'], job['recorder'](), job['parameters'], job['max_steps'], job['integrator'](), catalog = Catalog(job['catalog']) if job['catalog'] else None)
+    simulation.verbose = False
+    simulation()
+
+    return {
+        'run':      job['index'],
+        'file':     job['file'],
+        **job['parameters'],
+        **simulation.summary()
+    }
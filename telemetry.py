@@ -0,0 +1,146 @@
+# Publishes snapshots of a running simulation to shared memory, for live views in other processes.
+# The memory holds a ring of rows laid out as the simulation's Schema. There is one writer, the simulation,
+# which never waits: each row has a sequence number that is odd while the row is being written, so a reader
+# copies a row and checks that its sequence number was even and unchanged, and skips it otherwise
+#
+# Layout, all little-endian:
+#   int64               number of rows published
+#   int64               1 once the simulation has ended
+#   int64[size]         sequence number of each row
+#   float64[size, n]    rows
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+class Feed:
+    def __init__(self, size: int = 1024) -> None:
+
+        # Number of rows in the ring
+        self.size: int = size
+
+        # Milliseconds between rows, set when opened
+        self.framerate: float = 0
+
+        # The schema of a row, its flattened keys, and the shared memory, set when opened
+        self.schema = None
+        self.keys: list[str] = []
+        self.memory: shared_memory.SharedMemory = None
+
+        # Reading the clock every step is wasteful, so it is only read every few calls
+        self.calls: int = 0
+        self.last: float = 0
+
+    # Creates the shared memory for rows of a schema, published every framerate milliseconds
+    def open(self, schema, framerate: float) -> None:
+        self.schema = schema
+        self.keys = list(schema.keys)
+        self.framerate = framerate
+
+        self.memory = shared_memory.SharedMemory(create = True, size = nbytes(self.size, len(self.keys)))
+        self.published, self.closed, self.sequence, self.rows = views(self.memory, self.size, len(self.keys))
+
+        self.published[0] = 0
+        self.closed[0] = 0
+        self.sequence[:] = 0
+
+    # The name of the shared memory, for readers to attach to
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    # Calling a Feed publishes a snapshot of the simulation if a frame has passed
+    def __call__(self, simulation) -> None:
+        self.calls += 1
+        if self.calls % 64:
+            return
+
+        now = time.perf_counter()
+        if (now - self.last) * 1000 >= self.framerate:
+            self.last = now
+
+            self.schema.capture()
+            self.publish(self.schema.flat)
+
+    # Writes a row into the ring
+    def publish(self, row: np.ndarray) -> None:
+        count = int(self.published[0])
+        index = count % self.size
+
+        self.sequence[index] = 2 * count + 1
+        self.rows[index] = row
+        self.sequence[index] = 2 * count + 2
+
+        self.published[0] = count + 1
+
+    # Publishes the last snapshot, marks the simulation as ended, and lets go of the memory.
+    # Readers keep their mapping until they close
+    def close(self) -> None:
+        if self.memory is None:
+            return
+
+        self.schema.capture()
+        self.publish(self.schema.flat)
+        self.closed[0] = 1
+
+        del self.published, self.closed, self.sequence, self.rows
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+
+
+# Reads rows published by a Feed in another process
+class Reader:
+    def __init__(self, name: str, size: int, keys: list[str]) -> None:
+        self.size: int = size
+        self.keys: list[str] = keys
+
+        self.memory: shared_memory.SharedMemory = shared_memory.SharedMemory(name = name)
+        self.published, self.closed, self.sequence, self.rows = views(self.memory, size, len(keys))
+
+        # Number of rows published when last read
+        self.count: int = 0
+
+    # Whether the simulation has ended
+    def ended(self) -> bool:
+        return bool(self.closed[0])
+
+    # Rows published since the last read, oldest first, as a 2D array.
+    # Rows that were overwritten before they were read are lost, and rows being written are skipped
+    def read(self) -> np.ndarray:
+        published = int(self.published[0])
+        first = max(self.count, published - self.size)
+        self.count = published
+
+        rows = []
+        for count in range(first, published):
+            index = count % self.size
+
+            before = int(self.sequence[index])
+            row = self.rows[index].copy()
+            after = int(self.sequence[index])
+
+            if before == after == 2 * count + 2:
+                rows.append(row)
+
+        return np.array(rows).reshape(-1, len(self.keys))
+
+    def close(self) -> None:
+        del self.published, self.closed, self.sequence, self.rows
+        self.memory.close()
+
+
+
+# Bytes of shared memory for a ring of rows
+def nbytes(size: int, width: int) -> int:
+    return 8 * (2 + size + size * width)
+
+# Arrays over the shared memory
+def views(memory: shared_memory.SharedMemory, size: int, width: int) -> tuple:
+    published = np.ndarray((1,), dtype = '<i8', buffer = memory.buf, offset = 0)
+    closed = np.ndarray((1,), dtype = '<i8', buffer = memory.buf, offset = 8)
+    sequence = np.ndarray((size,), dtype = '<i8', buffer = memory.buf, offset = 16)
+    rows = np.ndarray((size, width), dtype = '<f8', buffer = memory.buf, offset = 16 + 8 * size)
+
+    return published, closed, sequence, rows